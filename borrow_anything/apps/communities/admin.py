@@ -27,6 +27,19 @@ class CommunityAdmin(admin.ModelAdmin):
     # list_editable = ('is_approved', 'is_active')
     # Order by name by default
     ordering = ("name",)
+    actions = ["import_residents"]
+
+    @admin.action(description="Import residents from a CSV/JSONL file")
+    def import_residents(self, request, queryset):
+        """Opens the resident import form (apps/users/onboarding.py) for one community."""
+        from django.shortcuts import redirect
+        from django.urls import reverse
+
+        if queryset.count() != 1:
+            self.message_user(request, "Select exactly one community to import residents into.", messages.WARNING)
+            return None
+        url = reverse("admin:users_residentimport_add")
+        return redirect(f"{url}?community={queryset.get().pk}")
 
 
 @admin.register(CommunitySuggestion)  # Use decorator for registration
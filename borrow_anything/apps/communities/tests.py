@@ -1,3 +1,27 @@
-from django.test import TestCase
+# apps/communities/tests.py
 
-# Create your tests here.
+from apps.core.testing import QueryCountTestCase, make_community, make_profile
+
+
+class CommunityQueryCountTests(QueryCountTestCase):
+    """Query counts of the community endpoints must not grow with the rows returned."""
+
+    def setUp(self):
+        self.profile = make_profile(make_community())
+        self.authenticate(self.profile)
+
+    def test_list(self):
+        def add_rows(number):
+            for _ in range(number):
+                make_community()
+
+        small, large = self.assertConstantQueries("/api/v1/communities/", add_rows)
+        self.assertEqual(len(large.data), len(small.data) + 9 * self.N)
+
+    def test_detail(self):
+        community = make_community()
+        # Unrelated rows must not affect a detail view either
+        self.assertConstantQueries(
+            f"/api/v1/communities/{community.pk}/",
+            lambda number: [make_community() for _ in range(number)],
+        )
@@ -1,10 +1,17 @@
 # apps/communities/views.py
 
+from urllib.parse import urlencode
+
 from rest_framework import viewsets, permissions, generics, filters, mixins
+from django.conf import settings
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.response import Response
 
 # We need mixins for list and retrieve actions with GenericViewSet
 from .models import Community, CommunitySuggestion
 from .serializers import CommunitySerializer, CommunitySuggestionSerializer
+from apps.core.cache import get_or_set, make_key
+from apps.users.authentication import StatelessJWTAuthentication
 
 
 class CommunityViewSet(
@@ -20,6 +27,12 @@ class CommunityViewSet(
     """
 
     serializer_class = CommunitySerializer
+    # Most queries a request may run (see apps/core/middleware.py); pinned by tests.py
+    query_budget = {"list": 1, "retrieve": 1}
+    # Reads of these actions may go to a read replica (see apps/core/routers.py)
+    replica_actions = {"list", "retrieve"}
+    # Read-only: trust the token's claims instead of loading the user
+    authentication_classes = [StatelessJWTAuthentication, SessionAuthentication]
     permission_classes = [
         permissions.IsAuthenticated
     ]  # Only authenticated users can view
@@ -46,9 +59,24 @@ class CommunityViewSet(
 
         return queryset
 
-    # NOTE: We don't need to explicitly write list() or retrieve() methods here
-    # because ListModelMixin and RetrieveModelMixin provide them.
-    # If we wanted custom behavior, we *could* override them.
+    def list(self, request, *args, **kwargs):
+        """
+        Lists are cached per set of query parameters (see apps/core/cache.py).
+        Community saves invalidate them.
+        """
+        # Encoded: memcached keys cannot contain spaces
+        params = urlencode(
+            [(name, request.query_params.get(name, "").strip().lower()) for name in ("pincode", "city", "search")]
+        )
+        key = make_key("communities", "list", params, models=[Community])
+        data = get_or_set(
+            key,
+            lambda: list(self.get_serializer(self.filter_queryset(self.get_queryset()), many=True).data),
+            settings.COMMUNITIES_CACHE_TIMEOUT,
+        )
+        return Response(data)
+
+    # NOTE: retrieve() comes from RetrieveModelMixin.
 
 
 # --- Keep the CommunitySuggestionCreateView as it is ---
@@ -0,0 +1,29 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    # Project-wide tooling that does not belong to a feature app (benchmarks, query instrumentation, ...)
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = "apps.core"
+
+    def ready(self):
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from .cache import get_versioned_models, invalidate_model
+        from .dbmetrics import count_request
+        from .queries import install
+
+        # Time every query on every connection (see queries.py)
+        connection_created.connect(install, dispatch_uid="apps.core.queries.install")
+        # Requests vs. connection checkouts (see dbmetrics.py)
+        request_started.connect(count_request, dispatch_uid="apps.core.dbmetrics.count_request")
+        # Saves/deletes invalidate the cache keys built from the model (see cache.py)
+        for model in get_versioned_models():
+            for signal in (post_save, post_delete):
+                signal.connect(
+                    invalidate_model,
+                    sender=model,
+                    dispatch_uid=f"apps.core.cache.invalidate_model.{model._meta.label_lower}",
+                )
@@ -0,0 +1,138 @@
+# apps/core/asyncviews.py
+
+import io
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import permissions
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    PermissionDenied,
+    UnsupportedMediaType,
+)
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+
+# Async views for I/O-bound endpoints (S3 calls, long-lived streams). DRF views
+# are synchronous: under ASGI each one occupies a thread until S3 or the
+# database answers. These views await instead and only hop to a thread for the
+# parts that must stay synchronous (authentication, serializers, boto3).
+# Run them under the ASGI server (gunicorn.conf.py); under WSGI they still work,
+# each request in its own event loop.
+
+
+def _get_authenticators():
+    return [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+
+
+def _authenticate(request):
+    drf_request = Request(request, authenticators=_get_authenticators())
+    return drf_request.user  # Also sets request.user
+
+
+async def aauthenticate(request):
+    """
+    Authenticates the request with the API's default authentication classes
+    (JWT / session) and returns the user (AnonymousUser without credentials).
+    Raises APIException (e.g. AuthenticationFailed) for invalid credentials.
+    """
+    return await sync_to_async(_authenticate)(request)
+
+
+async def aget_profile(user):
+    """The user's UserProfile or None. Usually preloaded by CachedJWTAuthentication."""
+    return await sync_to_async(lambda: getattr(user, "profile", None))()
+
+
+def api_response(data, status=200):
+    """A JSON response rendered like the DRF views' responses."""
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type="application/json")
+
+
+def get_authenticate_header(request):
+    """
+    The WWW-Authenticate header of a 401, from the first authentication class
+    (like APIView.get_authenticate_header()), e.g. 'Bearer realm="api"'.
+    """
+    authenticators = _get_authenticators()
+    if authenticators:
+        return authenticators[0].authenticate_header(request)
+    return None
+
+
+def api_error_response(exc, request=None):
+    """
+    The response DRF's exception handler would send for exc. Pass the request
+    for authentication errors: like APIView, they become a 401 with a
+    WWW-Authenticate header, or a 403 when no authentication class offers one.
+    """
+    if request is not None and isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        auth_header = get_authenticate_header(request)
+        if auth_header:
+            exc.auth_header = auth_header
+        else:
+            exc.status_code = 403
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {"detail": exc.detail}
+    response = api_response(data, status=exc.status_code)
+    if getattr(exc, "auth_header", None):
+        response["WWW-Authenticate"] = exc.auth_header
+    return response
+
+
+class AsyncAPIView(View):
+    """
+    Base class for async API views, covering what these endpoints use from DRF's
+    APIView: authentication, permission_classes, JSON bodies in request.data and
+    APIException -> JSON error responses. Handlers are `async def post(...)` etc.
+    returning api_response(...).
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Like DRF: SessionAuthentication enforces CSRF itself, JWT needs none
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        handler = getattr(self, method, None) if method in self.http_method_names else None
+        if handler is None:
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+        try:
+            await self.initial(request)
+            return await handler(request, *args, **kwargs)
+        except Http404:
+            return api_response({"detail": "Not found."}, status=404)
+        except APIException as exc:
+            return api_error_response(exc, request)
+
+    async def initial(self, request):
+        user = await aauthenticate(request)
+        for permission in self.permission_classes:
+            if not permission().has_permission(request, self):
+                if not user.is_authenticated:
+                    raise NotAuthenticated()
+                raise PermissionDenied()
+        request.data = self.parse(request)
+
+    def parse(self, request):
+        if request.method in ("GET", "HEAD", "OPTIONS", "DELETE"):
+            return {}
+        if request.content_type == "application/json":
+            if not request.body:
+                return {}
+            return FastJSONParser().parse(io.BytesIO(request.body))
+        if request.content_type in ("application/x-www-form-urlencoded", "multipart/form-data"):
+            return request.POST
+        raise UnsupportedMediaType(request.content_type)
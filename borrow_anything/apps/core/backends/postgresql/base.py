@@ -0,0 +1,30 @@
+# apps/core/backends/postgresql/base.py
+
+import time
+
+from django.db.backends.postgresql import base
+
+from apps.core import dbmetrics
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Django's PostgreSQL backend, recording every connection checkout (a new
+    connection, or one taken from the DB_POOL pool), its duration and failures
+    in apps/core/dbmetrics.py. settings.py switches postgresql databases to it.
+    """
+
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Exception:
+            dbmetrics.record_error(self.alias)
+            raise
+        dbmetrics.record_checkout(self.alias, time.perf_counter() - started)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            dbmetrics.record_release(self.alias)
+        return super()._close()
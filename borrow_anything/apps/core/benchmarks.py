@@ -0,0 +1,216 @@
+# apps/core/benchmarks.py
+
+import contextlib
+import io
+import math
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.items.models import Item
+from apps.transactions.models import BorrowingRequest
+from apps.users.models import UserProfile
+from .seeding import USERNAME_PREFIX
+
+# Benchmark harness for the main API endpoints (see run_benchmarks).
+# Requests go through the full Django stack with the test client, authenticated
+# with a real JWT, against the benchmark dataset (seed_benchmark_data). Every
+# run happens inside a transaction that is rolled back, so state-changing
+# endpoints can be measured repeatedly and the data stays reproducible.
+#
+# For each endpoint we report latency percentiles over the timed iterations,
+# the number of queries of one request, and the peak memory allocated while
+# handling one request (tracemalloc, measured separately since it slows Python down).
+
+API = "/api/v1/"
+Status = BorrowingRequest.StatusChoices
+
+
+class Scenario:
+    """
+    One endpoint to measure. `prepare(ctx)` runs before every request (untimed)
+    and returns the path to call, e.g. after creating a request in the right state.
+    `actor` picks the user sending the request: "user" or "lender"/"borrower"
+    of the request created by prepare.
+    """
+
+    def __init__(self, name, method, prepare, actor="user", data=None):
+        self.name = name
+        self.method = method
+        self.prepare = prepare
+        self.actor = actor
+        self.data = data
+
+
+class BenchmarkContext:
+    """The benchmark user, their data and one client per acting user."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.clients = {}
+        # An item of someone else in the user's community, to borrow in lifecycle scenarios
+        self.item = (
+            Item.objects.filter(community_id=profile.community_id, is_active=True)
+            .exclude(owner_profile=profile)
+            .select_related("owner_profile")
+            .order_by("pk")
+            .first()
+        )
+        self.current_request = None
+
+    def client_for(self, profile):
+        if profile.pk not in self.clients:
+            token = AccessToken.for_user(profile.user)
+            self.clients[profile.pk] = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return self.clients[profile.pk]
+
+    def create_request(self, status):
+        """A request for self.item by the benchmark user, already in `status`."""
+        now = timezone.now()
+        # accept refuses items that are already booked by an earlier iteration
+        Item.objects.filter(pk=self.item.pk).update(availability_status=Item.AvailabilityStatus.AVAILABLE)
+        self.current_request = BorrowingRequest.objects.create(
+            item=self.item,
+            borrower_profile=self.profile,
+            lender_profile=self.item.owner_profile,
+            start_date=now.date() + timedelta(days=1),
+            end_date=now.date() + timedelta(days=3),
+            status=status,
+            processed_at=now if status != Status.PENDING else None,
+            pickup_confirmed_at=now if status in (Status.PICKED_UP, Status.RETURNED) else None,
+            return_initiated_at=now if status == Status.RETURNED else None,
+        )
+        return self.current_request
+
+
+def _lifecycle(action, status):
+    def prepare(ctx):
+        borrowing_request = ctx.create_request(status)
+        return f"{API}requests/{borrowing_request.pk}/{action}/"
+    return prepare
+
+
+SCENARIOS = [
+    Scenario("items-list", "get", lambda ctx: f"{API}items/"),
+    Scenario("items-detail", "get", lambda ctx: f"{API}items/{ctx.item.pk}/"),
+    Scenario("requests-list", "get", lambda ctx: f"{API}requests/"),
+    Scenario("notifications-list", "get", lambda ctx: f"{API}notifications/"),
+    Scenario("users-me", "get", lambda ctx: f"{API}users/me/"),
+    Scenario("request-accept", "patch", _lifecycle("accept", Status.PENDING), actor="lender"),
+    Scenario("request-decline", "patch", _lifecycle("decline", Status.PENDING), actor="lender"),
+    Scenario("request-cancel", "patch", _lifecycle("cancel", Status.PENDING), actor="borrower"),
+    Scenario("request-confirm-pickup", "patch", _lifecycle("confirm-pickup", Status.ACCEPTED), actor="borrower"),
+    Scenario("request-confirm-return", "patch", _lifecycle("confirm-return", Status.PICKED_UP), actor="borrower"),
+    Scenario("request-complete", "patch", _lifecycle("complete", Status.RETURNED), actor="lender"),
+]
+
+
+def pick_benchmark_profile(username=None):
+    """The given user, or the benchmark user involved in the most requests (a heavy user)."""
+    profiles = UserProfile.objects.select_related("user", "community")
+    if username:
+        return profiles.get(user__username=username)
+    return (
+        profiles.filter(user__username__startswith=USERNAME_PREFIX)
+        .annotate(activity=Count("borrow_requests", distinct=True) + Count("lend_requests", distinct=True))
+        .order_by("-activity", "pk")
+        .first()
+    )
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def _prepare(ctx, scenario):
+    """Untimed setup of one request. Returns a function that sends it."""
+    path = scenario.prepare(ctx)
+    if scenario.actor == "lender":
+        profile = ctx.current_request.lender_profile
+    else:
+        profile = ctx.profile
+    client = ctx.client_for(profile)
+    kwargs = {"content_type": "application/json", "data": scenario.data or {}} if scenario.method != "get" else {}
+
+    def send():
+        # Some views still print debug output; keep it out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            return getattr(client, scenario.method)(path, **kwargs)
+    return send
+
+
+def run_scenario(ctx, scenario, iterations=50, warmup=5):
+    """Measures one scenario. Returns a dict of results."""
+    for _ in range(warmup):
+        _prepare(ctx, scenario)()
+
+    timings = []
+    errors = 0
+    for _ in range(iterations):
+        send = _prepare(ctx, scenario)
+        started = time.perf_counter()
+        response = send()
+        timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            errors += 1
+
+    # Query count of one request (connection.queries is reset when a request starts)
+    queries = []
+    send = _prepare(ctx, scenario)
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        send()
+
+    # Peak memory allocated while handling one request
+    send = _prepare(ctx, scenario)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        send()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "name": scenario.name,
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "p99_ms": round(percentile(timings, 99), 2),
+        "mean_ms": round(statistics.fmean(timings), 2) if timings else 0.0,
+        "queries": len(queries),
+        "peak_kb": round(peak / 1024, 1),
+        "errors": errors,
+    }
+
+
+def run_benchmarks(profile, names=None, iterations=50, warmup=5, on_result=None):
+    """
+    Runs the scenarios (all, or those in `names`) as `profile` and returns their
+    results. All changes made by the requests are rolled back afterwards.
+    """
+    results = []
+    with transaction.atomic():
+        ctx = BenchmarkContext(profile)
+        if ctx.item is None:
+            raise ValueError(f"{profile.user.username} has no item of another member to borrow.")
+        for scenario in SCENARIOS:
+            if names and scenario.name not in names:
+                continue
+            result = run_scenario(ctx, scenario, iterations=iterations, warmup=warmup)
+            results.append(result)
+            if on_result:
+                on_result(result)
+        transaction.set_rollback(True)
+    return results
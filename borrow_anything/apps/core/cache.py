@@ -0,0 +1,146 @@
+# apps/core/cache.py
+
+import logging
+import random
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Cache-aside helpers shared by every app. The backend is chosen with CACHE_URL
+# in settings.py (Redis, memcached or per-process local memory).
+#
+# Versioned namespaces: each model in VERSIONED_MODELS has a version number in
+# the cache, and keys built with make_key(..., models=[Model]) contain the
+# versions of their models. Saving or deleting a row bumps its model's version
+# (see invalidate_model below), so every key built from the old version is
+# never read again and simply expires. No need to know which keys exist.
+#
+# get_or_set() adds stampede protection on top of cache.get/set: when a key is
+# missing only one caller (per cache, so across processes with a shared backend)
+# computes the value, the others wait for it. Timeouts are jittered so entries
+# written together do not all expire at the same moment.
+
+# Models whose saves/deletes invalidate the keys built from them ("app_label.Model")
+VERSIONED_MODELS = [
+    "items.Category",
+    "items.Item",
+    "communities.Community",
+    "users.UserProfile",
+]
+
+MISSING = object()  # cache.get() default: None is a valid cached value
+LOCK_POLL_INTERVAL = 0.05  # Seconds between checks while another caller computes a value
+
+
+def namespace(model):
+    """'app_label.modelname' of a model class or instance."""
+    return model._meta.label_lower
+
+
+def version_key(model):
+    return f"core:version:{namespace(model)}"
+
+
+def _new_version():
+    # A version the model cannot have had before (even if the old one was evicted
+    # from the cache), so keys of an old version can never be read again
+    return int(time.time() * 1000)
+
+
+def get_versions(models):
+    """The current versions of the given models, with a single cache round trip."""
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        # add() keeps a version another process set in the meantime
+        for key, version in missing.items():
+            if not cache.add(key, version, None):
+                missing[key] = cache.get(key, version)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*models):
+    """Invalidates every key built from the given models."""
+    for model in models:
+        key = version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:  # Not in the cache (yet, or evicted)
+            cache.set(key, _new_version(), None)
+
+
+def make_key(*parts, models=()):
+    """
+    'part:part:...' followed by the versions of `models`, e.g.
+    make_key("communities", "list", models=[Community]) -> "communities:list:v1718...".
+    """
+    key = ":".join(str(part) for part in parts)
+    if models:
+        key += ":v" + ".".join(str(version) for version in get_versions(models))
+    return key
+
+
+def jittered(timeout):
+    """timeout shortened by up to CACHE_TTL_JITTER (a fraction), never lengthened."""
+    if not timeout:
+        return timeout
+    return max(1, int(timeout * (1 - random.uniform(0, settings.CACHE_TTL_JITTER))))
+
+
+def set_value(key, value, timeout):
+    cache.set(key, value, jittered(timeout))
+
+
+async def aset_value(key, value, timeout):
+    await cache.aset(key, value, jittered(timeout))
+
+
+def get_or_set(key, compute, timeout):
+    """
+    Returns the cached value of key, or compute()'s result, which is then cached
+    for about `timeout` seconds. While one caller computes a missing key, others
+    wait up to CACHE_LOCK_WAIT seconds for its result before computing it themselves.
+    """
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        return value
+
+    lock_key = f"{key}:lock"
+    # add() only succeeds for the first caller; the lock expires by itself if that
+    # caller dies before releasing it
+    if cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+        try:
+            value = compute()
+            set_value(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            return value
+    logger.warning(f"Gave up waiting for cache key {key}, computing it again.")
+    return compute()
+
+
+def invalidate_model(sender, **kwargs):
+    """
+    post_save/post_delete receiver (connected in apps.py for VERSIONED_MODELS).
+    Bumps after the commit: bumping earlier would let a concurrent request cache
+    the old rows under the new version.
+    """
+    transaction.on_commit(lambda: bump_version(sender), using=kwargs.get("using"))
+
+
+def get_versioned_models():
+    return [apps.get_model(label) for label in VERSIONED_MODELS]
@@ -0,0 +1,147 @@
+# apps/core/compression.py
+
+import re
+import secrets
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional (whitenoise[brotli]): without it responses are gzipped
+    brotli = None
+
+# Response compression for middleware.CompressionMiddleware. JSON compresses very
+# well (item lists shrink 5-10x), which matters most to mobile clients.
+# Static files are not compressed here: WhiteNoise serves the .br/.gz files
+# that collectstatic writes next to them.
+
+# BREACH: when a response holds a secret (e.g. a CSRF token) next to text an
+# attacker controls, the compressed size tells whether a guess matched it.
+# - HTML is never compressed: that is where the CSRF tokens are (admin,
+#   browsable API). The JSON API authenticates with bearer tokens, which a
+#   cross-site attacker cannot make the browser send.
+# - Gzip responses also get random-length padding in the gzip header, like
+#   Django's GZipMiddleware (COMPRESSION_GZIP_RANDOM_BYTES). Brotli streams have
+#   no header field to pad.
+
+# Content types worth compressing (images, videos and archives already are)
+COMPRESSIBLE_TYPES = re.compile(
+    r"^(text/(?!html)|application/(json|javascript|xml|problem\+json)|image/svg\+xml)"
+)
+GZIP_FNAME = 0x08  # Gzip header flag: a zero-terminated file name follows the header
+GZIP_HEADER_SIZE = 10
+
+_coding_re = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$")
+
+
+def available_encodings():
+    """Encodings this server can produce, preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding):
+    """
+    The encoding to use for a request's Accept-Encoding header, or None.
+    The client's q-values win; on a tie brotli (smaller) beats gzip.
+    """
+    weights = {}
+    for coding in accept_encoding.lower().split(","):
+        match = _coding_re.match(coding)
+        if match:
+            try:
+                weights[match.group(1)] = float(match.group(2) or 1)
+            except ValueError:
+                continue
+    best, best_weight = None, 0
+    for encoding in available_encodings():
+        weight = weights.get(encoding, weights.get("*", 0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class PaddedGzipCompressor:
+    """
+    A zlib gzip compressor (same compress()/flush() methods) whose header gets
+    a file name of random length, 0 to max_random_bytes - 1 bytes.
+    """
+
+    def __init__(self, level, max_random_bytes):
+        # wbits 16 + MAX_WBITS: gzip header and trailer around the deflate stream
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.filename = b"a" * secrets.randbelow(max_random_bytes) + b"\0"
+        self.pending = b""  # Output held back until the whole header is there
+
+    def pad(self, data):
+        if self.filename is None:
+            return data
+        data = self.pending + data
+        if len(data) < GZIP_HEADER_SIZE:
+            self.pending = data
+            return b""
+        header = bytearray(data[:GZIP_HEADER_SIZE])
+        header[3] |= GZIP_FNAME
+        padded = bytes(header) + self.filename + data[GZIP_HEADER_SIZE:]
+        self.filename, self.pending = None, b""
+        return padded
+
+    def compress(self, data):
+        return self.pad(self.compressor.compress(data))
+
+    def flush(self, mode=zlib.Z_FINISH):
+        return self.pad(self.compressor.flush(mode))
+
+
+def _compressor(encoding):
+    if encoding == "br":
+        return brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+    if settings.COMPRESSION_GZIP_RANDOM_BYTES:
+        return PaddedGzipCompressor(settings.COMPRESSION_GZIP_LEVEL, settings.COMPRESSION_GZIP_RANDOM_BYTES)
+    # wbits 16 + MAX_WBITS: gzip header and trailer around the deflate stream
+    return zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def compress(data, encoding):
+    compressor = _compressor(encoding)
+    if encoding == "br":
+        return compressor.process(data) + compressor.finish()
+    return compressor.compress(data) + compressor.flush()
+
+
+class StreamCompressor:
+    """
+    Compresses a streamed response chunk by chunk. Every chunk is flushed, so
+    the client gets each piece (e.g. a server-sent event) as soon as it is sent,
+    at the cost of a slightly worse ratio than compressing everything at once.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.compressor = _compressor(encoding)
+
+    def chunk(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        if self.encoding == "br":
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+    def compress(self, chunks):
+        for data in chunks:
+            compressed = self.chunk(data)
+            if compressed:
+                yield compressed
+        yield self.finish()
+
+    async def acompress(self, chunks):
+        async for data in chunks:
+            compressed = self.chunk(data)
+            if compressed:
+                yield compressed
+        yield self.finish()
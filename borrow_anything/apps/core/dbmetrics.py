@@ -0,0 +1,95 @@
+# apps/core/dbmetrics.py
+
+import threading
+from collections import Counter, defaultdict, deque
+
+from django.db import connections
+
+# Per-process database connection metrics, per alias. Checkouts and their timing
+# are recorded by the PostgreSQL backend in apps/core/backends/postgresql:
+# without DB_POOL a checkout is a new connection (TCP + TLS + auth), with DB_POOL
+# it is a connection taken from the psycopg pool and the time is the wait for it.
+# Compare "checkouts" with "requests": with persistent connections most requests
+# reuse the connection of the previous one and need no checkout at all.
+
+SAMPLE_SIZE = 1000  # Recent checkout times kept per alias for the percentiles
+
+_counters = defaultdict(Counter)  # alias -> {"checkouts": n, "errors": n, "releases": n}
+_checkout_times = defaultdict(lambda: deque(maxlen=SAMPLE_SIZE))  # alias -> seconds
+_requests = 0
+_lock = threading.Lock()
+
+
+def record_checkout(alias, seconds):
+    with _lock:
+        _counters[alias]["checkouts"] += 1
+        _checkout_times[alias].append(seconds)
+
+
+def record_error(alias):
+    with _lock:
+        _counters[alias]["errors"] += 1
+
+
+def record_release(alias):
+    with _lock:
+        _counters[alias]["releases"] += 1
+
+
+def count_request(sender, **kwargs):
+    """request_started receiver (connected in apps.py)."""
+    global _requests
+    with _lock:
+        _requests += 1
+
+
+def _percentiles(seconds):
+    if not seconds:
+        return None
+    seconds = sorted(seconds)
+
+    def pick(fraction):
+        return round(seconds[min(int(fraction * len(seconds)), len(seconds) - 1)] * 1000, 2)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": pick(1.0)}
+
+
+def _pool_stats(alias):
+    """The psycopg pool's own counters (waits, timeouts, errors...), if pooling is on."""
+    pool = getattr(connections[alias], "pool", None)
+    if pool is None:
+        return None
+    return pool.get_stats()
+
+
+def metrics():
+    """Snapshot of the counters, checkout latencies (ms) and pool stats per alias."""
+    with _lock:
+        snapshot = {
+            alias: {
+                "checkouts": counters["checkouts"],
+                "errors": counters["errors"],
+                "releases": counters["releases"],
+                "open": counters["checkouts"] - counters["releases"],
+                "checkout_ms": _percentiles(list(_checkout_times[alias])),
+            }
+            for alias, counters in _counters.items()
+        }
+        requests = _requests
+    for alias in connections:
+        settings_dict = connections.settings[alias]
+        entry = snapshot.setdefault(
+            alias, {"checkouts": 0, "errors": 0, "releases": 0, "open": 0, "checkout_ms": None}
+        )
+        entry["conn_max_age"] = settings_dict.get("CONN_MAX_AGE")
+        entry["health_checks"] = settings_dict.get("CONN_HEALTH_CHECKS")
+        entry["pool"] = _pool_stats(alias)
+    return {"requests": requests, "databases": snapshot}
+
+
+def reset():
+    global _requests
+    with _lock:
+        _counters.clear()
+        _checkout_times.clear()
+        _requests = 0
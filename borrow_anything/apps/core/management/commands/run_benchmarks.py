@@ -0,0 +1,91 @@
+# apps/core/management/commands/run_benchmarks.py
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from apps.core.benchmarks import SCENARIOS, pick_benchmark_profile, run_benchmarks
+
+COLUMNS = ["p50_ms", "p95_ms", "p99_ms", "queries", "peak_kb"]
+
+
+class Command(BaseCommand):
+    """
+    Measures the main API endpoints against the benchmark dataset and prints
+    p50/p95/p99 latency, query count and peak allocated memory per endpoint.
+    Save a baseline before a change and compare against it afterwards:
+        python manage.py seed_benchmark_data
+        python manage.py run_benchmarks --output before.json
+        ... apply the change ...
+        python manage.py run_benchmarks --compare before.json
+    Runs with DEBUG off; all changes made by the requests are rolled back.
+    """
+
+    help = "Benchmark the main API endpoints (latency percentiles, queries, memory)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50, help="Timed requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per endpoint first.")
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            choices=[scenario.name for scenario in SCENARIOS],
+            help="Only run these endpoints.",
+        )
+        parser.add_argument("--user", help="Username to benchmark as (default: busiest benchmark user).")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--compare", help="Show the change against results saved with --output.")
+
+    def handle(self, *args, **options):
+        profile = pick_benchmark_profile(options["user"])
+        if profile is None:
+            raise CommandError("No benchmark data found; run `manage.py seed_benchmark_data` first.")
+        baseline = {}
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = {result["name"]: result for result in json.load(f)["results"]}
+
+        self.stdout.write(
+            f"Benchmarking as {profile.user.username}: {options['iterations']} iterations "
+            f"({options['warmup']} warm-up) per endpoint, database {settings.DATABASES['default']['ENGINE']}"
+        )
+        self.stdout.write(self.format_row("endpoint", COLUMNS + ["errors"]))
+
+        def report(result):
+            values = [self.format_value(result, column, baseline.get(result["name"])) for column in COLUMNS]
+            self.stdout.write(self.format_row(result["name"], values + [str(result["errors"])]))
+
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            try:
+                results = run_benchmarks(
+                    profile,
+                    names=options["only"],
+                    iterations=options["iterations"],
+                    warmup=options["warmup"],
+                    on_result=report,
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(
+                    {"user": profile.user.username, "iterations": options["iterations"], "results": results},
+                    f,
+                    indent=2,
+                )
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+    def format_row(self, name, values):
+        return f"{name:<26}" + "".join(f"{value:>20}" for value in values)
+
+    def format_value(self, result, column, before):
+        value = result[column]
+        if not before or column not in before:
+            return str(value)
+        old = before[column]
+        if old:
+            return f"{value} ({(value - old) / old * 100:+.0f}%)"
+        return f"{value} (was {old})"
@@ -0,0 +1,69 @@
+# apps/core/management/commands/seed_benchmark_data.py
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core import seeding
+
+
+class Command(BaseCommand):
+    """
+    Generates a reproducible synthetic dataset for run_benchmarks: communities,
+    users with memberships, items with images, borrowing requests in every status,
+    reviews and notifications. The same options always produce the same data.
+        python manage.py seed_benchmark_data --scale 2 --flush
+    Benchmark users log in with the password "bench-password".
+    """
+
+    help = "Generate synthetic benchmark data (use --flush to replace existing benchmark data)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=1.0,
+            help="Multiplies every count below (e.g. 10 for a large dataset).",
+        )
+        parser.add_argument("--communities", type=int, default=5)
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--items", type=int, default=1500)
+        parser.add_argument("--requests", type=int, default=3000)
+        parser.add_argument("--notifications", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Delete existing benchmark data first.",
+        )
+        parser.add_argument(
+            "--flush-only",
+            action="store_true",
+            help="Only delete existing benchmark data.",
+        )
+
+    def handle(self, *args, **options):
+        if options["flush"] or options["flush_only"]:
+            removed = seeding.flush()
+            self.stdout.write(f"Removed {removed} rows of existing benchmark data.")
+            if options["flush_only"]:
+                return
+        if get_user_model().objects.filter(username__startswith=seeding.USERNAME_PREFIX).exists():
+            raise CommandError("Benchmark data already exists; pass --flush to replace it.")
+
+        scale = options["scale"]
+        started = time.perf_counter()
+        counts = seeding.seed(
+            communities=max(1, round(options["communities"] * scale)),
+            users=max(2, round(options["users"] * scale)),
+            items=round(options["items"] * scale),
+            requests=round(options["requests"] * scale),
+            notifications=round(options["notifications"] * scale),
+            seed=options["seed"],
+            log=self.stdout.write,
+        )
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(
+            self.style.SUCCESS(f"Seeded {summary} in {time.perf_counter() - started:.1f}s.")
+        )
@@ -0,0 +1,363 @@
+# apps/core/middleware.py
+
+import hmac
+import logging
+import random
+import sys
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import compression, profiling, queries, routers
+
+logger = logging.getLogger("apps.core.queries")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more queries than its declared query_budget (raised in strict mode)."""
+
+
+def get_view_attribute(view_func, name):
+    """An attribute declared on a view class (DRF's APIView/viewsets, Django's View) or a function view."""
+    view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+    value = getattr(view_class, name, None) if view_class else None
+    if value is None:
+        value = getattr(view_func, name, None)
+    return value
+
+
+def get_view_action(view_func, request):
+    """The viewset action handling the request (e.g. "list"), else the lowercase HTTP method."""
+    method = request.method.lower()
+    actions = getattr(view_func, "actions", None) or {}  # Viewsets: method -> action
+    return actions.get(method, method)
+
+
+def get_query_budget(view_func, request):
+    """
+    The budget a view declares with a `query_budget` attribute: a number, or a
+    dict per viewset action or HTTP method, e.g. {"list": 4, "retrieve": 3} or
+    {"get": 3}. None if undeclared.
+    """
+    budget = get_view_attribute(view_func, "query_budget")
+    if isinstance(budget, dict):
+        budget = budget.get(get_view_action(view_func, request))
+    return budget
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Counts the queries of every request and times them (via queries.record_query).
+    - DEBUG: adds X-DB-Query-Count, X-DB-Time-Ms and X-DB-Slowest headers.
+    - Always: logs one structured line per request to the "apps.core.queries"
+      logger (INFO when it is slow or runs many queries, DEBUG otherwise) and
+      every statement slower than QUERY_SLOW_MS as a WARNING.
+    - Views may declare a query_budget; going over it is logged, or raises
+      QueryBudgetExceeded when QUERY_BUDGET_STRICT is on (as it is in tests).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = queries.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            queries.stop(token)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = queries.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            queries.stop(token)
+        return self.report(request, response, stats)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func, request)
+        return None
+
+    def report(self, request, response, stats):
+        slowest = stats.slowest
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": stats.count,
+            "db_ms": round(stats.total_ms, 1),
+            "slowest_ms": round(slowest[0][0], 1) if slowest else 0,
+        }
+        budget = getattr(request, "query_budget", None)
+        if budget is not None:
+            fields["budget"] = budget
+
+        if settings.DEBUG:
+            response["X-DB-Query-Count"] = str(stats.count)
+            response["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+            response["X-DB-Slowest"] = " | ".join(
+                f"{ms:.1f}ms {' '.join(sql.split())[:200]}" for ms, sql in slowest[:3]
+            )
+
+        line = " ".join(f"{key}={value}" for key, value in fields.items())
+        noisy = stats.count >= settings.QUERY_COUNT_WARNING or stats.total_ms >= settings.QUERY_SLOW_MS
+        logger.log(logging.INFO if noisy else logging.DEBUG, line, extra={"db": fields})
+        for ms, sql in slowest:
+            if ms >= settings.QUERY_SLOW_MS:
+                logger.warning(
+                    f"slow_query ms={ms:.1f} method={request.method} path={request.path} sql={' '.join(sql.split())[:1000]}",
+                    extra={"db": {**fields, "sql": sql, "ms": round(ms, 1)}},
+                )
+
+        if budget is not None and stats.count > budget:
+            message = (
+                f"{request.method} {request.path} ran {stats.count} queries, "
+                f"over its budget of {budget}."
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(f"query_budget_exceeded {line}", extra={"db": fields})
+        return response
+
+
+class SamplingProfilerMiddleware:
+    """
+    Profiles a fraction of requests (PROFILING_SAMPLE_RATE, 0 = off), plus every
+    request sending `X-Profile: <PROFILING_TOKEN>`, with the stack sampler in
+    profiling.py. Samples are aggregated per "METHOD url-name"; staff download
+    them as collapsed stacks from /api/v1/core/profiles/.
+    Requests profiled on demand get an X-Profile-Samples response header.
+
+    Under ASGI, Django runs sync views (most DRF views) on a worker thread while
+    __acall__ waits on the event loop. process_view() runs on that same worker
+    thread (Django calls sync process_view() like the view, with
+    sync_to_async(thread_sensitive=True)), so it adds the thread to the profile.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def should_profile(self, request):
+        """Returns "header", "sampled" or None."""
+        token = settings.PROFILING_TOKEN
+        header = request.headers.get("X-Profile")
+        if token and header and hmac.compare_digest(header.encode(), token.encode()):
+            return "header"
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate > 0 and random.random() < rate:
+            return "sampled"
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        reason = self.should_profile(request)
+        if reason is None:
+            return self.get_response(request)
+        profiled = profiling.start(sys._getframe())
+        try:
+            response = self.get_response(request)
+        finally:
+            samples = profiling.stop(profiled, self.view_name(request))
+        return self.report(response, reason, samples)
+
+    async def __acall__(self, request):
+        reason = self.should_profile(request)
+        if reason is None:
+            return await self.get_response(request)
+        profiled = profiling.start(sys._getframe())
+        request.profiled = profiled  # For process_view()
+        try:
+            response = await self.get_response(request)
+        finally:
+            samples = profiling.stop(profiled, self.view_name(request))
+        return self.report(response, reason, samples)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profiled = getattr(request, "profiled", None)
+        if profiled is None or threading.get_ident() in profiled.threads:
+            return None  # Not profiled, or the view runs on the thread already sampled
+        # The worker thread runs each sync_to_async() call (this method, then the
+        # view) in asgiref's thread_handler: sample below the innermost one
+        frame = sys._getframe()
+        while frame is not None:
+            if frame.f_code.co_name == "thread_handler" and "asgiref" in frame.f_code.co_filename:
+                profiling.add_thread(profiled, frame.f_code)
+                break
+            frame = frame.f_back
+        return None
+
+    def view_name(self, request):
+        match = getattr(request, "resolver_match", None)
+        name = (match.view_name or match._func_path) if match else "unresolved"
+        return f"{request.method} {name}"
+
+    def report(self, response, reason, samples):
+        if reason == "header":
+            response["X-Profile-Samples"] = str(samples)
+        return response
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def get_request_user_id(request):
+    """
+    The id of the user making the request, known before the view authenticates:
+    read from a valid JWT access token (no query), else from the session.
+    """
+    parts = request.headers.get("Authorization", "").split()
+    if len(parts) == 2 and parts[0] in jwt_settings.AUTH_HEADER_TYPES:
+        try:
+            return AccessToken(parts[1])[jwt_settings.USER_ID_CLAIM]
+        except (TokenError, KeyError):
+            return None
+    user = getattr(request, "user", None)  # Session (browsable API / admin)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets the reads of safe requests go to a read replica (see routers.py) when
+    - replicas are configured (DB_REPLICAS),
+    - the view lists the action in `replica_actions`, e.g. {"list", "retrieve"},
+    - and the user has not written anything in the last DB_REPLICA_STICKY_SECONDS.
+    Requests that write (any unsafe method, or a write during a GET) make the
+    user sticky to the primary for that window: read-your-writes consistency.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = routers.start_request()
+        request.db_routing = state
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        self.remember_writes(request, state)
+        return response
+
+    async def __acall__(self, request):
+        state, token = routers.start_request()
+        request.db_routing = state
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        self.remember_writes(request, state)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.DB_REPLICAS or request.method not in SAFE_METHODS:
+            return None
+        replica_actions = get_view_attribute(view_func, "replica_actions") or ()
+        if get_view_action(view_func, request) not in replica_actions:
+            return None
+        user_id = get_request_user_id(request)
+        if user_id is not None and routers.is_sticky(user_id):
+            return None
+        request.db_routing.use_replica = True
+        return None
+
+    def remember_writes(self, request, state):
+        if not settings.DB_REPLICAS:
+            return
+        if state.wrote or request.method not in SAFE_METHODS:
+            user_id = get_request_user_id(request)
+            if user_id is not None:
+                routers.make_sticky(user_id)
+
+
+class CompressionMiddleware:
+    """
+    Compresses text and JSON responses with brotli or gzip (see compression.py),
+    whichever the client accepts; brotli only when the package is installed.
+    Responses under COMPRESSION_MIN_SIZE bytes are sent as they are: the headers
+    would cost more than compression saves. Streaming responses are compressed
+    chunk by chunk, so each chunk still reaches the client right away.
+    HTML is left alone and gzip output is padded (BREACH, see compression.py).
+    COMPRESSION_ENABLED = False turns it off, e.g. when a proxy compresses instead.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.has_header("Content-Encoding"):
+            return response  # Already compressed (e.g. by WhiteNoise)
+        if not compression.COMPRESSIBLE_TYPES.match(response.get("Content-Type", "")):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        # From here the body depends on the request's Accept-Encoding
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = compression.negotiate(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            compressor = compression.StreamCompressor(encoding)
+            if response.is_async:
+                response.streaming_content = compressor.acompress(response.streaming_content)
+            else:
+                response.streaming_content = compressor.compress(response.streaming_content)
+            del response["Content-Length"]
+        else:
+            compressed = compression.compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # The compressed body is not byte-for-byte the one a strong ETag was made for
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
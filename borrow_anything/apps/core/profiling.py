@@ -0,0 +1,179 @@
+# apps/core/profiling.py
+
+import os
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+# Statistical profiler for live requests (see middleware.SamplingProfilerMiddleware).
+# A single background thread wakes every PROFILING_INTERVAL_MS and records the
+# current stack of each thread that is handling a profiled request. Stacks are
+# aggregated per view in memory and exported as "collapsed stacks", the input
+# format of flamegraph.pl / speedscope / inferno:
+#     view;frame;frame;frame <samples>
+# The profiled thread itself does no work, so a profiled request is only slowed
+# down by the sampler holding the GIL while it walks the stack.
+# Sampling is wall-clock: time spent waiting on the database or S3 shows up too,
+# under the frame that waits (e.g. execute() or generate_presigned_url()).
+
+TRUNCATED = "[other stacks]"  # Samples past PROFILING_MAX_STACKS distinct stacks per view
+STDLIB = sysconfig.get_paths()["stdlib"]
+
+
+class ProfiledRequest:
+    """The samples collected for one request, merged into the totals when it finishes."""
+
+    def __init__(self, thread_id, entry_frame):
+        # Thread id -> entry: frames above it (server, handler) are skipped. Under
+        # ASGI a sync view runs on another thread than the middleware; add_thread()
+        # registers that one too.
+        self.threads = {thread_id: entry_frame}
+        self.samples = Counter()
+
+
+# Keyed by the ProfiledRequest itself: under ASGI several requests share a thread
+_active = set()
+_active_lock = threading.Lock()
+_wakeup = threading.Event()
+_sampler = None
+
+_totals = defaultdict(Counter)  # view name -> {collapsed stack: samples}
+_requests = Counter()  # view name -> profiled requests
+_totals_lock = threading.Lock()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    path = code.co_filename
+    # Show project files relative to the project, libraries from their package/stdlib
+    base = str(settings.BASE_DIR)
+    if path.startswith(base):
+        path = os.path.relpath(path, base)
+    elif "site-packages" in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    elif path.startswith(STDLIB):
+        path = os.path.relpath(path, STDLIB)
+    # The function's first line (not the current line) keeps one node per function
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _collapse(frame, entry):
+    """
+    The stack from entry (exclusive) down to frame, root first, ';'-joined.
+    entry is a frame, or a code object matching the innermost frame running it.
+    None if entry is not on the stack: the thread is running something else,
+    e.g. another request's coroutine on the same event loop.
+    """
+    labels = []
+    while frame is not entry:
+        if frame is None:
+            return None
+        if frame.f_code is entry:
+            break
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def _run_sampler():
+    while True:
+        # Sampling under the lock means stop() never races with a sample being added
+        with _active_lock:
+            idle = not _active
+            if not idle:
+                frames = sys._current_frames()
+                for request in _active:
+                    for thread_id, entry in request.threads.items():
+                        frame = frames.get(thread_id)
+                        stack = _collapse(frame, entry) if frame is not None else None
+                        if stack is not None:
+                            request.samples[stack] += 1
+                del frames  # Don't keep the request threads' frames alive
+        if idle:
+            _wakeup.wait()
+            _wakeup.clear()
+            continue
+        time.sleep(settings.PROFILING_INTERVAL_MS / 1000)
+
+
+def _ensure_sampler():
+    global _sampler
+    if _sampler is None or not _sampler.is_alive():
+        with _active_lock:
+            if _sampler is None or not _sampler.is_alive():
+                _sampler = threading.Thread(target=_run_sampler, name="request-profiler", daemon=True)
+                _sampler.start()
+
+
+def start(entry_frame):
+    """Starts sampling the calling thread. Returns the ProfiledRequest for stop()."""
+    _ensure_sampler()
+    request = ProfiledRequest(threading.get_ident(), entry_frame)
+    with _active_lock:
+        _active.add(request)
+    _wakeup.set()
+    return request
+
+
+def add_thread(request, entry):
+    """
+    Also samples the calling thread for `request`, below `entry` (a frame, or a
+    code object: see _collapse()). For work the request hands to another thread.
+    """
+    with _active_lock:
+        request.threads[threading.get_ident()] = entry
+
+
+def stop(request, view_name):
+    """Stops sampling and adds the request's samples to view_name's totals."""
+    with _active_lock:
+        _active.discard(request)
+        request.threads = {}  # Don't keep the entry frames alive
+    max_stacks = settings.PROFILING_MAX_STACKS
+    with _totals_lock:
+        _requests[view_name] += 1
+        stacks = _totals[view_name]
+        for stack, samples in request.samples.items():
+            if stack in stacks or len(stacks) < max_stacks:
+                stacks[stack] += samples
+            else:
+                stacks[TRUNCATED] += samples
+    return sum(request.samples.values())
+
+
+def summary():
+    """[{view, requests, samples, stacks}] for every profiled view, most samples first."""
+    with _totals_lock:
+        rows = [
+            {
+                "view": view_name,
+                "requests": _requests[view_name],
+                "samples": sum(stacks.values()),
+                "stacks": len(stacks),
+            }
+            for view_name, stacks in _totals.items()
+        ]
+    return sorted(rows, key=lambda row: row["samples"], reverse=True)
+
+
+def collapsed_stacks(view_name=None):
+    """Collapsed stacks (one 'view;frames... count' line each), for one view or all."""
+    with _totals_lock:
+        views = [view_name] if view_name else list(_totals)
+        lines = [
+            f"{name};{stack} {samples}" if stack else f"{name} {samples}"
+            for name in views
+            for stack, samples in _totals.get(name, {}).items()
+        ]
+    return "\n".join(sorted(lines)) + "\n" if lines else ""
+
+
+def reset():
+    with _totals_lock:
+        _totals.clear()
+        _requests.clear()
@@ -0,0 +1,66 @@
+# apps/core/queries.py
+
+import contextvars
+import heapq
+import time
+
+# Per-request database instrumentation (see middleware.QueryInstrumentationMiddleware).
+# record_query() is installed as an execute wrapper on every database connection
+# (apps.py connects it to connection_created). While a request is being handled
+# its QueryStats object sits in a context variable, so queries are attributed
+# to the right request even when async views run them in worker threads.
+
+_current = contextvars.ContextVar("query_stats", default=None)
+
+SLOWEST_KEPT = 5  # Slowest statements remembered per request
+
+
+class QueryStats:
+    """Query count, total database time and the slowest statements of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self._slowest = []  # Min-heap of (ms, counter, sql)
+
+    def add(self, sql, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        entry = (elapsed_ms, self.count, sql)
+        if len(self._slowest) < SLOWEST_KEPT:
+            heapq.heappush(self._slowest, entry)
+        elif elapsed_ms > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        """[(ms, sql)], slowest first."""
+        return [(ms, sql) for ms, counter, sql in sorted(self._slowest, reverse=True)]
+
+
+def start():
+    """Starts collecting for the current request/context. Returns a token for stop()."""
+    stats = QueryStats()
+    return stats, _current.set(stats)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper: times the statement if a request is being instrumented."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(sql, (time.perf_counter() - started) * 1000)
+
+
+def install(connection, **kwargs):
+    """connection_created receiver: wraps every new connection exactly once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
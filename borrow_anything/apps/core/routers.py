@@ -0,0 +1,147 @@
+# apps/core/routers.py
+
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Read-replica routing. ReplicaRoutingMiddleware decides per request whether its
+# reads may go to a replica (safe method, view opted in with `replica_actions`,
+# user did not write recently) and stores that in a RoutingState in a context
+# variable. ReplicaRouter then sends reads to a healthy replica, and everything
+# else - writes, reads inside a transaction, reads after a write in the same
+# request, management commands and background jobs - to "default".
+
+# Replication lag in seconds; 0 when the replica has replayed everything it received
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class RoutingState:
+    """Routing decisions of the current request."""
+
+    def __init__(self):
+        self.use_replica = False  # Set by the middleware for opted-in safe reads
+        self.wrote = False  # Set by the router on the first write
+
+
+_state = contextvars.ContextVar("db_routing_state", default=None)
+
+
+def start_request():
+    """Returns (state, token); pass the token to end_request()."""
+    state = RoutingState()
+    return state, _state.set(state)
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+# --- Read-your-writes ---
+
+
+def sticky_cache_key(user_id):
+    return f"core:db-primary:{user_id}"
+
+
+def make_sticky(user_id):
+    """Sends the user's reads to the primary for DB_REPLICA_STICKY_SECONDS."""
+    cache.set(sticky_cache_key(user_id), True, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def is_sticky(user_id):
+    return bool(cache.get(sticky_cache_key(user_id)))
+
+
+# --- Replica health ---
+
+_health = {}  # alias -> (monotonic time of the check, healthy)
+_health_lock = threading.Lock()
+
+
+def measure_lag(alias):
+    """Seconds the replica is behind the primary (0 for non-PostgreSQL databases)."""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def _check_replica(alias):
+    try:
+        lag = measure_lag(alias)
+    except DatabaseError as e:
+        logger.warning(f"Replica {alias} is unavailable, reading from the primary: {e}")
+        return False
+    if lag > settings.DB_REPLICA_MAX_LAG:
+        logger.warning(f"Replica {alias} is {lag:.1f}s behind, reading from the primary.")
+        return False
+    return True
+
+
+def healthy_replicas():
+    """The replicas usable right now. Each one is re-checked every DB_REPLICA_CHECK_INTERVAL seconds."""
+    now = time.monotonic()
+    healthy = []
+    for alias in settings.DB_REPLICAS:
+        with _health_lock:
+            checked_at, ok = _health.get(alias, (None, False))
+        if checked_at is None or now - checked_at >= settings.DB_REPLICA_CHECK_INTERVAL:
+            ok = _check_replica(alias)
+            with _health_lock:
+                _health[alias] = (now, ok)
+        if ok:
+            healthy.append(alias)
+    return healthy
+
+
+def reset_health():
+    """Forgets the replica checks (used by tests)."""
+    with _health_lock:
+        _health.clear()
+
+
+class ReplicaRouter:
+    """
+    Database router (settings.DATABASE_ROUTERS). Returning None means "default".
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None  # Reads inside a transaction must see its writes
+        replicas = healthy_replicas()
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True  # Later reads of this request (and user) use the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db not in settings.DB_REPLICAS
@@ -0,0 +1,276 @@
+# apps/core/seeding.py
+
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from apps.communities.models import Community
+from apps.items.models import Category, Item, ItemImage
+from apps.notifications.models import Notification
+from apps.transactions.models import BorrowingRequest, Review
+from apps.users.models import UserCommunityMembership, UserProfile
+
+User = get_user_model()
+
+# Synthetic dataset for benchmarks (see run_benchmarks). Everything is generated
+# from a seeded random.Random, so the same options always produce the same data.
+# Benchmark rows are recognizable by these prefixes and can be removed with flush().
+USERNAME_PREFIX = "bench_"
+COMMUNITY_PREFIX = "Benchmark Community"
+IMAGE_PREFIX = "bench/"  # Never collides with the keys gc_orphans scans
+PASSWORD = "bench-password"
+
+CATEGORIES = ["Tools", "Kitchen", "Books", "Electronics", "Sports", "Garden", "Toys", "Party"]
+NOUNS = ["drill", "ladder", "tent", "blender", "projector", "bike pump", "camera", "board game"]
+ADJECTIVES = ["cordless", "folding", "heavy-duty", "compact", "vintage", "portable", "family", "pro"]
+
+# Roughly how requests are spread over their lifecycle in a live community
+STATUS_WEIGHTS = {
+    BorrowingRequest.StatusChoices.PENDING: 20,
+    BorrowingRequest.StatusChoices.ACCEPTED: 10,
+    BorrowingRequest.StatusChoices.DECLINED: 10,
+    BorrowingRequest.StatusChoices.CANCELLED_BORROWER: 5,
+    BorrowingRequest.StatusChoices.CANCELLED_LENDER: 5,
+    BorrowingRequest.StatusChoices.PICKED_UP: 10,
+    BorrowingRequest.StatusChoices.RETURNED: 5,
+    BorrowingRequest.StatusChoices.COMPLETED: 35,
+}
+
+NOTIFICATION_TYPES = [
+    Notification.NotificationTypeChoices.REQUEST_RECEIVED,
+    Notification.NotificationTypeChoices.REQUEST_ACCEPTED,
+    Notification.NotificationTypeChoices.REQUEST_DECLINED,
+    Notification.NotificationTypeChoices.PICKUP_CONFIRMED,
+    Notification.NotificationTypeChoices.RETURN_CONFIRMED_BORROWER,
+    Notification.NotificationTypeChoices.REQUEST_COMPLETED,
+    Notification.NotificationTypeChoices.REVIEW_RECEIVED,
+]
+
+BATCH_SIZE = 1000
+
+
+def flush():
+    """Deletes all benchmark data. Returns the number of benchmark users removed."""
+    with transaction.atomic():
+        profiles = UserProfile.objects.filter(user__username__startswith=USERNAME_PREFIX)
+        # Requests protect their items and profiles, so they go first
+        BorrowingRequest.objects.filter(borrower_profile__in=profiles).delete()
+        BorrowingRequest.objects.filter(lender_profile__in=profiles).delete()
+        count, _ = User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        Community.objects.filter(name__startswith=COMMUNITY_PREFIX).delete()
+    return count
+
+
+def _status_timestamps(status, rng, now):
+    """Lifecycle timestamps consistent with the request's status."""
+    choices = BorrowingRequest.StatusChoices
+    created = now - timedelta(days=rng.randint(1, 120), minutes=rng.randint(0, 1440))
+    stamps = {}
+    if status not in (choices.PENDING, choices.CANCELLED_BORROWER):
+        stamps["processed_at"] = created + timedelta(hours=rng.randint(1, 48))
+    if status in (choices.PICKED_UP, choices.RETURNED, choices.COMPLETED):
+        stamps["pickup_confirmed_at"] = stamps["processed_at"] + timedelta(hours=rng.randint(1, 72))
+    if status in (choices.RETURNED, choices.COMPLETED):
+        stamps["return_initiated_at"] = stamps["pickup_confirmed_at"] + timedelta(days=rng.randint(1, 14))
+    if status == choices.COMPLETED:
+        stamps["completed_at"] = stamps["return_initiated_at"] + timedelta(hours=rng.randint(1, 24))
+    return created.date(), stamps
+
+
+def seed(communities=5, users=500, items=1500, requests=3000, notifications=10000, seed=42, log=print):
+    """Generates the dataset with bulk_create. Returns a dict of row counts."""
+    rng = random.Random(seed)
+    now = timezone.now()
+    counts = {}
+
+    with transaction.atomic():
+        # Communities and categories
+        Community.objects.bulk_create(
+            [
+                Community(
+                    name=f"{COMMUNITY_PREFIX} {n:03d}",
+                    city=rng.choice(["Pune", "Bengaluru", "Mumbai", "Delhi"]),
+                    pincode=f"{rng.randint(110000, 560100)}",
+                    description="Synthetic community for benchmarks",
+                    is_approved=True,
+                    is_active=True,
+                )
+                for n in range(communities)
+            ]
+        )
+        community_ids = list(
+            Community.objects.filter(name__startswith=COMMUNITY_PREFIX)
+            .order_by("name")
+            .values_list("pk", flat=True)
+        )
+        for name in CATEGORIES:
+            Category.objects.get_or_create(name=name)
+        category_ids = list(Category.objects.filter(name__in=CATEGORIES).values_list("pk", flat=True))
+        counts["communities"] = len(community_ids)
+        log(f"Created {len(community_ids)} communities.")
+
+        # Users, profiles and memberships (1-3 communities each, the first is primary)
+        password = make_password(PASSWORD)  # Hashed once and shared: seeding stays fast
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f"{USERNAME_PREFIX}{n:06d}",
+                    email=f"{USERNAME_PREFIX}{n:06d}@example.com",
+                    first_name=rng.choice(["Asha", "Ravi", "Meera", "Arjun", "Priya", "Kabir"]),
+                    last_name=rng.choice(["Rao", "Iyer", "Shah", "Gupta", "Nair", "Das"]),
+                    password=password,
+                )
+                for n in range(users)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        user_ids = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .order_by("username")
+            .values_list("pk", flat=True)
+        )
+        user_communities = {
+            user_id: rng.sample(community_ids, k=min(len(community_ids), rng.choice([1, 1, 2, 3])))
+            for user_id in user_ids
+        }
+        UserProfile.objects.bulk_create(
+            [
+                UserProfile(user_id=user_id, community_id=user_communities[user_id][0])
+                for user_id in user_ids
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        UserCommunityMembership.objects.bulk_create(
+            [
+                UserCommunityMembership(
+                    user_id=user_id,
+                    community_id=community_id,
+                    is_primary=index == 0,
+                    is_verified=rng.random() < 0.7,
+                )
+                for user_id, joined in user_communities.items()
+                for index, community_id in enumerate(joined)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        counts["users"] = len(user_ids)
+        log(f"Created {len(user_ids)} users with profiles and memberships.")
+
+        # Items with 0-3 images each
+        Item.objects.bulk_create(
+            [
+                Item(
+                    owner_profile_id=owner_id,
+                    community_id=rng.choice(user_communities[owner_id]),
+                    title=f"{rng.choice(ADJECTIVES).capitalize()} {rng.choice(NOUNS)}",
+                    description="Synthetic item for benchmarks. " * rng.randint(1, 8),
+                    category_id=rng.choice(category_ids),
+                    condition=rng.choice(Item.ItemCondition.values),
+                    deposit_amount=Decimal(rng.choice([0, 100, 250, 500, 1000])),
+                    borrowing_fee=Decimal(rng.choice([0, 0, 0, 20, 50])),
+                    is_active=rng.random() < 0.95,
+                )
+                for owner_id in (rng.choice(user_ids) for _ in range(items))
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        item_rows = list(
+            Item.objects.filter(owner_profile__user__username__startswith=USERNAME_PREFIX)
+            .order_by("pk")
+            .values_list("pk", "owner_profile_id", "community_id")
+        )
+        images = []
+        for item_id, owner_id, community_id in item_rows:
+            for n in range(rng.choice([0, 1, 1, 2, 3])):
+                key = f"{IMAGE_PREFIX}items/{item_id}/{n}.jpg"
+                images.append(
+                    ItemImage(
+                        item_id=item_id,
+                        s3_key=key,
+                        variants={"source": key, "thumb": f"{key}.thumb.webp", "full": f"{key}.full.webp"},
+                    )
+                )
+        ItemImage.objects.bulk_create(images, batch_size=BATCH_SIZE)
+        counts["items"] = len(item_rows)
+        counts["images"] = len(images)
+        log(f"Created {len(item_rows)} items with {len(images)} images.")
+
+        # Borrowing requests across all statuses, between members of the same community
+        members = {}
+        for user_id, joined in user_communities.items():
+            for community_id in joined:
+                members.setdefault(community_id, []).append(user_id)
+        statuses = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+        borrowing_requests = []
+        for _ in range(requests):
+            item_id, owner_id, community_id = rng.choice(item_rows)
+            borrower_id = rng.choice(members[community_id])
+            if borrower_id == owner_id:
+                continue
+            status = rng.choices(statuses, weights)[0]
+            start_date, stamps = _status_timestamps(status, rng, now)
+            borrowing_requests.append(
+                BorrowingRequest(
+                    item_id=item_id,
+                    borrower_profile_id=borrower_id,
+                    lender_profile_id=owner_id,
+                    start_date=start_date,
+                    end_date=start_date + timedelta(days=rng.randint(1, 14)),
+                    status=status,
+                    borrower_message="Could I borrow this for the weekend?",
+                    **stamps,
+                )
+            )
+        BorrowingRequest.objects.bulk_create(borrowing_requests, batch_size=BATCH_SIZE)
+        request_rows = list(
+            BorrowingRequest.objects.filter(borrower_profile__user__username__startswith=USERNAME_PREFIX)
+            .order_by("pk")
+            .values_list("pk", "status", "item_id", "borrower_profile_id", "lender_profile_id")
+        )
+        counts["requests"] = len(request_rows)
+
+        # Reviews for most completed requests
+        reviews = [
+            Review(
+                borrowing_request_id=request_id,
+                rating_for_lender=rng.randint(3, 5),
+                comment_for_lender="Smooth handover.",
+                borrower_review_submitted_at=now,
+                rating_for_borrower=rng.randint(3, 5) if rng.random() < 0.8 else None,
+                lender_review_submitted_at=now,
+            )
+            for request_id, status, *rest in request_rows
+            if status == BorrowingRequest.StatusChoices.COMPLETED and rng.random() < 0.7
+        ]
+        Review.objects.bulk_create(reviews, batch_size=BATCH_SIZE)
+        counts["reviews"] = len(reviews)
+        log(f"Created {len(request_rows)} borrowing requests and {len(reviews)} reviews.")
+
+        # Notifications about those requests, half of them read
+        notification_rows = []
+        for _ in range(notifications if request_rows else 0):
+            request_id, status, item_id, borrower_id, lender_id = rng.choice(request_rows)
+            recipient_id, actor_id = rng.choice([(lender_id, borrower_id), (borrower_id, lender_id)])
+            notification_rows.append(
+                Notification(
+                    recipient_id=recipient_id,
+                    actor_id=actor_id,
+                    notification_type=rng.choice(NOTIFICATION_TYPES),
+                    related_request_id=request_id,
+                    related_item_id=item_id,
+                    related_user_profile_id=actor_id,
+                    is_read=rng.random() < 0.5,
+                    push_enqueued=True,  # Never pushed to real devices
+                )
+            )
+        Notification.objects.bulk_create(notification_rows, batch_size=BATCH_SIZE)
+        counts["notifications"] = len(notification_rows)
+        log(f"Created {len(notification_rows)} notifications.")
+
+    return counts
@@ -0,0 +1,280 @@
+# apps/core/testing.py
+
+from datetime import timedelta
+from itertools import count
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.communities.models import Community
+from apps.items.models import Category, Item, ItemImage
+from apps.notifications.models import Notification
+from apps.transactions.models import BorrowingRequest
+from apps.users.models import UserCommunityMembership, UserProfile
+
+User = get_user_model()
+
+# Helpers for the per-app query-count tests (apps/<app>/tests.py).
+# Every endpoint is requested once with N rows and once with 10N rows: the number
+# of queries must be the same, i.e. O(1) in the number of rows returned. The
+# views' declared query_budget is enforced on top of that by
+# QueryInstrumentationMiddleware, which raises in tests when a view goes over it.
+
+_sequence = count(1)
+
+
+def make_community(**fields):
+    n = next(_sequence)
+    fields.setdefault("name", f"Community {n}")
+    fields.setdefault("city", "Pune")
+    fields.setdefault("pincode", "411001")
+    fields.setdefault("is_approved", True)
+    fields.setdefault("is_active", True)
+    return Community.objects.create(**fields)
+
+
+def make_profile(community, *extra_communities, **user_fields):
+    """A user with a profile whose primary community is `community`."""
+    n = next(_sequence)
+    user_fields.setdefault("username", f"user{n}")
+    user_fields.setdefault("email", f"user{n}@example.com")
+    user = User.objects.create(**user_fields)
+    profile = UserProfile.objects.create(user=user, community=community)
+    UserCommunityMembership.objects.bulk_create(
+        [
+            UserCommunityMembership(user=user, community=joined, is_primary=joined == community)
+            for joined in (community, *extra_communities)
+        ]
+    )
+    return profile
+
+
+def make_category():
+    return Category.objects.create(name=f"Category {next(_sequence)}")
+
+
+def make_item(owner_profile, category, images=0, **fields):
+    fields.setdefault("community", owner_profile.community)
+    fields.setdefault("title", f"Item {next(_sequence)}")
+    item = Item.objects.create(owner_profile=owner_profile, category=category, **fields)
+    ItemImage.objects.bulk_create(
+        [
+            ItemImage(
+                item=item,
+                s3_key=f"test/items/{item.pk}/{n}.jpg",
+                variants={"thumb": f"test/items/{item.pk}/{n}.thumb.webp"},
+            )
+            for n in range(images)
+        ]
+    )
+    return item
+
+
+def make_request(item, borrower_profile, **fields):
+    """A borrowing request (and, through signals.py, its REQUEST_RECEIVED notification)."""
+    start = timezone.now().date() + timedelta(days=1)
+    fields.setdefault("start_date", start)
+    fields.setdefault("end_date", start + timedelta(days=2))
+    return BorrowingRequest.objects.create(
+        item=item,
+        borrower_profile=borrower_profile,
+        lender_profile=item.owner_profile,
+        **fields,
+    )
+
+
+class FakeS3Body:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+    def iter_chunks(self, chunk_size=1024):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+
+class FakeS3Client:
+    """
+    In-memory stand-in for the boto3 S3 client, covering the calls the app makes.
+    Objects live in `objects` (key -> {"Body", "ContentType", "LastModified", ...}).
+    Uploads to a key in `failing_keys` raise, like a failed request would.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.failing_keys = set()
+        self.delete_batches = []  # Keys of every delete_objects() call
+
+    def _missing(self, operation):
+        return ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, operation)
+
+    def _store(self, key, body, content_type=None, **extra):
+        if key in self.failing_keys:
+            raise ClientError({"Error": {"Code": "500", "Message": "Injected failure"}}, "PutObject")
+        self.objects[key] = {
+            "Body": body,
+            "ContentType": content_type or "binary/octet-stream",
+            "LastModified": timezone.now(),
+            **extra,
+        }
+
+    def put(self, key, body, content_type=None, age=None):
+        """Test helper: an object as if a client had uploaded it `age` ago."""
+        self._store(key, body, content_type)
+        if age is not None:
+            self.objects[key]["LastModified"] = timezone.now() - age
+
+    def upload_fileobj(self, file, bucket, key, ExtraArgs=None):
+        extra = dict(ExtraArgs or {})
+        self._store(key, file.read(), extra.pop("ContentType", None), **extra)
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, **kwargs):
+        self._store(Key, Body, ContentType, **kwargs)
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self._missing("GetObject")
+        obj = self.objects[Key]
+        return {"Body": FakeS3Body(obj["Body"]), "ContentType": obj["ContentType"]}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self._missing("HeadObject")
+        obj = self.objects[Key]
+        return {
+            "ContentType": obj["ContentType"],
+            "LastModified": obj["LastModified"],
+            "ContentLength": len(obj["Body"]),
+        }
+
+    def copy_object(self, Bucket, Key, CopySource, ContentType=None, MetadataDirective=None, **kwargs):
+        if CopySource["Key"] not in self.objects:
+            raise self._missing("CopyObject")
+        self._store(Key, self.objects[CopySource["Key"]]["Body"], ContentType, **kwargs)
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [obj["Key"] for obj in Delete["Objects"]]
+        self.delete_batches.append(keys)
+        for key in keys:
+            self.objects.pop(key, None)
+        return {}
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, Conditions=None, ExpiresIn=3600):
+        return {"url": f"https://{Bucket}.s3.test/", "fields": {"key": Key, **(Fields or {})}}
+
+    def generate_presigned_url(self, operation, Params=None, ExpiresIn=3600):
+        return f"https://{Params['Bucket']}.s3.test/{Params['Key']}"
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, Bucket, Prefix=""):
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        for start in range(0, len(keys), 1000):
+            yield {
+                "Contents": [
+                    {
+                        "Key": key,
+                        "LastModified": self.objects[key]["LastModified"],
+                        "Size": len(self.objects[key]["Body"]),
+                    }
+                    for key in keys[start:start + 1000]
+                ]
+            }
+
+
+def fake_s3(test_case):
+    """Makes S3ImageUploader use a new FakeS3Client for the rest of the test, and returns it."""
+    client = FakeS3Client()
+    patcher = mock.patch("apps.users.utils.get_s3_client", return_value=client)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+    return client
+
+
+def make_notifications(recipient_profile, actor_profile, item, number):
+    Notification.objects.bulk_create(
+        [
+            Notification(
+                recipient=recipient_profile,
+                actor=actor_profile,
+                notification_type=Notification.NotificationTypeChoices.REQUEST_ACCEPTED,
+                related_item=item,
+            )
+            for _ in range(number)
+        ]
+    )
+
+
+class QueryCountTestCase(APITestCase):
+    """
+    Base class for query-count tests. Subclasses call assertConstantQueries()
+    with a function that adds rows to whatever the endpoint returns.
+    """
+
+    N = 3  # Rows in the small run; the large run has 10 * N
+
+    def authenticate(self, profile):
+        """Sends a real JWT, so authentication queries are counted too."""
+        token = AccessToken.for_user(profile.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def count_queries(self, method, url, data=None, status_code=200):
+        """
+        Requests the url with cold caches and returns (response, number of queries).
+        """
+        cache.clear()  # Cached auth users and /me responses would hide queries
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertEqual(response.status_code, status_code, getattr(response, "data", None))
+        return response, len(queries)
+
+    def assertConstantQueries(self, url, add_rows, method="get", data=None, status_code=200):
+        """
+        Calls add_rows(N), requests the url, then add_rows(9 * N) and requests it
+        again: both requests must run the same number of queries.
+        Returns both responses, so callers can check the rows were really returned.
+        """
+        add_rows(self.N)
+        small, small_count = self.count_queries(method, url, data, status_code)
+        add_rows(9 * self.N)
+        large, large_count = self.count_queries(method, url, data, status_code)
+        self.assertEqual(
+            small_count,
+            large_count,
+            f"{method.upper()} {url} ran {small_count} queries with {self.N} rows "
+            f"but {large_count} with {10 * self.N} rows.",
+        )
+        return small, large
+
+    def assertActionQueries(self, run_action, add_rows):
+        """
+        For actions that change state (and can only run once per object):
+        run_action() is called on two fresh objects, one with N related rows and
+        one with 10N, and must run the same number of queries both times.
+        add_rows(number) prepares the object and returns what run_action takes.
+        """
+        counts = []
+        for number in (self.N, 10 * self.N):
+            target = add_rows(number)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                run_action(target)
+            counts.append(len(queries))
+        self.assertEqual(
+            counts[0],
+            counts[1],
+            f"The action ran {counts[0]} queries with {self.N} rows but {counts[1]} with {10 * self.N}.",
+        )
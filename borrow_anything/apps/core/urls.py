@@ -0,0 +1,12 @@
+# apps/core/urls.py
+
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    # Staff-only: stacks sampled from live requests (see middleware.SamplingProfilerMiddleware)
+    path("profiles/", views.ProfileSummaryView.as_view(), name="profile-summary"),
+    path("profiles/stacks/", views.ProfileStacksView.as_view(), name="profile-stacks"),
+    # Staff-only: connection checkouts, errors and pool stats (see dbmetrics.py)
+    path("db-metrics/", views.DatabaseMetricsView.as_view(), name="db-metrics"),
+]
@@ -0,0 +1,55 @@
+# apps/core/views.py
+
+from django.http import HttpResponse
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import dbmetrics, profiling
+
+
+class ProfileSummaryView(APIView):
+    """
+    Staff-only overview of the requests profiled by this process
+    (see SamplingProfilerMiddleware): samples and distinct stacks per view.
+    GET /api/v1/core/profiles/     -> summary
+    DELETE /api/v1/core/profiles/  -> start over
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(profiling.summary())
+
+    def delete(self, request):
+        profiling.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfileStacksView(APIView):
+    """
+    Staff-only download of the collapsed stacks, for flamegraph.pl or speedscope:
+    GET /api/v1/core/profiles/stacks/?view=GET item-list
+    Without ?view= the stacks of every view are returned, each rooted at its view.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        response = HttpResponse(
+            profiling.collapsed_stacks(request.query_params.get("view")),
+            content_type="text/plain; charset=utf-8",
+        )
+        response["Content-Disposition"] = 'attachment; filename="profile.folded"'
+        return response
+
+
+class DatabaseMetricsView(APIView):
+    """
+    Staff-only snapshot of this process's database connections per alias:
+    checkouts (new or pooled connections), errors, checkout latency percentiles,
+    psycopg pool stats when DB_POOL is on, and the number of requests served.
+    GET /api/v1/core/db-metrics/
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(dbmetrics.metrics())
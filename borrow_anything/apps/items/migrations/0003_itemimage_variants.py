@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0002_alter_item_availability_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, help_text='S3 keys of the generated size variants (thumb/medium/full)'),
+        ),
+    ]
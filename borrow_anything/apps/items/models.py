@@ -181,6 +181,12 @@ class ItemImage(models.Model):
         help_text="S3 object key for the item image",
     )
     caption = models.CharField(max_length=100, blank=True)
+    # Resized WEBP copies generated after upload (see apps/users/imaging.py)
+    variants = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="S3 keys of the generated size variants (thumb/medium/full)",
+    )
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -11,6 +11,7 @@ from apps.users.models import UserProfile # Needed for owner info later if requi
 import boto3
 from botocore.exceptions import ClientError
 from django.conf import settings
+from apps.users.imaging import pick_variant
 from apps.users.utils import S3ImageUploader
 import boto3
 from botocore.exceptions import ClientError
@@ -36,8 +37,9 @@ class ItemImageSerializer(serializers.ModelSerializer):
 
     def get_image_url(self, obj):
         """ Calls the utility function to generate the pre-signed URL. """
-        # obj is the ItemImage instance
-        return S3ImageUploader().get_image_presigned_url(obj.s3_key)
+        # obj is the ItemImage instance; detail screens get the "full" variant
+        s3_key = pick_variant(obj.s3_key, obj.variants, "full")
+        return S3ImageUploader().get_image_presigned_url(s3_key)
 class ItemSerializer(serializers.ModelSerializer):
     """ Serializer for the Item model (Detailed View) """
     # Nested read-only category info
@@ -127,14 +129,15 @@ class ItemListSerializer(serializers.ModelSerializer):
 
     # Example for getting primary image key
     def get_images(self, obj):
-        """ Gets the first associated ItemImage and generates its pre-signed URL. """
-        # obj is the Item instance
-        images_instance = ItemImage.objects.filter(item=obj) 
+        """ Generates pre-signed URLs for the item's images (thumbnail size for lists). """
+        # obj is the Item instance; images are prefetched by ItemViewSet.get_queryset
+        images_instance = obj.images.all()
         images = []
-        if images_instance.exists():
+        if images_instance:
             for image in images_instance:
+                s3_key = pick_variant(image.s3_key, image.variants, "thumb")
                 images.append(
-                    S3ImageUploader().get_image_presigned_url(image.s3_key)
+                    S3ImageUploader().get_image_presigned_url(s3_key)
                 )
             return images
         return None
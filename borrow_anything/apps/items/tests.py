@@ -1,3 +1,214 @@
-from django.test import TestCase
+# apps/items/tests.py
 
-# Create your tests here.
+import hashlib
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.core.testing import (
+    QueryCountTestCase,
+    fake_s3,
+    make_category,
+    make_community,
+    make_item,
+    make_profile,
+)
+from apps.storage.models import ContentBlob
+from apps.storage.utils import blob_key
+from .models import Item, ItemImage
+
+
+class ItemQueryCountTests(QueryCountTestCase):
+    """
+    Query counts of the item endpoints must not grow with the number of items,
+    their images or their owners' communities.
+    """
+
+    def setUp(self):
+        self.community = make_community()
+        self.other_community = make_community()
+        self.category = make_category()
+        self.profile = make_profile(self.community, self.other_community)
+        self.authenticate(self.profile)
+
+    def add_items(self, number):
+        # Every item has its own owner, belonging to two communities, and two images
+        for _ in range(number):
+            owner = make_profile(self.community, self.other_community)
+            make_item(owner, self.category, images=2)
+
+    def test_list(self):
+        small, large = self.assertConstantQueries("/api/v1/items/", self.add_items)
+        self.assertEqual(len(large.data), 10 * self.N)
+        self.assertEqual(len(large.data[0]["images"]), 2)
+        self.assertEqual(len(large.data[0]["owner"]["communities"]), 2)
+
+    def test_list_by_owner(self):
+        owner = make_profile(self.community)
+        self.assertConstantQueries(
+            f"/api/v1/items/?user_id={owner.user_id}",
+            lambda number: [make_item(owner, self.category, images=1) for _ in range(number)],
+        )
+
+    def test_detail(self):
+        owner = make_profile(self.community)
+        item = make_item(owner, self.category)
+
+        def add_images(number):
+            item.images.model.objects.bulk_create(
+                [item.images.model(item=item, s3_key=f"test/{item.pk}/{n}") for n in range(number)]
+            )
+
+        small, large = self.assertConstantQueries(f"/api/v1/items/{item.pk}/", add_images)
+        self.assertEqual(len(large.data["images"]), 10 * self.N)
+
+    def test_category_list(self):
+        self.assertConstantQueries(
+            "/api/v1/categories/",
+            lambda number: [make_category() for _ in range(number)],
+        )
+
+
+class ItemCreateWithImagesTests(APITransactionTestCase):
+    """
+    POST /items/ with image files. A transaction test case, so the test can see
+    whether a database transaction is open while the images are uploaded.
+    """
+
+    def setUp(self):
+        self.s3 = fake_s3(self)
+        self.community = make_community()
+        self.category = make_category()
+        self.profile = make_profile(self.community)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.profile.user)}")
+        self.files = [b"first image", b"second image"]
+        # Transaction test case: on_commit callbacks run, so keep variants out of it
+        patcher = mock.patch("apps.users.imaging.schedule")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create(self):
+        return self.client.post(
+            "/api/v1/items/",
+            {
+                "title": "Cordless drill",
+                "description": "18V, two batteries",
+                "category": self.category.pk,
+                "community_id": self.community.pk,
+                "images": [
+                    SimpleUploadedFile(f"{n}.jpg", data, content_type="image/jpeg")
+                    for n, data in enumerate(self.files)
+                ],
+            },
+            format="multipart",
+        )
+
+    def test_uploads_run_outside_a_transaction(self):
+        in_transaction = []
+        upload = self.s3.upload_fileobj
+
+        def record_upload(*args, **kwargs):
+            in_transaction.append(connection.in_atomic_block)
+            return upload(*args, **kwargs)
+
+        with mock.patch.object(self.s3, "upload_fileobj", side_effect=record_upload):
+            response = self.create()
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(in_transaction, [False, False])
+        item = Item.objects.get()
+        self.assertEqual(
+            sorted(item.images.values_list("s3_key", flat=True)),
+            sorted(blob_key(hashlib.sha256(data).hexdigest()) for data in self.files),
+        )
+        self.assertEqual(set(ContentBlob.objects.values_list("ref_count", flat=True)), {1})
+
+    def test_failed_upload_creates_nothing(self):
+        self.s3.failing_keys.add(blob_key(hashlib.sha256(self.files[1]).hexdigest()))
+        with self.assertRaises(Exception):
+            self.create()
+        self.assertFalse(Item.objects.exists())
+        self.assertFalse(ContentBlob.objects.exists())
+        self.assertFalse(self.s3.objects)  # The successful upload was deleted again
+
+    def test_failed_insert_releases_the_uploaded_blobs(self):
+        with mock.patch.object(ItemImage.objects, "bulk_create", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                self.create()
+        self.assertFalse(Item.objects.exists())  # Rolled back with the images
+        # Unreferenced: gc_blobs deletes the objects after the grace period
+        self.assertEqual(set(ContentBlob.objects.values_list("ref_count", flat=True)), {0})
+
+
+class ItemImageDirectUploadTests(APITestCase):
+    """POST /items/<pk>/images/intent/ and /finalize/"""
+
+    def setUp(self):
+        self.s3 = fake_s3(self)
+        self.profile = make_profile(make_community())
+        category = make_category()
+        self.item = make_item(self.profile, category)
+        self.other_item = make_item(self.profile, category)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.profile.user)}")
+        self.body = b"item photo"
+
+    def upload(self, item):
+        response = self.client.post(
+            f"/api/v1/items/{item.pk}/images/intent/",
+            {"content_type": "image/jpeg", "size": len(self.body)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.s3.put(response.data["s3_key"], self.body, "image/jpeg")
+        return response.data
+
+    def finalize(self, item, intent):
+        return self.client.post(
+            f"/api/v1/items/{item.pk}/images/finalize/",
+            {"upload_token": intent["upload_token"], "caption": "Front"},
+            format="json",
+        )
+
+    def test_finalize_creates_the_image(self):
+        response = self.finalize(self.item, self.upload(self.item))
+        self.assertEqual(response.status_code, 201, response.content)
+        image = self.item.images.get()
+        self.assertEqual(image.caption, "Front")
+        self.assertEqual(ContentBlob.objects.get(s3_key=image.s3_key).ref_count, 1)
+
+        # The same content again returns the existing image without a new reference
+        response = self.finalize(self.item, self.upload(self.item))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.item.images.count(), 1)
+        self.assertEqual(ContentBlob.objects.get(s3_key=image.s3_key).ref_count, 1)
+
+    def test_retried_finalize_returns_the_same_image(self):
+        intent = self.upload(self.item)
+        self.assertEqual(self.finalize(self.item, intent).status_code, 201)
+        response = self.finalize(self.item, intent)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["id"], self.item.images.get().pk)
+        self.assertEqual(ContentBlob.objects.get().ref_count, 1)
+
+    def test_finalize_with_duplicate_images_returns_the_first(self):
+        self.assertEqual(self.finalize(self.item, self.upload(self.item)).status_code, 201)
+        first = self.item.images.get()
+        # The multipart upload creates one row (and one reference) per uploaded file
+        ItemImage.objects.create(item=self.item, s3_key=first.s3_key)
+        ContentBlob.objects.filter(s3_key=first.s3_key).update(ref_count=2)
+
+        response = self.finalize(self.item, self.upload(self.item))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["id"], first.pk)
+        self.assertEqual(self.item.images.count(), 2)
+        self.assertEqual(ContentBlob.objects.get(s3_key=first.s3_key).ref_count, 2)
+
+    def test_token_for_another_item_takes_no_reference(self):
+        intent = self.upload(self.item)
+        response = self.finalize(self.other_item, intent)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ContentBlob.objects.exists())
+        self.assertIn(intent["s3_key"], self.s3.objects)  # Still finalizable for the right item
+        self.assertEqual(self.finalize(self.item, intent).status_code, 201)
@@ -32,4 +32,12 @@ urlpatterns = [
     path('items/<int:item_pk>/images/',
          views.ItemImageUploadView.as_view(),
          name='item-image-upload'),
+
+    # Direct-to-S3 uploads: get a presigned POST, upload to S3, then finalize
+    path('items/<int:item_pk>/images/intent/',
+         views.ItemImageUploadIntentView.as_view(),
+         name='item-image-upload-intent'),
+    path('items/<int:item_pk>/images/finalize/',
+         views.ItemImageUploadFinalizeView.as_view(),
+         name='item-image-upload-finalize'),
 ]
\ No newline at end of file
@@ -3,8 +3,13 @@
 import boto3
 from botocore.exceptions import ClientError
 from django.conf import settings
+from django.db import transaction
 import logging # Use logging instead of print for errors
 
+from apps.storage.utils import release_blobs, store_files
+from apps.users import imaging
+from .models import ItemImage
+
 logger = logging.getLogger(__name__) # Get a logger instance
 
 def generate_s3_presigned_url(s3_key: str) -> str | None:
@@ -28,7 +33,11 @@ def generate_s3_presigned_url(s3_key: str) -> str | None:
     # Create an S3 client instance
     # Ensure AWS credentials are configured (environment, ~/.aws/, IAM role)
     try:
-        s3_client = boto3.client('s3', region_name=region_name)
+        s3_client = boto3.client(
+            's3',
+            region_name=region_name,
+            endpoint_url=getattr(settings, 'AWS_S3_ENDPOINT_URL', None) or None,
+        )
 
         # Generate the pre-signed URL
         url = s3_client.generate_presigned_url(
@@ -42,4 +51,36 @@ def generate_s3_presigned_url(s3_key: str) -> str | None:
         return None
     except Exception as e:
         logger.error(f"Unexpected error during pre-signed URL generation for key {s3_key}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def create_item_images(item, s3_keys, caption=""):
+    """
+    Creates the ItemImage rows for already stored blob keys with a single
+    bulk_create; the rows take over the references store_files() took.
+    Call it inside the caller's transaction, after the (slow) uploads.
+    """
+    item_images = ItemImage.objects.bulk_create(
+        [ItemImage(item=item, s3_key=s3_key, caption=caption) for s3_key in s3_keys]
+    )
+    # Resized variants are generated in the background once this commits
+    imaging.schedule_item_images([image.pk for image in item_images])
+    return item_images
+
+
+def upload_item_images(item, image_files, caption=""):
+    """
+    Stores several image files for an item (concurrently, content-addressed, see
+    apps/storage/utils.py) and creates their ItemImage rows with a single bulk_create.
+
+    All or nothing: if any upload or the insert fails, the blob references taken
+    by this call are released again and the exception is re-raised.
+    Returns the created ItemImage instances, in the order the files were given.
+    """
+    s3_keys = store_files(image_files)  # No transaction is open during the uploads
+    try:
+        with transaction.atomic():
+            return create_item_images(item, s3_keys, caption)
+    except Exception:
+        # Blobs uploaded just now become unreferenced and are removed by gc_blobs
+        release_blobs(*s3_keys)
+        raise
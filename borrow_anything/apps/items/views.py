@@ -1,11 +1,20 @@
 # apps/items/views.py
 
 # Import necessary mixins
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, permissions, filters, mixins, generics
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.exceptions import PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
 
-from apps.users.utils import S3ImageUploader
+from apps.core.asyncviews import AsyncAPIView, aget_profile, api_response
+from apps.core.cache import get_or_set, make_key
+from apps.users.authentication import StatelessJWTAuthentication
+from apps.users.models import UserCommunityMembership
+from apps.users import imaging
+from apps.users.serializers import ImageUploadFinalizeSerializer, ImageUploadIntentSerializer
+from apps.storage.utils import release_blobs, store_files
+from apps.users.uploads import create_upload_intent, verify_upload
 
 from .models import Item, Category, ItemImage
 from .serializers import (
@@ -16,9 +25,12 @@ from .serializers import (
     CategorySerializer,
 )
 from .permissions import IsOwnerOrReadOnly
+from .utils import create_item_images, upload_item_images
 import boto3
-import uuid
 import os
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils.text import slugify  # For cleaning names for the key
 from rest_framework import generics, permissions, status
@@ -40,8 +52,27 @@ class CategoryViewSet(
 
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
+    # Most queries a request may run (see apps/core/middleware.py); pinned by tests.py
+    query_budget = {"list": 1, "retrieve": 1}
+    # Reads of these actions may go to a read replica (see apps/core/routers.py)
+    replica_actions = {"list", "retrieve"}
+    # Read-only: trust the token's claims instead of loading the user
+    authentication_classes = [StatelessJWTAuthentication, SessionAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        """
+        The category list is the same for everybody, so it is cached (see
+        apps/core/cache.py). Category saves invalidate it.
+        """
+        key = make_key("items", "categories", models=[Category])
+        data = get_or_set(
+            key,
+            lambda: list(self.get_serializer(self.get_queryset(), many=True).data),
+            settings.CATEGORIES_CACHE_TIMEOUT,
+        )
+        return Response(data)
+
 
 # Refactor ItemViewSet using GenericViewSet + Mixins
 class ItemViewSet(
@@ -63,6 +94,10 @@ class ItemViewSet(
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ["category"]
     search_fields = ["title", "description"]
+    # Most queries a request may run (see apps/core/middleware.py); pinned by tests.py
+    query_budget = {"list": 5, "retrieve": 5}
+    # Reads of these actions may go to a read replica (see apps/core/routers.py)
+    replica_actions = {"list", "retrieve"}
 
     # --- The internal logic remains the same as before ---
 
@@ -78,10 +113,20 @@ class ItemViewSet(
 
         user_id = self.request.query_params.get("user_id", None)
         
+        # Everything the nested owner profile (UserProfileSerializer) reads is
+        # loaded up front, so the number of queries does not grow with the items
         queryset = (
             Item.objects.filter(community_id__in=user_communities)
-            .select_related("owner_profile__user", "category", "community")
-            .prefetch_related("images")
+            .select_related(
+                "owner_profile__user", "owner_profile__community", "category", "community"
+            )
+            .prefetch_related(
+                "images",
+                Prefetch(
+                    "owner_profile__user__community_memberships",
+                    queryset=UserCommunityMembership.objects.select_related("community"),
+                ),
+            )
         )
 
         if user_id:
@@ -129,23 +174,24 @@ class ItemViewSet(
         
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        item_instance = serializer.instance
 
-        # Debugging breakpoint
-        # Check for 'images' in the uploaded files (handle multiple files)
+        # Upload the images first, outside any transaction, so no database
+        # transaction stays open during the S3 round trips. If an upload fails
+        # nothing is created (store_files() undoes its own uploads).
         image_files = request.FILES.getlist("images")
-        if image_files:
-            s3Helper = S3ImageUploader()
-            for image in image_files:
-                unique_id = uuid.uuid4().hex[:8]  # Short UUID for uniqueness
-                s3_key = f"items/{item_instance.pk}/{unique_id}"
-                s3Helper.upload_image(image, s3_key)
-                # Create the corresponding ItemImage record
-                ItemImage.objects.create(
-                    item=item_instance,
-                    s3_key=s3_key,
-                )
+        s3_keys = store_files(image_files) if image_files else []
+
+        # Then create the item and its image rows atomically (one bulk_create).
+        # If that fails, the blobs stored above lose their references again and
+        # are deleted by gc_blobs.
+        try:
+            with transaction.atomic():
+                self.perform_create(serializer)
+                if s3_keys:
+                    create_item_images(serializer.instance, s3_keys)
+        except Exception:
+            release_blobs(*s3_keys)
+            raise
 
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
@@ -158,6 +204,8 @@ class ItemImageUploadView(generics.CreateAPIView):
     Expects POST request with multipart/form-data containing:
     - 'image': The image file itself.
     - 'caption': (Optional) A caption for the image.
+
+    Streams the files through Django; prefer images/intent/ + images/finalize/.
     """
 
     serializer_class = ItemImageSerializer  # Used for the response serialization
@@ -183,7 +231,6 @@ class ItemImageUploadView(generics.CreateAPIView):
         """Handles the POST request with the image file upload."""
         item_pk = self.kwargs.get("item_pk")  # Get item ID from URL kwarg
         item_instance = self.get_item_object(item_pk)  # Gets item and checks permission
-        s3Helper = S3ImageUploader()  # Initialize S3 uploader
         image_file_list = request.FILES.getlist(
             "images"
         )  # 'image' is the expected field name in form-data
@@ -195,27 +242,95 @@ class ItemImageUploadView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # --- 1. Construct the S3 Key ---
+        # --- 1. Upload all files concurrently and create the ItemImage rows ---
+        # All or nothing: on any failure the uploaded objects are removed again
+        item_images = upload_item_images(item_instance, image_file_list, caption=caption)
 
-        for image_file in image_file_list:
-            unique_id = uuid.uuid4().hex[:8]  # Short UUID
-            s3_key = f"items/{item_pk}/{unique_id}"
-            
-            s3Helper.upload_image(
-                image_file, s3_key
-            )  # Upload the image to S3
+        # --- 2. Return Response ---
+        # Serialize the last created ItemImage record using the serializer defined for this view
+        response_serializer = self.get_serializer(item_images[-1])
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
-            # --- 2. Create ItemImage instance ---
-            item_image_instance = ItemImage.objects.create(
-                item=item_instance,
-                s3_key=s3_key,  # Store the generated key
-                caption=caption,
-            )
 
+class ItemImageUploadIntentView(ItemImageUploadView):
+    """
+    Step 1 of a direct-to-S3 item image upload (one request per image).
+    POST /items/<item_pk>/images/intent/ {"content_type": "image/jpeg", "size": 123456}
+    Returns a presigned POST (upload_url + fields) and an upload_token for finalize.
+    """
+
+    def post(self, request, *args, **kwargs):
+        item_instance = self.get_item_object(self.kwargs.get("item_pk"))  # Checks ownership
+        serializer = ImageUploadIntentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
+        intent = create_upload_intent(
+            request.user.id,
+            "item",
+            serializer.validated_data["content_type"],
+            serializer.validated_data["size"],
+            item_id=item_instance.pk,
+        )
+        return Response(intent, status=status.HTTP_201_CREATED)
 
 
-        # --- 3. Return Response ---
-        # Serialize the created ItemImage record using the serializer defined for this view
-        response_serializer = self.get_serializer(item_image_instance)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+class ItemImageUploadFinalizeView(AsyncAPIView):
+    """
+    Step 3 of a direct-to-S3 item image upload: verifies the uploaded object and
+    creates the ItemImage record. Uploading content the item already has returns
+    the existing image.
+    POST /items/<item_pk>/images/finalize/ {"upload_token": "...", "caption": "..."}
+    Async: checking and copying the object in S3 takes several round trips, which
+    run in a thread while the worker serves other requests.
+    """
+
+    async def get_item_object(self, request, item_pk):
+        """Async version of ItemImageUploadView.get_item_object()"""
+        user_profile = await aget_profile(request.user)
+        if not user_profile:
+            raise PermissionDenied("User profile not found.")
+        item = await Item.objects.filter(pk=item_pk).afirst()
+        if item is None:
+            raise Http404
+        if item.owner_profile_id != user_profile.pk:
+            raise PermissionDenied(
+                "You do not have permission to add images to this item."
+            )
+        return item
+
+    async def post(self, request, item_pk):
+        item_instance = await self.get_item_object(request, item_pk)  # Checks ownership
+        serializer = ImageUploadFinalizeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # item_id is checked before the upload is stored (and a blob reference taken)
+        claims = await sync_to_async(verify_upload)(
+            serializer.validated_data["upload_token"],
+            request.user.id,
+            "item",
+            item_id=item_instance.pk,
+        )
+
+        # Not get_or_create(): images added through the multipart upload can share a key,
+        # and MultipleObjectsReturned would leak the reference verify_upload() took
+        item_image_instance = await (
+            ItemImage.objects.filter(item=item_instance, s3_key=claims["s3_key"])
+            .order_by("pk")
+            .afirst()
+        )
+        created = item_image_instance is None
+        if created:
+            item_image_instance = await ItemImage.objects.acreate(
+                item=item_instance,
+                s3_key=claims["s3_key"],
+                caption=serializer.validated_data.get("caption", ""),
+            )
+            await sync_to_async(imaging.schedule_item_images)([item_image_instance.pk])  # Resized variants
+        else:
+            # The existing image already holds a reference
+            await sync_to_async(release_blobs)(claims["s3_key"])
+        # Presigns the image URLs
+        data = await sync_to_async(lambda: ItemImageSerializer(item_image_instance).data)()
+        return api_response(
+            data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
@@ -1,3 +1,86 @@
-from django.contrib import admin
+# apps/notifications/admin.py
 
-# Register your models here.
+from django.contrib import admin, messages  # Import messages for feedback
+from django.utils.translation import ngettext  # For pluralization in messages
+from .models import Device, NotificationBroadcast, NotificationDelivery
+from .broadcasts import RUNNABLE_STATUSES, start_broadcast
+
+
+@admin.register(NotificationBroadcast)
+class NotificationBroadcastAdmin(admin.ModelAdmin):
+    # Show progress of each announcement in the list view
+    list_display = (
+        "__str__",
+        "status",
+        "sent_count",
+        "total_recipients",
+        "created_by",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("message",)
+    filter_horizontal = ("communities",)
+    # Only the announcement itself is editable; everything else is set by the job
+    readonly_fields = (
+        "created_by",
+        "status",
+        "total_recipients",
+        "sent_count",
+        "last_recipient_id",
+        "error",
+        "created_at",
+        "started_at",
+        "finished_at",
+    )
+    ordering = ("-created_at",)
+    actions = ["send_pending_broadcasts"]
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        # Communities are saved here, after save_model, so start the job afterwards
+        super().save_related(request, form, formsets, change)
+        if not change:
+            start_broadcast(form.instance)
+
+    @admin.action(description="Send selected pending or failed broadcasts")
+    def send_pending_broadcasts(self, request, queryset):
+        """
+        Queues broadcasts that are still pending (e.g. after a restart) or failed;
+        failed ones resume after the last recipient they notified.
+        """
+        pending = queryset.filter(status__in=RUNNABLE_STATUSES)
+        for broadcast in pending:
+            start_broadcast(broadcast)
+        count = len(pending)
+        self.message_user(
+            request,
+            ngettext(
+                "%d broadcast was queued.",
+                "%d broadcasts were queued.",
+                count,
+            )
+            % count,
+            messages.SUCCESS,
+        )
+
+
+@admin.register(Device)
+class DeviceAdmin(admin.ModelAdmin):
+    list_display = ("owner", "provider", "is_active", "created_at", "updated_at")
+    list_filter = ("provider", "is_active")
+    search_fields = ("owner__user__username", "token")
+    raw_id_fields = ("owner",)
+
+
+@admin.register(NotificationDelivery)
+class NotificationDeliveryAdmin(admin.ModelAdmin):
+    # Read-only view of the push pipeline's state, useful for debugging failures
+    list_display = ("notification", "device", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    raw_id_fields = ("notification", "device")
+    readonly_fields = ("last_error", "sent_at", "created_at")
@@ -0,0 +1,128 @@
+# apps/notifications/broadcasts.py
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from apps.users.models import UserProfile
+from .models import Notification, NotificationBroadcast
+from . import waiters
+
+logger = logging.getLogger(__name__)
+
+# A single background worker per process: broadcasts run one after another so
+# a large fan-out never competes with request threads for more than one connection.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notification-broadcast")
+
+
+# A failed broadcast can be run again: it resumes after broadcast.last_recipient_id
+RUNNABLE_STATUSES = [
+    NotificationBroadcast.StatusChoices.PENDING,
+    NotificationBroadcast.StatusChoices.FAILED,
+]
+
+
+def get_broadcast_recipients(broadcast):
+    """Profile ids of every member of the broadcast's communities (each user once), in order."""
+    return (
+        UserProfile.objects.filter(
+            user__community_memberships__community__in=broadcast.communities.all()
+        )
+        .distinct()
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def run_broadcast(broadcast_id):
+    """
+    Fans a broadcast out to all recipients.
+    Recipient ids are streamed from a server-side cursor in id order and written
+    with chunked bulk_create. Each chunk commits together with the broadcast's
+    progress (sent_count, last_recipient_id), so running a failed broadcast again
+    continues where it stopped instead of notifying anyone twice.
+    """
+    chunk_size = settings.NOTIFICATION_BROADCAST_CHUNK_SIZE
+
+    # Claim the job so two workers never send the same broadcast
+    claimed = NotificationBroadcast.objects.filter(
+        pk=broadcast_id, status__in=RUNNABLE_STATUSES
+    ).update(
+        status=NotificationBroadcast.StatusChoices.RUNNING,
+        started_at=timezone.now(),
+        finished_at=None,
+        error="",
+    )
+    if not claimed:
+        logger.info(f"Broadcast {broadcast_id} is not pending, skipping.")
+        return
+
+    broadcast = NotificationBroadcast.objects.get(pk=broadcast_id)
+    try:
+        recipients = get_broadcast_recipients(broadcast)
+        # Recipients before last_recipient_id were notified by an earlier run
+        remaining = recipients.filter(pk__gt=broadcast.last_recipient_id)
+        sent = broadcast.sent_count
+        broadcast.total_recipients = sent + remaining.count()
+        broadcast.save(update_fields=["total_recipients"])
+
+        params = {"variant": "broadcast", "broadcast_id": broadcast.pk}
+        recipient_ids = remaining.iterator(chunk_size=chunk_size)
+        while chunk := list(islice(recipient_ids, chunk_size)):
+            with transaction.atomic():
+                Notification.objects.bulk_create(
+                    [
+                        Notification(
+                            recipient_id=recipient_id,
+                            notification_type=Notification.NotificationTypeChoices.GENERAL_INFO,
+                            params=params,
+                        )
+                        for recipient_id in chunk
+                    ]
+                )
+                sent += len(chunk)
+                NotificationBroadcast.objects.filter(pk=broadcast.pk).update(
+                    sent_count=sent, last_recipient_id=chunk[-1]
+                )
+            # bulk_create sends no post_save signals, so wake long-poll waiters here
+            for recipient_id in chunk:
+                waiters.wake(recipient_id)
+
+        broadcast.sent_count = sent
+        broadcast.status = NotificationBroadcast.StatusChoices.COMPLETED
+        broadcast.finished_at = timezone.now()
+        broadcast.save(update_fields=["sent_count", "status", "finished_at"])
+        logger.info(f"Broadcast {broadcast.pk} sent to {sent} recipients.")
+    except Exception as e:
+        logger.error(f"Broadcast {broadcast.pk} failed: {e}")
+        NotificationBroadcast.objects.filter(pk=broadcast.pk).update(
+            status=NotificationBroadcast.StatusChoices.FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+        )
+        raise
+
+
+def _run_in_background(broadcast_id):
+    close_old_connections()
+    try:
+        run_broadcast(broadcast_id)
+    except Exception:
+        pass  # Already logged and recorded on the broadcast
+    finally:
+        close_old_connections()
+
+
+def start_broadcast(broadcast):
+    """
+    Queues the broadcast on the background worker once the current transaction
+    commits (so its communities are saved). Broadcasts left pending, e.g. because
+    the process restarted first, can be sent with `python manage.py run_broadcasts`;
+    failed ones are resumed with `python manage.py run_broadcasts --failed`.
+    """
+    broadcast_id = broadcast.pk
+    transaction.on_commit(lambda: _executor.submit(_run_in_background, broadcast_id))
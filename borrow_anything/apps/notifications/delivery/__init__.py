@@ -0,0 +1,4 @@
+# apps/notifications/delivery/__init__.py
+
+# Push delivery of notifications to registered devices.
+# Runs in the deliver_notifications management command, never inside a request.
@@ -0,0 +1,195 @@
+# apps/notifications/delivery/pipeline.py
+
+import asyncio
+import logging
+import random
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Device, Notification, NotificationDelivery
+from ..rendering import render_messages
+from .providers import PushMessage, PushResult, get_provider
+
+logger = logging.getLogger(__name__)
+
+# The pipeline has two steps, both run by `python manage.py deliver_notifications`:
+#   1. enqueue_new_notifications(): one NotificationDelivery per (new notification,
+#      active device of its recipient).
+#   2. deliver_due(): sends due deliveries grouped per provider, in batches, with
+#      bounded concurrency, and records the outcome (sent / retry later / failed).
+# Nothing here runs inside a request; views and signals only write Notification rows.
+# Rows are not locked while sending, so run a single worker.
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff with jitter: the delay doubles with every attempt (capped),
+    and a random half of it is added so failed pushes don't all retry at once.
+    """
+    delay = min(
+        settings.NOTIFICATION_PUSH_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+        settings.NOTIFICATION_PUSH_RETRY_MAX_DELAY,
+    )
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def enqueue_new_notifications(limit=1000):
+    """
+    Creates deliveries for up to `limit` notifications that have not been queued
+    yet and marks them as queued. Returns the number of deliveries created.
+    """
+    notifications = list(
+        Notification.objects.filter(push_enqueued=False)
+        .order_by("id")
+        .values_list("id", "recipient_id", "is_read")[:limit]
+    )
+    if not notifications:
+        return 0
+
+    devices_by_owner = defaultdict(list)
+    devices = Device.objects.filter(
+        owner_id__in={recipient_id for _, recipient_id, _ in notifications},
+        is_active=True,
+        provider__in=settings.NOTIFICATION_PUSH_PROVIDERS,  # Skip unconfigured providers
+    ).values_list("id", "owner_id")
+    for device_id, owner_id in devices:
+        devices_by_owner[owner_id].append(device_id)
+
+    deliveries = [
+        NotificationDelivery(notification_id=notification_id, device_id=device_id)
+        for notification_id, recipient_id, is_read in notifications
+        if not is_read  # Already seen in the app, no need to push it
+        for device_id in devices_by_owner[recipient_id]
+    ]
+    with transaction.atomic():
+        NotificationDelivery.objects.bulk_create(deliveries, ignore_conflicts=True)
+        # update() leaves last_occurred_at alone, so long-poll clients don't see a change
+        Notification.objects.filter(pk__in=[row[0] for row in notifications]).update(
+            push_enqueued=True
+        )
+    return len(deliveries)
+
+
+def _build_message(delivery):
+    notification = delivery.notification
+    return PushMessage(
+        delivery_id=delivery.pk,
+        token=delivery.device.token,
+        title=notification.get_notification_type_display(),
+        body=notification.rendered_message,
+        data={
+            "notification_id": notification.pk,
+            "notification_type": notification.notification_type,
+            "related_request_id": notification.related_request_id,
+            "related_item_id": notification.related_item_id,
+        },
+    )
+
+
+async def _send_batches(batches, concurrency, timeout):
+    """Sends (provider, messages) batches with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(provider, messages):
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(provider.send_batch(messages), timeout)
+            except Exception as e:
+                # The whole batch failed (network error, timeout): retry each message
+                error = str(e) or e.__class__.__name__
+                logger.warning(f"Push batch of {len(messages)} failed: {error}")
+                return {
+                    message.delivery_id: PushResult(PushResult.RETRY, error)
+                    for message in messages
+                }
+
+    results = {}
+    for batch_results in await asyncio.gather(
+        *(send(provider, messages) for provider, messages in batches)
+    ):
+        results.update(batch_results)
+    return results
+
+
+def deliver_due(limit=None, concurrency=None):
+    """
+    Sends up to `limit` due deliveries and records their outcome.
+    Returns counts: {"sent": ..., "retry": ..., "failed": ...}.
+    """
+    limit = limit or settings.NOTIFICATION_PUSH_BATCH_LIMIT
+    concurrency = concurrency or settings.NOTIFICATION_PUSH_CONCURRENCY
+    stats = {"sent": 0, "retry": 0, "failed": 0}
+    now = timezone.now()
+
+    # Deliveries queued before their device was deactivated will never be sent
+    stats["failed"] += NotificationDelivery.objects.filter(
+        status=NotificationDelivery.StatusChoices.PENDING, device__is_active=False
+    ).update(status=NotificationDelivery.StatusChoices.FAILED, last_error="Device inactive")
+
+    deliveries = list(
+        NotificationDelivery.objects.filter(
+            status=NotificationDelivery.StatusChoices.PENDING,
+            next_attempt_at__lte=now,
+        )
+        .select_related("device", "notification")
+        .order_by("next_attempt_at")[:limit]
+    )
+    if not deliveries:
+        return stats
+
+    # Render all texts in one batched pass (see rendering.py)
+    render_messages([delivery.notification for delivery in deliveries])
+
+    # Group per provider, then split into batches the provider accepts
+    messages_by_provider = defaultdict(list)
+    for delivery in deliveries:
+        messages_by_provider[delivery.device.provider].append(_build_message(delivery))
+    batches = []
+    for provider_name, messages in messages_by_provider.items():
+        provider = get_provider(provider_name)
+        size = provider.max_batch_size
+        for start in range(0, len(messages), size):
+            batches.append((provider, messages[start:start + size]))
+
+    results = asyncio.run(
+        _send_batches(batches, concurrency, settings.NOTIFICATION_PUSH_TIMEOUT)
+    )
+
+    # Record the outcomes
+    now = timezone.now()
+    invalid_device_ids = set()
+    for delivery in deliveries:
+        result = results.get(delivery.pk) or PushResult(
+            PushResult.RETRY, "No result from provider"
+        )
+        delivery.attempts += 1
+        delivery.last_error = result.error
+        if result.outcome == PushResult.SENT:
+            delivery.status = NotificationDelivery.StatusChoices.SENT
+            delivery.sent_at = now
+            stats["sent"] += 1
+        elif result.outcome == PushResult.INVALID_TOKEN:
+            delivery.status = NotificationDelivery.StatusChoices.FAILED
+            invalid_device_ids.add(delivery.device_id)
+            stats["failed"] += 1
+        elif delivery.attempts >= settings.NOTIFICATION_PUSH_MAX_ATTEMPTS:
+            delivery.status = NotificationDelivery.StatusChoices.FAILED
+            stats["failed"] += 1
+        else:
+            delivery.next_attempt_at = now + retry_delay(delivery.attempts)
+            stats["retry"] += 1
+
+    with transaction.atomic():
+        NotificationDelivery.objects.bulk_update(
+            deliveries,
+            ["status", "attempts", "last_error", "sent_at", "next_attempt_at"],
+            batch_size=500,
+        )
+        if invalid_device_ids:
+            Device.objects.filter(pk__in=invalid_device_ids).update(is_active=False)
+
+    return stats
@@ -0,0 +1,95 @@
+# apps/notifications/delivery/providers.py
+
+import asyncio
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class PushMessage:
+    """A single push to one device token."""
+
+    def __init__(self, delivery_id, token, title, body, data=None):
+        self.delivery_id = delivery_id
+        self.token = token
+        self.title = title
+        self.body = body
+        self.data = data or {}
+
+
+class PushResult:
+    """Outcome of sending one PushMessage."""
+
+    SENT = "sent"
+    RETRY = "retry"  # Temporary failure (timeout, rate limit, provider 5xx)
+    INVALID_TOKEN = "invalid_token"  # The device is gone; stop sending to it
+
+    def __init__(self, outcome, error=""):
+        self.outcome = outcome
+        self.error = error
+
+
+class BasePushProvider:
+    """
+    Interface for push providers (FCM, APNs, ...).
+    Subclasses implement send_batch() as a coroutine; the pipeline calls it for up
+    to `max_batch_size` messages at a time, several batches concurrently.
+    """
+
+    # Largest batch the provider's API accepts in one call
+    max_batch_size = 500
+
+    async def send_batch(self, messages):
+        """
+        Sends the messages and returns {delivery_id: PushResult}.
+        Messages missing from the result are treated as temporary failures.
+        """
+        raise NotImplementedError
+
+
+class LocalStubProvider(BasePushProvider):
+    """
+    In-memory provider for development and tests: nothing leaves the process.
+    Tokens starting with "invalid" are rejected as invalid and tokens starting
+    with "retry" fail temporarily, so both failure paths can be exercised.
+    """
+
+    max_batch_size = 100
+
+    # Every message "sent" in this process, for inspection in tests
+    outbox = []
+
+    def __init__(self, latency=0):
+        self.latency = latency  # Simulated round trip per batch, in seconds
+
+    async def send_batch(self, messages):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        results = {}
+        for message in messages:
+            if message.token.startswith("invalid"):
+                results[message.delivery_id] = PushResult(
+                    PushResult.INVALID_TOKEN, "Unregistered token"
+                )
+            elif message.token.startswith("retry"):
+                results[message.delivery_id] = PushResult(
+                    PushResult.RETRY, "Simulated temporary failure"
+                )
+            else:
+                self.outbox.append(message)
+                results[message.delivery_id] = PushResult(PushResult.SENT)
+        return results
+
+
+@lru_cache(maxsize=None)
+def get_provider(name):
+    """
+    Returns the provider instance for a Device.provider code, as configured in
+    settings.NOTIFICATION_PUSH_PROVIDERS ({"FCM": "dotted.path.ProviderClass"}).
+    """
+    try:
+        path = settings.NOTIFICATION_PUSH_PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"No push provider configured for '{name}'.")
+    return import_string(path)()
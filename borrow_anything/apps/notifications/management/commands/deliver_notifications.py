@@ -0,0 +1,69 @@
+# apps/notifications/management/commands/deliver_notifications.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.notifications.delivery.pipeline import deliver_due, enqueue_new_notifications
+
+
+class Command(BaseCommand):
+    """
+    Push delivery worker: queues new notifications for the recipients' devices and
+    sends due deliveries (including retries).
+    Run once from cron, or as a long-running process:
+        python manage.py deliver_notifications --loop --interval 5
+    """
+
+    help = "Send push notifications for new notifications and retry failed ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running, checking for work every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to sleep between runs when idle (with --loop).",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Deliveries sent per run (default: NOTIFICATION_PUSH_BATCH_LIMIT).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Provider batches in flight at once (default: NOTIFICATION_PUSH_CONCURRENCY).",
+        )
+
+    def run_once(self, options):
+        queued = enqueue_new_notifications()
+        stats = deliver_due(limit=options["limit"], concurrency=options["concurrency"])
+        if queued or any(stats.values()) or not options["loop"]:
+            self.stdout.write(
+                f"Queued {queued} deliveries; sent {stats['sent']}, "
+                f"retrying {stats['retry']}, failed {stats['failed']}."
+            )
+        return queued or stats["sent"] or stats["retry"] or stats["failed"]
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            self.run_once(options)
+            return
+
+        self.stdout.write(self.style.SUCCESS("Push delivery worker started."))
+        try:
+            while True:
+                close_old_connections()
+                did_work = self.run_once(options)
+                if not did_work:
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Push delivery worker stopped.")
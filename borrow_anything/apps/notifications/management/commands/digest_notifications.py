@@ -0,0 +1,114 @@
+# apps/notifications/management/commands/digest_notifications.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from apps.notifications.models import Notification
+from apps.notifications.utils import COALESCED_TYPES
+
+
+class Command(BaseCommand):
+    """
+    Periodic digest: collapses each recipient's unread notifications of the same
+    type into a single row carrying the total event count.
+    Intended to be run from cron, e.g. every hour:
+        python manage.py digest_notifications --older-than 60
+    """
+
+    help = "Merge unread notifications of the same type per recipient into digest rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=60,
+            help="Only digest notifications that have been unread for at least this many minutes.",
+        )
+        parser.add_argument(
+            "--types",
+            nargs="+",
+            default=[str(t) for t in COALESCED_TYPES],
+            help="Notification type codes to digest (e.g. REQ_REC REV_REC).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be merged without changing anything.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["older_than"])
+        candidates = Notification.objects.filter(
+            is_read=False,
+            created_at__lt=cutoff,
+            notification_type__in=options["types"],
+        )
+
+        # One row per (recipient, type) that has more than one unread notification
+        groups = (
+            candidates.values("recipient_id", "notification_type")
+            .annotate(rows=Count("id"), events=Sum("occurrence_count"))
+            .filter(rows__gt=1)
+            .order_by()
+        )
+
+        digested_groups = 0
+        removed_rows = 0
+        for group in groups.iterator():
+            if options["dry_run"]:
+                self.stdout.write(
+                    f"Would merge {group['rows']} notifications ({group['events']} events) "
+                    f"of type {group['notification_type']} for user {group['recipient_id']}"
+                )
+                digested_groups += 1
+                removed_rows += group["rows"] - 1
+                continue
+
+            with transaction.atomic():
+                rows = list(
+                    candidates.select_for_update()
+                    .filter(
+                        recipient_id=group["recipient_id"],
+                        notification_type=group["notification_type"],
+                    )
+                    .order_by("-created_at")
+                )
+                if len(rows) < 2:
+                    continue  # Read or merged by someone else in the meantime
+
+                # Keep the newest row and fold the others into it
+                digest, merged = rows[0], rows[1:]
+                single_item = len({row.related_item_id for row in rows}) == 1
+
+                digest.occurrence_count = sum(row.occurrence_count for row in rows)
+                # "many" renders e.g. "5 people requested X"; "digest" is item-agnostic
+                digest.params = {"variant": "many" if single_item else "digest"}
+                digest.message = ""  # Render from the template, not legacy text
+                if not single_item:
+                    digest.related_item = None
+                    digest.related_request = None
+                digest.save(
+                    update_fields=[
+                        "occurrence_count",
+                        "params",
+                        "message",
+                        "related_item",
+                        "related_request",
+                        "updated_at",
+                    ]
+                )
+                Notification.objects.filter(pk__in=[row.pk for row in merged]).delete()
+
+            digested_groups += 1
+            removed_rows += len(merged)
+
+        prefix = "[dry run] " if options["dry_run"] else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}Digested {digested_groups} groups, removed {removed_rows} notifications."
+            )
+        )
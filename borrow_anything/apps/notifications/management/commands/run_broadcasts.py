@@ -0,0 +1,51 @@
+# apps/notifications/management/commands/run_broadcasts.py
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications.broadcasts import RUNNABLE_STATUSES, run_broadcast
+from apps.notifications.models import NotificationBroadcast
+
+
+class Command(BaseCommand):
+    """
+    Sends pending community announcements in the foreground.
+    Broadcasts are normally sent by a background worker in the web process;
+    this command picks up any that were left pending (e.g. the process restarted
+    before the job ran) and can also be run from cron.
+        python manage.py run_broadcasts
+    With --failed it also resumes failed broadcasts after their last notified recipient.
+    """
+
+    help = "Send all pending notification broadcasts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "ids",
+            nargs="*",
+            type=int,
+            help="Only send these broadcasts (default: all pending).",
+        )
+        parser.add_argument(
+            "--failed",
+            action="store_true",
+            help="Also resume failed broadcasts (recipients already notified are skipped).",
+        )
+
+    def handle(self, *args, **options):
+        statuses = (
+            RUNNABLE_STATUSES if options["failed"] else [NotificationBroadcast.StatusChoices.PENDING]
+        )
+        pending = NotificationBroadcast.objects.filter(status__in=statuses).order_by("created_at")
+        if options["ids"]:
+            pending = pending.filter(pk__in=options["ids"])
+
+        sent = failed = 0
+        for broadcast_id in pending.values_list("pk", flat=True):
+            try:
+                run_broadcast(broadcast_id)
+                sent += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"Broadcast {broadcast_id} failed: {e}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} broadcasts, {failed} failed."))
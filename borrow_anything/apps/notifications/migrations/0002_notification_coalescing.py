@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-19 00:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0002_alter_item_availability_status'),
+        ('notifications', '0001_initial'),
+        ('transactions', '0002_remove_review_id_and_more'),
+        ('users', '0007_alter_userprofile_average_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='occurrence_count',
+            field=models.PositiveIntegerField(default=1, help_text='How many events have been merged into this notification.'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='When the notification was last merged or updated.'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'notification_type', 'related_item', 'is_read'], name='notificatio_recipie_f615e2_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notification_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='params',
+            field=models.JSONField(blank=True, default=dict, help_text='Structured values (e.g. template variant, decline reason) used to render the message.'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='message',
+            field=models.TextField(blank=True, default='', help_text="Free-form text. Leave empty to render the message from the type's template."),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.7 on 2026-10-19 00:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notification_broadcast'),
+        ('users', '0007_alter_userprofile_average_rating'),
+    ]
+
+    operations = [
+        # Existing notifications are marked as already queued so the first run of
+        # deliver_notifications does not push the whole history; new rows default to False.
+        migrations.AddField(
+            model_name='notification',
+            name='push_enqueued',
+            field=models.BooleanField(db_index=True, default=True, help_text='Has this notification been queued for push delivery?'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='push_enqueued',
+            field=models.BooleanField(db_index=True, default=False, help_text='Has this notification been queued for push delivery?'),
+        ),
+        migrations.CreateModel(
+            name='Device',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('FCM', 'Firebase Cloud Messaging'), ('APNS', 'Apple Push Notification service'), ('STUB', 'Local stub (development/testing)')], max_length=10)),
+                ('token', models.CharField(help_text='Push token issued to the app by the provider.', max_length=512)),
+                ('is_active', models.BooleanField(db_index=True, default=True, help_text='Inactive devices (e.g. invalid tokens) receive no pushes.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='devices', to='users.userprofile')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('provider', 'token')},
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time the next attempt may run.')),
+                ('last_error', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='notifications.device')),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='notifications.notification')),
+            ],
+            options={
+                'verbose_name_plural': 'Notification Deliveries',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='notificatio_status_e1aed1_idx')],
+                'unique_together': {('notification', 'device')},
+            },
+        ),
+    ]
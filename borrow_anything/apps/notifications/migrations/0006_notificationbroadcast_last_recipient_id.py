@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_push_delivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationbroadcast',
+            name='last_recipient_id',
+            field=models.PositiveIntegerField(default=0, help_text='Profile id of the last recipient notified so far.'),
+        ),
+    ]
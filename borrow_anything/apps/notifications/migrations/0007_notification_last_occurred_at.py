@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:17
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_updated_at(apps, schema_editor):
+    """Existing rows were last merged at most at updated_at: start from there."""
+    Notification = apps.get_model("notifications", "Notification")
+    Notification.objects.update(last_occurred_at=F("updated_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_notificationbroadcast_last_recipient_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='last_occurred_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When the latest event merged into this notification happened.'),
+        ),
+        migrations.RunPython(copy_updated_at, migrations.RunPython.noop),
+    ]
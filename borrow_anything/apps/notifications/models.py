@@ -2,6 +2,7 @@
 
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _  # For choices text
 
 # Import related models - use settings.AUTH_USER_MODEL indirectly via UserProfile
@@ -61,7 +62,18 @@ class Notification(models.Model):
         related_name="triggered_notifications",
         help_text="The user profile who performed the action causing the notification (optional).",
     )
-    message = models.TextField(help_text="The main content/text of the notification.")
+    # Most notifications only store their type and params; the text is rendered at
+    # read time from per-type templates (see rendering.py).
+    message = models.TextField(
+        blank=True,
+        default="",
+        help_text="Free-form text. Leave empty to render the message from the type's template.",
+    )
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Structured values (e.g. template variant, decline reason) used to render the message.",
+    )
     notification_type = models.CharField(
         max_length=20,
         choices=NotificationTypeChoices.choices,
@@ -76,6 +88,21 @@ class Notification(models.Model):
     created_at = models.DateTimeField(
         auto_now_add=True, db_index=True, help_text="When the notification was created."
     )
+    # --- Coalescing ---
+    # Repeated events of the same type for the same recipient and item are merged
+    # into a single row (e.g. "5 people requested X") instead of one row per event.
+    occurrence_count = models.PositiveIntegerField(
+        default=1,
+        help_text="How many events have been merged into this notification.",
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, help_text="When the notification was last merged or updated."
+    )
+    # Only moved forward when an event is merged into the row (see utils.create_notification),
+    # so live clients re-send it; marking it read or digesting it leaves this alone
+    last_occurred_at = models.DateTimeField(
+        default=timezone.now, help_text="When the latest event merged into this notification happened."
+    )
 
     # --- Optional Links to Related Objects ---
     # Use string paths 'app_name.ModelName' to avoid circular imports
@@ -108,12 +135,24 @@ class Notification(models.Model):
     # Add FK for related Review if needed:
     # related_review = models.ForeignKey('transactions.Review', ...)
 
+    # --- Push delivery ---
+    # Set once the deliver_notifications worker has created a NotificationDelivery
+    # for each of the recipient's devices (see delivery/pipeline.py).
+    push_enqueued = models.BooleanField(
+        default=False,
+        db_index=True,
+        help_text="Has this notification been queued for push delivery?",
+    )
+
     class Meta:
         ordering = ["-created_at"]  # Show newest first by default
         indexes = [
             models.Index(
                 fields=["recipient", "is_read", "-created_at"]
             ),  # Index for fetching user's unread notifications
+            models.Index(
+                fields=["recipient", "notification_type", "related_item", "is_read"]
+            ),  # Index for finding an unread notification to coalesce into
         ]
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
@@ -121,3 +160,138 @@ class Notification(models.Model):
     def __str__(self):
         read_status = "Read" if self.is_read else "Unread"
         return f"To: {self.recipient.user.username} - Type: {self.get_notification_type_display()} ({read_status})"
+
+
+class NotificationBroadcast(models.Model):
+    """
+    An announcement sent to every resident (via UserCommunityMembership) of one or
+    more communities. The fan-out runs as a background job; the notification rows
+    only reference the broadcast, so the text is stored once.
+    """
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "PENDING", _("Pending")
+        RUNNING = "RUNNING", _("Running")
+        COMPLETED = "COMPLETED", _("Completed")
+        FAILED = "FAILED", _("Failed")
+
+    message = models.TextField(help_text="The announcement shown to every recipient.")
+    communities = models.ManyToManyField(
+        "communities.Community",
+        related_name="notification_broadcasts",
+        help_text="Residents of these communities receive the announcement.",
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="notification_broadcasts",
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+        db_index=True,
+    )
+    # Progress reporting
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    # Recipients are notified in profile id order; written in the same transaction
+    # as each chunk of notifications, so a failed job resumes after the last one
+    last_recipient_id = models.PositiveIntegerField(
+        default=0, help_text="Profile id of the last recipient notified so far."
+    )
+    error = models.TextField(blank=True, help_text="Failure reason, if the job failed.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Broadcast #{self.pk} ({self.get_status_display()}, {self.sent_count}/{self.total_recipients})"
+
+    @property
+    def progress(self):
+        """Percentage of recipients notified so far."""
+        if not self.total_recipients:
+            return 100 if self.status == self.StatusChoices.COMPLETED else 0
+        return round(100 * self.sent_count / self.total_recipients)
+
+
+class Device(models.Model):
+    """
+    A mobile/web push target registered by a user.
+    Tokens that the provider reports as invalid are deactivated, not deleted.
+    """
+
+    class ProviderChoices(models.TextChoices):
+        FCM = "FCM", _("Firebase Cloud Messaging")
+        APNS = "APNS", _("Apple Push Notification service")
+        STUB = "STUB", _("Local stub (development/testing)")
+
+    owner = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,  # A user's devices go with their profile
+        related_name="devices",
+    )
+    provider = models.CharField(max_length=10, choices=ProviderChoices.choices)
+    token = models.CharField(
+        max_length=512, help_text="Push token issued to the app by the provider."
+    )
+    is_active = models.BooleanField(
+        default=True,
+        db_index=True,
+        help_text="Inactive devices (e.g. invalid tokens) receive no pushes.",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ["provider", "token"]
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.get_provider_display()} device of user {self.owner_id}"
+
+
+class NotificationDelivery(models.Model):
+    """
+    Delivery state of one notification to one device, including retry bookkeeping.
+    """
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "PENDING", _("Pending")  # Waiting for its (next) attempt
+        SENT = "SENT", _("Sent")
+        FAILED = "FAILED", _("Failed")  # Gave up: invalid token or out of retries
+
+    notification = models.ForeignKey(
+        Notification, on_delete=models.CASCADE, related_name="deliveries"
+    )
+    device = models.ForeignKey(
+        Device, on_delete=models.CASCADE, related_name="deliveries"
+    )
+    status = models.CharField(
+        max_length=10, choices=StatusChoices.choices, default=StatusChoices.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now, help_text="Earliest time the next attempt may run."
+    )
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ["notification", "device"]
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"]
+            ),  # Index for picking up due deliveries
+        ]
+        verbose_name_plural = "Notification Deliveries"
+
+    def __str__(self):
+        return f"Notification {self.notification_id} -> device {self.device_id} ({self.status})"
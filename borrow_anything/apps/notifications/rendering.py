@@ -0,0 +1,169 @@
+# apps/notifications/rendering.py
+
+import string
+
+from django.contrib.auth import get_user_model
+
+from apps.items.models import Item
+from .models import Notification, NotificationBroadcast
+
+User = get_user_model()
+NotificationType = Notification.NotificationTypeChoices
+
+# Fallbacks used when a referenced user or item no longer exists
+UNKNOWN_USER = "Someone"
+UNKNOWN_ITEM = "an item"
+
+
+class MessageTemplate:
+    """
+    A notification message template compiled once at import time.
+    `fields` lists the placeholders it uses, so only those values are built
+    when rendering.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.fields = frozenset(
+            field for _, field, _, _ in string.Formatter().parse(text) if field
+        )
+
+    def render(self, values):
+        return self.text.format_map(values)
+
+
+# Templates are keyed by (notification_type, variant). The variant comes from
+# params["variant"], or is "many" when several events were coalesced into the row.
+# Placeholders:
+#   {actor}        username of notification.actor
+#   {item}         title of notification.related_item
+#   {related_user} username of notification.related_user_profile
+#   {count}        notification.occurrence_count
+#   {reason}       params["reason"]
+#   {type_label}   human-readable notification type
+#   {announcement} text of the NotificationBroadcast in params["broadcast_id"]
+MESSAGE_TEMPLATES = {
+    (NotificationType.REQUEST_RECEIVED, None): "{actor} requested to borrow your item: {item}",
+    (NotificationType.REQUEST_RECEIVED, "many"): "{count} people requested to borrow your item: {item}",
+    (NotificationType.REQUEST_ACCEPTED, None): "Your request for '{item}' was accepted by {actor}.",
+    (NotificationType.REQUEST_DECLINED, None): "Your request for '{item}' was declined by {actor}.",
+    (NotificationType.REQUEST_DECLINED, "with_reason"): "Your request for '{item}' was declined by {actor}. Reason: {reason}",
+    (NotificationType.REQUEST_CANCELLED_BORROWER, None): "{actor} cancelled their request for your item: {item}",
+    (NotificationType.REQUEST_CANCELLED_BORROWER, "many"): "{count} people cancelled their requests for your item: {item}",
+    (NotificationType.PICKUP_CONFIRMED, None): "{actor} confirmed pickup for your item: {item}",
+    (NotificationType.RETURN_CONFIRMED_BORROWER, None): "{actor} marked '{item}' as returned. Please confirm receipt.",
+    (NotificationType.REQUEST_COMPLETED, None): "Your borrowing of '{item}' is complete. Please leave a review for {actor}!",
+    (NotificationType.REQUEST_COMPLETED, "lender"): "You marked the borrowing of '{item}' by {related_user} as complete. Please leave a review!",
+    (NotificationType.REVIEW_RECEIVED, None): "{actor} left a review for your transaction regarding '{item}'.",
+    (NotificationType.REVIEW_RECEIVED, "many"): "You received {count} new reviews regarding '{item}'.",
+    (NotificationType.GENERAL_INFO, "broadcast"): "{announcement}",
+}
+MESSAGE_TEMPLATES = {key: MessageTemplate(text) for key, text in MESSAGE_TEMPLATES.items()}
+
+# Used for digests spanning several items and for types without a template
+DIGEST_TEMPLATE = MessageTemplate("You have {count} new notifications: {type_label}")
+DEFAULT_TEMPLATE = MessageTemplate("{type_label}")
+
+
+def get_template(notification):
+    """Picks the compiled template for a notification based on its type and params."""
+    variant = (notification.params or {}).get("variant")
+    if variant is None and notification.occurrence_count > 1:
+        variant = "many"
+    if variant == "digest":
+        return DIGEST_TEMPLATE
+    template = MESSAGE_TEMPLATES.get((notification.notification_type, variant))
+    if template is None and variant == "many":
+        return DIGEST_TEMPLATE
+    return (
+        template
+        or MESSAGE_TEMPLATES.get((notification.notification_type, None))
+        or DEFAULT_TEMPLATE
+    )
+
+
+def _template_values(notification, fields):
+    """Builds the placeholder values a template needs for one notification."""
+    values = {}
+    if "actor" in fields:
+        values["actor"] = notification.actor_username or UNKNOWN_USER
+    if "item" in fields:
+        values["item"] = notification.related_item_title or UNKNOWN_ITEM
+    if "related_user" in fields:
+        values["related_user"] = notification.related_user_username or UNKNOWN_USER
+    if "count" in fields:
+        values["count"] = notification.occurrence_count
+    if "reason" in fields:
+        values["reason"] = (notification.params or {}).get("reason", "")
+    if "type_label" in fields:
+        values["type_label"] = notification.get_notification_type_display()
+    if "announcement" in fields:
+        values["announcement"] = notification.announcement or ""
+    return values
+
+
+def render_messages(notifications):
+    """
+    Renders the message text of a page of notifications in one batched pass.
+    All referenced usernames, item titles and broadcast texts are resolved with
+    one query each, regardless of the page size.
+    Sets `rendered_message`, `actor_username`, `related_item_title` and
+    `related_user_username` on every notification.
+    """
+    notifications = list(notifications)
+    profile_ids = set()
+    item_ids = set()
+    broadcast_ids = set()
+    for notification in notifications:
+        # Profiles/items are also exposed as convenience fields by the serializer
+        if notification.actor_id:
+            profile_ids.add(notification.actor_id)
+        if notification.related_user_profile_id:
+            profile_ids.add(notification.related_user_profile_id)
+        if notification.related_item_id:
+            item_ids.add(notification.related_item_id)
+        if not notification.message and (notification.params or {}).get("broadcast_id"):
+            broadcast_ids.add(notification.params["broadcast_id"])
+
+    # UserProfile's primary key is the user id, so usernames come straight from User
+    usernames = (
+        dict(User.objects.filter(pk__in=profile_ids).values_list("pk", "username"))
+        if profile_ids
+        else {}
+    )
+    titles = (
+        dict(Item.objects.filter(pk__in=item_ids).values_list("pk", "title"))
+        if item_ids
+        else {}
+    )
+    announcements = (
+        dict(
+            NotificationBroadcast.objects.filter(pk__in=broadcast_ids).values_list(
+                "pk", "message"
+            )
+        )
+        if broadcast_ids
+        else {}
+    )
+
+    for notification in notifications:
+        notification.actor_username = usernames.get(notification.actor_id)
+        notification.related_item_title = titles.get(notification.related_item_id)
+        notification.related_user_username = usernames.get(
+            notification.related_user_profile_id
+        )
+        notification.announcement = announcements.get(
+            (notification.params or {}).get("broadcast_id")
+        )
+
+        if notification.message:
+            # Free-form text (admin messages, rows written before templates existed)
+            notification.rendered_message = notification.message
+            continue
+
+        template = get_template(notification)
+        notification.rendered_message = template.render(
+            _template_values(notification, template.fields)
+        )
+
+    return notifications
@@ -1,46 +1,48 @@
 # apps/notifications/serializers.py
 
+from django.db import transaction
 from rest_framework import serializers
 
 # Import models from relevant apps
-from .models import Notification
-from apps.users.models import UserProfile
-# Import related models if needed for source lookups
-# from apps.transactions.models import BorrowingRequest
-# from apps.items.models import Item
-
-# Optional: Basic serializer for the 'actor' field
-class ActorProfileSerializer(serializers.ModelSerializer):
-    """ Basic representation of the user profile who acted """
-    username = serializers.CharField(source='user.username', read_only=True)
-    # TODO: Add profile picture URL later if needed (using pre-signed URL logic)
-    # profile_picture_url = serializers.SerializerMethodField()
+from apps.communities.models import Community
+from .models import Device, Notification, NotificationBroadcast
+from .rendering import render_messages
 
-    class Meta:
-        model = UserProfile
-        fields = ['user_id', 'username'] # user_id is the PK (user.id)
 
+class NotificationListSerializer(serializers.ListSerializer):
+    """
+    Renders the messages for a whole page of notifications in one batched pass
+    (one query for usernames, one for item titles) before serializing each row.
+    """
+
+    def to_representation(self, data):
+        notifications = data.all() if hasattr(data, "all") else data
+        return super().to_representation(render_messages(notifications))
 
 
 class NotificationSerializer(serializers.ModelSerializer):
     """
     Serializer for the Notification model.
     Formats notification data and allows updating the 'is_read' status.
+    Message text and convenience names come from rendering.render_messages().
     """
     # Nested representation of the actor (optional, can be null)
-    actor = ActorProfileSerializer(read_only=True, allow_null=True)
+    actor = serializers.SerializerMethodField()
+    # Rendered from the notification type's template at read time
+    message = serializers.SerializerMethodField()
     # Human-readable version of the notification type
     notification_type_display = serializers.CharField(source='get_notification_type_display', read_only=True)
 
     # Include IDs of related objects for frontend linking/context
-    related_request_id = serializers.IntegerField(source='related_request.id', read_only=True, allow_null=True)
-    related_item_id = serializers.IntegerField(source='related_item.id', read_only=True, allow_null=True)
-    related_item_title = serializers.CharField(source='related_item.title', read_only=True, allow_null=True) # Convenience
-    related_user_profile_id = serializers.IntegerField(source='related_user_profile.id', read_only=True, allow_null=True)
-    related_user_username = serializers.CharField(source='related_user_profile.user.username', read_only=True, allow_null=True) # Convenience
+    related_request_id = serializers.IntegerField(read_only=True, allow_null=True)
+    related_item_id = serializers.IntegerField(read_only=True, allow_null=True)
+    related_item_title = serializers.SerializerMethodField() # Convenience
+    related_user_profile_id = serializers.IntegerField(read_only=True, allow_null=True)
+    related_user_username = serializers.SerializerMethodField() # Convenience
 
     class Meta:
         model = Notification
+        list_serializer_class = NotificationListSerializer
         fields = [
             'id',
             'actor', # Nested actor info
@@ -48,6 +50,7 @@ class NotificationSerializer(serializers.ModelSerializer):
             'notification_type', # The code (e.g., 'REQ_ACC')
             'notification_type_display', # Human-readable (e.g., 'Request Accepted')
             'is_read', # Writable via PATCH
+            'occurrence_count', # Number of events merged into this notification
             'created_at',
             # Related object IDs and convenience fields
             'related_request_id',
@@ -60,9 +63,103 @@ class NotificationSerializer(serializers.ModelSerializer):
         # Most fields are read-only except for 'is_read' which we want to update
         read_only_fields = [
             'id', 'actor', 'message', 'notification_type',
-            'notification_type_display', 'created_at',
+            'notification_type_display', 'occurrence_count', 'created_at',
             'related_request_id', 'related_item_id', 'related_item_title',
             'related_user_profile_id', 'related_user_username',
         ]
         # 'is_read' is intentionally NOT read-only to allow PATCH updates
 
+    def _rendered(self, obj):
+        """Single-object serialization (e.g. PATCH responses) renders on demand."""
+        if not hasattr(obj, "rendered_message"):
+            render_messages([obj])
+        return obj
+
+    def get_actor(self, obj):
+        if obj.actor_id is None:
+            return None
+        return {"user_id": obj.actor_id, "username": self._rendered(obj).actor_username}
+
+    def get_message(self, obj):
+        return self._rendered(obj).rendered_message
+
+    def get_related_item_title(self, obj):
+        return self._rendered(obj).related_item_title
+
+    def get_related_user_username(self, obj):
+        return self._rendered(obj).related_user_username
+
+
+class NotificationBroadcastSerializer(serializers.ModelSerializer):
+    """
+    Serializer for community announcements (staff only).
+    On create only 'message' and 'community_ids' are accepted; the remaining
+    fields report the progress of the background fan-out.
+    """
+    community_ids = serializers.PrimaryKeyRelatedField(
+        source='communities',
+        queryset=Community.objects.all(),
+        many=True,
+        allow_empty=False,
+    )
+    created_by = serializers.StringRelatedField(read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progress = serializers.IntegerField(read_only=True) # Percentage of recipients notified
+
+    class Meta:
+        model = NotificationBroadcast
+        fields = [
+            'id',
+            'message',
+            'community_ids',
+            'created_by',
+            'status',
+            'status_display',
+            'total_recipients',
+            'sent_count',
+            'progress',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = [
+            'id', 'created_by', 'status', 'status_display', 'total_recipients',
+            'sent_count', 'progress', 'error', 'created_at', 'started_at', 'finished_at',
+        ]
+
+
+class DeviceSerializer(serializers.ModelSerializer):
+    """
+    Serializer for registering push devices.
+    Registering a token the current user already has reactivates it. A token that
+    is active for another user is rejected: knowing a token must not be enough to
+    receive someone else's pushes. The app deletes its device on logout, which
+    frees the token for the next user of a shared device; tokens the provider
+    reported as invalid (inactive devices) can be registered again by anyone.
+    """
+
+    class Meta:
+        model = Device
+        fields = ['id', 'provider', 'token', 'is_active', 'created_at']
+        read_only_fields = ['id', 'is_active', 'created_at']
+        validators = []  # (provider, token) uniqueness is handled by create() below
+
+    def create(self, validated_data):
+        owner = validated_data['owner']
+        with transaction.atomic():
+            device, created = Device.objects.select_for_update().get_or_create(
+                provider=validated_data['provider'],
+                token=validated_data['token'],
+                defaults={'owner': owner},
+            )
+            if created:
+                return device
+            if device.owner_id != owner.pk and device.is_active:
+                raise serializers.ValidationError(
+                    {'token': 'This device is registered to another account.'}
+                )
+            device.owner = owner
+            device.is_active = True
+            device.save(update_fields=['owner', 'is_active', 'updated_at'])
+        return device
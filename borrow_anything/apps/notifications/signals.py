@@ -0,0 +1,18 @@
+# apps/notifications/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Notification
+from . import waiters
+
+
+@receiver(post_save, sender=Notification)
+def wake_notification_waiters(sender, instance: Notification, **kwargs):
+    """
+    Wakes long-poll requests waiting on the recipient once the new (or coalesced)
+    notification is committed and therefore visible to their query.
+    """
+    recipient_id = instance.recipient_id
+    transaction.on_commit(lambda: waiters.wake(recipient_id))
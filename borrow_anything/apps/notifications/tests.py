@@ -1,3 +1,558 @@
-from django.test import TestCase
+# apps/notifications/tests.py
 
-# Create your tests here.
+import asyncio
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.core.testing import (
+    QueryCountTestCase,
+    make_category,
+    make_community,
+    make_item,
+    make_notifications,
+    make_profile,
+    make_request,
+)
+from .delivery import pipeline
+from .delivery.providers import LocalStubProvider, get_provider
+from .models import Device, Notification, NotificationBroadcast, NotificationDelivery
+from .broadcasts import run_broadcast
+from .rendering import render_messages
+from .utils import create_notification
+from . import waiters
+
+NotificationType = Notification.NotificationTypeChoices
+
+
+class NotificationQueryCountTests(QueryCountTestCase):
+    """Query counts of the notification endpoints must not grow with the rows returned."""
+
+    def setUp(self):
+        self.community = make_community()
+        self.category = make_category()
+        self.profile = make_profile(self.community)
+        self.authenticate(self.profile)
+
+    def add_notifications(self, number):
+        # A mix of rendered templates: requests by different users for different items
+        for _ in range(number):
+            other = make_profile(self.community)
+            item = make_item(self.profile, self.category)
+            make_request(item, other)  # REQUEST_RECEIVED via signals.py
+            make_notifications(self.profile, other, item, 1)
+
+    def test_list(self):
+        small, large = self.assertConstantQueries("/api/v1/notifications/", self.add_notifications)
+        self.assertEqual(len(large.data), 20 * self.N)
+        self.assertTrue(all(row["message"] for row in large.data))
+
+    def test_wait_returns_pending_notifications(self):
+        small, large = self.assertConstantQueries(
+            "/api/v1/notifications/wait/?since=0&timeout=0", self.add_notifications
+        )
+        self.assertEqual(len(large.json()), 20 * self.N)
+
+    def test_mark_all_read(self):
+        self.assertConstantQueries(
+            "/api/v1/notifications/mark-all-read/", self.add_notifications, method="post"
+        )
+
+    def test_device_list(self):
+        def add_devices(number):
+            Device.objects.bulk_create(
+                [
+                    Device(owner=self.profile, provider=Device.ProviderChoices.STUB, token=f"{self.profile.pk}-{n}-{number}")
+                    for n in range(number)
+                ]
+            )
+
+        self.assertConstantQueries("/api/v1/notifications/devices/", add_devices)
+
+    def test_broadcast_list(self):
+        self.profile.user.is_staff = True
+        self.profile.user.save()
+        communities = [self.community, make_community()]
+
+        def add_broadcasts(number):
+            for _ in range(number):
+                broadcast = NotificationBroadcast.objects.create(
+                    message="Water supply off tomorrow", created_by=self.profile.user
+                )
+                broadcast.communities.set(communities)
+
+        small, large = self.assertConstantQueries("/api/v1/notifications/broadcasts/", add_broadcasts)
+        self.assertEqual(len(large.data[0]["community_ids"]), 2)
+
+
+class NotificationWaitTests(APITestCase):
+    """GET /notifications/wait/ (long-poll)."""
+
+    def setUp(self):
+        community = make_community()
+        self.profile = make_profile(community)
+        self.other = make_profile(community)
+        self.item = make_item(self.other, make_category())
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.profile.user)}"}
+
+    async def wait(self, timeout, since=0):
+        response = await self.async_client.get(
+            f"/api/v1/notifications/wait/?since={since}&timeout={timeout}", headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    async def test_keeps_waiting_after_a_wake_up_without_new_rows(self):
+        async def notify_later():
+            await asyncio.sleep(0.05)
+            waiters.wake(self.profile.pk)  # Nothing new for this request
+            await asyncio.sleep(0.05)
+            await sync_to_async(make_notifications)(self.profile, self.other, self.item, 1)
+            waiters.wake(self.profile.pk)
+
+        task = asyncio.create_task(notify_later())
+        data = await self.wait(timeout=5)
+        await task
+        self.assertEqual(len(data), 1)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)  # The read wake-up costs one more query
+    async def test_notification_marked_read_while_waiting_is_not_returned(self):
+        notify = sync_to_async(Notification.objects.create)
+        seen = await notify(recipient=self.profile, notification_type=NotificationType.REQUEST_ACCEPTED)
+
+        async def read_then_notify():
+            await asyncio.sleep(0.05)
+            response = await self.async_client.patch(
+                f"/api/v1/notifications/{seen.pk}/",
+                {"is_read": True},
+                content_type="application/json",
+                headers=self.headers,
+            )
+            self.assertEqual(response.status_code, 200)
+            waiters.wake(self.profile.pk)  # on_commit never runs inside a TestCase
+            await asyncio.sleep(0.05)
+            new = await notify(recipient=self.profile, notification_type=NotificationType.REQUEST_ACCEPTED)
+            waiters.wake(self.profile.pk)
+            return new
+
+        task = asyncio.create_task(read_then_notify())
+        data = await self.wait(timeout=5, since=seen.pk)
+        new = await task
+        self.assertEqual([row["id"] for row in data], [new.pk])
+
+    async def test_returns_an_empty_list_on_timeout(self):
+        self.assertEqual(await self.wait(timeout=0.1), [])
+
+
+@override_settings(NOTIFICATION_STREAM_MAX_DURATION=0)  # One round of events, then the stream ends
+class NotificationStreamTests(APITestCase):
+    """GET /notifications/stream/ (server-sent events)."""
+
+    def setUp(self):
+        community = make_community()
+        self.profile = make_profile(community)
+        other = make_profile(community)
+        item = make_item(other, make_category())
+        make_notifications(self.profile, other, item, 3)
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.profile.user)}"}
+
+    async def get_events(self, url, **headers):
+        response = await self.async_client.get(url, headers={**self.headers, **headers})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertTrue(body.startswith("retry: "))
+        return [
+            int(block.split("\n")[0].removeprefix("id: "))
+            for block in body.split("\n\n")
+            if block.startswith("id: ")
+        ]
+
+    async def test_sends_pending_notifications(self):
+        ids = await self.get_events("/api/v1/notifications/stream/?since=0")
+        expected = await sync_to_async(list)(self.profile.notifications.values_list("id", flat=True))
+        self.assertEqual(sorted(ids), sorted(expected))
+
+        # A reconnecting EventSource resumes after the last event it received
+        first = min(ids)
+        resumed = await self.get_events("/api/v1/notifications/stream/", **{"Last-Event-ID": str(first)})
+        self.assertEqual(sorted(resumed), sorted(set(ids) - {first}))
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get("/api/v1/notifications/stream/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], 'Bearer realm="api"')
+
+
+@override_settings(NOTIFICATION_COALESCE_WINDOW=3600)
+class CoalescingTests(TestCase):
+    """create_notification() merging repeated events, and the digest_notifications command."""
+
+    def setUp(self):
+        community = make_community()
+        self.owner = make_profile(community)
+        self.borrowers = [make_profile(community) for _ in range(3)]
+        category = make_category()
+        self.item = make_item(self.owner, category)
+        self.other_item = make_item(self.owner, category)
+
+    def notify(self, actor, item=None, notification_type=NotificationType.REQUEST_RECEIVED):
+        return create_notification(
+            recipient_id=self.owner.pk,
+            notification_type=notification_type,
+            actor_id=actor.pk,
+            related_item_id=(item or self.item).pk,
+        )
+
+    def test_repeated_events_are_merged(self):
+        first = self.notify(self.borrowers[0])
+        merged = self.notify(self.borrowers[1])
+        self.assertEqual(merged.pk, first.pk)
+        merged.refresh_from_db()
+        self.assertEqual(merged.occurrence_count, 2)
+        self.assertEqual(merged.actor_id, self.borrowers[1].pk)  # The latest event
+        self.assertEqual(self.owner.notifications.count(), 1)
+
+    def test_events_are_merged_per_item_and_type(self):
+        self.notify(self.borrowers[0])
+        self.notify(self.borrowers[1], item=self.other_item)
+        self.notify(self.borrowers[2], notification_type=NotificationType.REQUEST_ACCEPTED)
+        self.assertEqual(self.owner.notifications.count(), 3)
+
+    def test_read_notifications_are_not_merged_into(self):
+        first = self.notify(self.borrowers[0])
+        Notification.objects.filter(pk=first.pk).update(is_read=True)
+        self.assertNotEqual(self.notify(self.borrowers[1]).pk, first.pk)
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=0)
+    def test_coalescing_can_be_turned_off(self):
+        self.notify(self.borrowers[0])
+        self.notify(self.borrowers[1])
+        self.assertEqual(self.owner.notifications.count(), 2)
+
+    def digest(self, *args):
+        out = StringIO()
+        call_command("digest_notifications", "--older-than", "0", *args, stdout=out)
+        return out.getvalue()
+
+    def test_digest_merges_unread_notifications_per_type(self):
+        self.notify(self.borrowers[0])
+        self.notify(self.borrowers[1])  # Coalesced into the first row: 2 events
+        self.notify(self.borrowers[2], item=self.other_item)
+
+        output = self.digest("--dry-run")
+        self.assertIn("Would merge 2 notifications (3 events)", output)
+        self.assertEqual(self.owner.notifications.count(), 2)
+
+        self.assertIn("Digested 1 groups, removed 1 notifications.", self.digest())
+        digest = self.owner.notifications.get()
+        self.assertEqual(digest.occurrence_count, 3)
+        # Spans two items, so it renders with the item-agnostic digest template
+        self.assertEqual(digest.params, {"variant": "digest"})
+        self.assertIsNone(digest.related_item_id)
+
+    def test_digest_leaves_read_and_recent_notifications_alone(self):
+        self.notify(self.borrowers[0])
+        read = self.notify(self.borrowers[1], item=self.other_item)
+        Notification.objects.filter(pk=read.pk).update(is_read=True)
+        self.notify(self.borrowers[2], item=self.other_item)
+
+        out = StringIO()
+        call_command("digest_notifications", stdout=out)  # Only rows unread for an hour
+        self.assertIn("Digested 0 groups", out.getvalue())
+        self.assertIn("Digested 0 groups", self.digest("--types", "REQ_ACC"))
+        self.assertIn("Digested 1 groups", self.digest())
+        self.assertEqual(self.owner.notifications.count(), 2)  # Digest row + the read one
+
+
+class RenderingTests(TestCase):
+    """Messages rendered at read time from the per-type templates (rendering.py)."""
+
+    def setUp(self):
+        community = make_community()
+        self.owner = make_profile(community, username="owner")
+        self.borrower = make_profile(community, username="asha")
+        self.item = make_item(self.owner, make_category(), title="Cordless drill")
+
+    def render(self, **fields):
+        fields.setdefault("recipient", self.owner)
+        fields.setdefault("actor", self.borrower)
+        fields.setdefault("related_item", self.item)
+        notification = Notification.objects.create(**fields)
+        return render_messages([notification])[0].rendered_message
+
+    def test_type_templates(self):
+        self.assertEqual(
+            self.render(notification_type=NotificationType.REQUEST_RECEIVED),
+            "asha requested to borrow your item: Cordless drill",
+        )
+        self.assertEqual(
+            self.render(notification_type=NotificationType.REQUEST_ACCEPTED),
+            "Your request for 'Cordless drill' was accepted by asha.",
+        )
+
+    def test_variants(self):
+        self.assertEqual(
+            self.render(notification_type=NotificationType.REQUEST_RECEIVED, occurrence_count=5),
+            "5 people requested to borrow your item: Cordless drill",
+        )
+        self.assertEqual(
+            self.render(
+                notification_type=NotificationType.REQUEST_DECLINED,
+                params={"variant": "with_reason", "reason": "Away that week"},
+            ),
+            "Your request for 'Cordless drill' was declined by asha. Reason: Away that week",
+        )
+        self.assertEqual(
+            self.render(
+                notification_type=NotificationType.REQUEST_RECEIVED,
+                occurrence_count=4,
+                params={"variant": "digest"},
+            ),
+            "You have 4 new notifications: New Borrow Request Received",
+        )
+        # No "many" template for this type: falls back to the digest text
+        self.assertEqual(
+            self.render(notification_type=NotificationType.PICKUP_CONFIRMED, occurrence_count=2),
+            "You have 2 new notifications: Item Pickup Confirmed",
+        )
+
+    def test_fallbacks(self):
+        self.assertEqual(
+            self.render(notification_type=NotificationType.REQUEST_RECEIVED, actor=None, related_item=None),
+            "Someone requested to borrow your item: an item",
+        )
+        self.assertEqual(
+            self.render(notification_type=NotificationType.COMMUNITY_SUGGESTION_APPROVED),
+            "Community Suggestion Approved",
+        )
+        # Free-form text wins over the template
+        self.assertEqual(
+            self.render(notification_type=NotificationType.GENERAL_INFO, message="Welcome!"),
+            "Welcome!",
+        )
+
+    def test_broadcast_text_is_looked_up(self):
+        broadcast = NotificationBroadcast.objects.create(message="Water supply off tomorrow")
+        self.assertEqual(
+            self.render(
+                notification_type=NotificationType.GENERAL_INFO,
+                params={"variant": "broadcast", "broadcast_id": broadcast.pk},
+            ),
+            "Water supply off tomorrow",
+        )
+
+
+@override_settings(NOTIFICATION_BROADCAST_CHUNK_SIZE=2)
+class BroadcastTests(TestCase):
+    """Background fan-out of announcements (broadcasts.py)."""
+
+    def setUp(self):
+        community = make_community()
+        self.residents = [make_profile(community) for _ in range(5)]
+        make_profile(make_community())  # Not a member: never notified
+        self.broadcast = NotificationBroadcast.objects.create(message="Water supply off tomorrow")
+        self.broadcast.communities.set([community])
+
+    def notified(self):
+        return sorted(
+            Notification.objects.filter(params__broadcast_id=self.broadcast.pk).values_list(
+                "recipient_id", flat=True
+            )
+        )
+
+    def test_notifies_every_member_once(self):
+        run_broadcast(self.broadcast.pk)
+        self.broadcast.refresh_from_db()
+        self.assertEqual(self.broadcast.status, NotificationBroadcast.StatusChoices.COMPLETED)
+        self.assertEqual((self.broadcast.sent_count, self.broadcast.total_recipients), (5, 5))
+        self.assertEqual(self.notified(), sorted(profile.pk for profile in self.residents))
+
+    def test_failed_broadcast_resumes_without_duplicates(self):
+        bulk_create = Notification.objects.bulk_create
+        calls = []
+
+        def fail_second_chunk(objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Notification.objects, "bulk_create", side_effect=fail_second_chunk):
+            with self.assertRaises(RuntimeError), self.assertLogs("apps.notifications.broadcasts", "ERROR"):
+                run_broadcast(self.broadcast.pk)
+        self.broadcast.refresh_from_db()
+        self.assertEqual(self.broadcast.status, NotificationBroadcast.StatusChoices.FAILED)
+        self.assertEqual(self.broadcast.sent_count, 2)
+        self.assertEqual(len(self.notified()), 2)
+
+        # Pending broadcasts only by default; --failed resumes after the last recipient
+        call_command("run_broadcasts", stdout=StringIO())
+        self.assertEqual(len(self.notified()), 2)
+        call_command("run_broadcasts", "--failed", stdout=StringIO())
+        self.broadcast.refresh_from_db()
+        self.assertEqual(self.broadcast.status, NotificationBroadcast.StatusChoices.COMPLETED)
+        self.assertEqual((self.broadcast.sent_count, self.broadcast.total_recipients), (5, 5))
+        self.assertEqual(self.broadcast.error, "")
+        self.assertEqual(self.notified(), sorted(profile.pk for profile in self.residents))
+
+
+class RecordingStubProvider(LocalStubProvider):
+    """The local stub provider with tiny batches, remembering the size of each batch."""
+
+    max_batch_size = 2
+    batch_sizes = []
+
+    async def send_batch(self, messages):
+        self.batch_sizes.append(len(messages))
+        return await super().send_batch(messages)
+
+
+@override_settings(
+    NOTIFICATION_PUSH_PROVIDERS={"STUB": "apps.notifications.tests.RecordingStubProvider"},
+    NOTIFICATION_PUSH_MAX_ATTEMPTS=3,
+    NOTIFICATION_PUSH_RETRY_BASE_DELAY=30,
+    NOTIFICATION_PUSH_RETRY_MAX_DELAY=100,
+)
+class PushDeliveryTests(TestCase):
+    """The push pipeline (delivery/pipeline.py) against the local stub provider."""
+
+    def setUp(self):
+        get_provider.cache_clear()
+        self.addCleanup(get_provider.cache_clear)
+        RecordingStubProvider.outbox.clear()
+        RecordingStubProvider.batch_sizes.clear()
+        community = make_community()
+        self.profile = make_profile(community)
+        self.actor = make_profile(community)
+        self.item = make_item(self.actor, make_category())
+
+    def add_device(self, token, **fields):
+        return Device.objects.create(
+            owner=self.profile, provider=Device.ProviderChoices.STUB, token=token, **fields
+        )
+
+    def notify(self, number=1):
+        make_notifications(self.profile, self.actor, self.item, number)
+
+    def make_due(self):
+        NotificationDelivery.objects.update(next_attempt_at=timezone.now())
+
+    def test_sends_new_notifications_in_batches(self):
+        self.add_device("phone")
+        self.add_device("tablet")
+        self.add_device("old-phone", is_active=False)
+        self.notify(2)
+        Notification.objects.create(
+            recipient=self.profile,
+            notification_type=NotificationType.GENERAL_INFO,
+            is_read=True,  # Already seen: not pushed
+        )
+
+        self.assertEqual(pipeline.enqueue_new_notifications(), 4)  # 2 unread x 2 active devices
+        self.assertFalse(Notification.objects.filter(push_enqueued=False).exists())
+        self.assertEqual(pipeline.enqueue_new_notifications(), 0)  # Queued once only
+
+        self.assertEqual(pipeline.deliver_due(), {"sent": 4, "retry": 0, "failed": 0})
+        self.assertEqual(sorted(RecordingStubProvider.batch_sizes), [2, 2])
+        self.assertEqual(len(RecordingStubProvider.outbox), 4)
+        message = RecordingStubProvider.outbox[0]
+        self.assertEqual(message.body, f"Your request for '{self.item.title}' was accepted by {self.actor.user.username}.")
+        self.assertFalse(
+            NotificationDelivery.objects.exclude(status=NotificationDelivery.StatusChoices.SENT).exists()
+        )
+
+    def test_temporary_failures_back_off_until_out_of_attempts(self):
+        self.add_device("retry-phone")
+        self.notify()
+        pipeline.enqueue_new_notifications()
+
+        before = timezone.now()
+        self.assertEqual(pipeline.deliver_due(), {"sent": 0, "retry": 1, "failed": 0})
+        delivery = NotificationDelivery.objects.get()
+        self.assertEqual((delivery.status, delivery.attempts), (NotificationDelivery.StatusChoices.PENDING, 1))
+        # First retry after 15-30s (half the base delay plus jitter)
+        delay = (delivery.next_attempt_at - before).total_seconds()
+        self.assertTrue(15 <= delay <= 31, delay)
+        self.assertEqual(pipeline.deliver_due(), {"sent": 0, "retry": 0, "failed": 0})  # Not due yet
+
+        self.make_due()
+        self.assertEqual(pipeline.deliver_due()["retry"], 1)
+        self.make_due()
+        self.assertEqual(pipeline.deliver_due()["failed"], 1)  # Third attempt: gives up
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.attempts), (NotificationDelivery.StatusChoices.FAILED, 3))
+        self.assertEqual(delivery.last_error, "Simulated temporary failure")
+
+    def test_retry_delay_doubles_up_to_the_maximum(self):
+        with mock.patch.object(pipeline.random, "uniform", side_effect=lambda low, high: high):
+            delays = [pipeline.retry_delay(attempts).total_seconds() for attempts in range(1, 6)]
+        self.assertEqual(delays, [30, 60, 100, 100, 100])
+
+    @override_settings(NOTIFICATION_PUSH_TIMEOUT=0.01)
+    def test_timed_out_batches_are_retried(self):
+        self.add_device("phone")
+        self.notify()
+        pipeline.enqueue_new_notifications()
+        with mock.patch.object(get_provider("STUB"), "latency", 1):
+            with self.assertLogs("apps.notifications.delivery.pipeline", "WARNING"):
+                self.assertEqual(pipeline.deliver_due(), {"sent": 0, "retry": 1, "failed": 0})
+        self.assertEqual(RecordingStubProvider.outbox, [])
+
+    def test_dead_tokens_deactivate_the_device(self):
+        dead = self.add_device("invalid-phone")
+        self.add_device("phone")
+        self.notify()
+        pipeline.enqueue_new_notifications()
+
+        self.assertEqual(pipeline.deliver_due(), {"sent": 1, "retry": 0, "failed": 1})
+        dead.refresh_from_db()
+        self.assertFalse(dead.is_active)
+        self.assertEqual(
+            NotificationDelivery.objects.get(device=dead).status, NotificationDelivery.StatusChoices.FAILED
+        )
+
+        # Later notifications are no longer queued for it
+        self.notify()
+        self.assertEqual(pipeline.enqueue_new_notifications(), 1)
+
+
+class DeviceRegistrationTests(APITestCase):
+    """POST /notifications/devices/"""
+
+    def setUp(self):
+        community = make_community()
+        self.profile = make_profile(community)
+        self.other = make_profile(community)
+
+    def register(self, profile, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(profile.user)}")
+        return self.client.post(
+            "/api/v1/notifications/devices/", {"provider": "STUB", "token": token}, format="json"
+        )
+
+    def test_registering_again_reactivates_the_device(self):
+        self.assertEqual(self.register(self.profile, "phone").status_code, 201)
+        Device.objects.update(is_active=False)
+        self.assertEqual(self.register(self.profile, "phone").status_code, 201)
+        device = Device.objects.get()
+        self.assertTrue(device.is_active)
+        self.assertEqual(device.owner, self.profile)
+
+    def test_cannot_take_over_another_users_device(self):
+        self.register(self.profile, "phone")
+        response = self.register(self.other, "phone")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("token", response.data)
+        self.assertEqual(Device.objects.get().owner, self.profile)
+
+    def test_dead_tokens_can_be_registered_by_anyone(self):
+        self.register(self.profile, "phone")
+        Device.objects.update(is_active=False)  # The provider reported the token invalid
+        self.assertEqual(self.register(self.other, "phone").status_code, 201)
+        self.assertEqual(Device.objects.get().owner, self.other)
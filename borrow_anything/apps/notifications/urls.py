@@ -27,4 +27,44 @@ urlpatterns = [
              'post': 'mark_all_read',
          }),
          name='notification-mark-all-read'),
+
+    # Staff announcements to whole communities: '/notifications/broadcasts/'
+    path('notifications/broadcasts/',
+         views.NotificationBroadcastViewSet.as_view({
+             'get': 'list',
+             'post': 'create',
+         }),
+         name='notification-broadcast-list'),
+
+    # Progress of a single announcement: '/notifications/broadcasts/<pk>/'
+    path('notifications/broadcasts/<int:pk>/',
+         views.NotificationBroadcastViewSet.as_view({
+             'get': 'retrieve',
+         }),
+         name='notification-broadcast-detail'),
+
+    # Push devices of the logged-in user: '/notifications/devices/'
+    path('notifications/devices/',
+         views.DeviceViewSet.as_view({
+             'get': 'list',
+             'post': 'create',
+         }),
+         name='notification-device-list'),
+
+    # Unregister a device (e.g. on logout): '/notifications/devices/<pk>/'
+    path('notifications/devices/<int:pk>/',
+         views.DeviceViewSet.as_view({
+             'delete': 'destroy',
+         }),
+         name='notification-device-detail'),
+
+    # Long-poll until a new notification arrives: '/notifications/wait/?since=<id>&timeout='
+    path('notifications/wait/',
+         views.wait_for_notifications,
+         name='notification-wait'),
+
+    # Server-sent events stream of new notifications: '/notifications/stream/?since=<id>'
+    path('notifications/stream/',
+         views.stream_notifications,
+         name='notification-stream'),
 ]
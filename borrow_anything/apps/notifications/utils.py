@@ -0,0 +1,110 @@
+# apps/notifications/utils.py
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification
+from . import waiters
+
+logger = logging.getLogger(__name__)
+
+NotificationType = Notification.NotificationTypeChoices
+
+# Notification types that are merged per (recipient, type, item) while the existing
+# row is still unread and inside the coalescing window. The merged row renders with
+# the type's "many" template (e.g. "5 people requested to borrow your item: X").
+COALESCED_TYPES = {
+    NotificationType.REQUEST_RECEIVED,
+    NotificationType.REQUEST_CANCELLED_BORROWER,
+    NotificationType.REVIEW_RECEIVED,
+}
+
+
+def create_notification(
+    recipient_id,
+    notification_type,
+    actor_id=None,
+    related_request_id=None,
+    related_item_id=None,
+    related_user_profile_id=None,
+    params=None,
+    message="",
+):
+    """
+    Creates a Notification, or merges the event into a recent unread notification
+    of the same type for the same recipient and item.
+    Takes ids rather than instances so callers don't load related rows just to
+    write a notification; the text is rendered at read time (see rendering.py).
+    Returns the created or updated Notification instance.
+    """
+    fields = dict(
+        recipient_id=recipient_id,
+        notification_type=notification_type,
+        actor_id=actor_id,
+        related_request_id=related_request_id,
+        related_item_id=related_item_id,
+        related_user_profile_id=related_user_profile_id,
+        params=params or {},
+        message=message,
+    )
+    window = getattr(settings, "NOTIFICATION_COALESCE_WINDOW", 0)  # In seconds
+    if (
+        notification_type not in COALESCED_TYPES
+        or related_item_id is None
+        or message
+        or window <= 0
+    ):
+        return Notification.objects.create(**fields)
+
+    with transaction.atomic():
+        # Lock the candidate row so concurrent events increment the count safely
+        existing = (
+            Notification.objects.select_for_update()
+            .filter(
+                recipient_id=recipient_id,
+                notification_type=notification_type,
+                related_item_id=related_item_id,
+                is_read=False,
+                created_at__gte=timezone.now() - timedelta(seconds=window),
+            )
+            .order_by("-created_at")
+            .first()
+        )
+        if existing is None:
+            return Notification.objects.create(**fields)
+
+        existing.occurrence_count += 1
+        # Point the merged row at the latest event
+        existing.actor_id = actor_id
+        existing.related_request_id = related_request_id
+        existing.last_occurred_at = timezone.now()
+        existing.save(
+            update_fields=[
+                "occurrence_count",
+                "actor",
+                "related_request",
+                "last_occurred_at",
+                "updated_at",
+            ]
+        )
+        logger.info(
+            f"Notification {existing.pk} coalesced ({existing.occurrence_count} events) for user {recipient_id}"
+        )
+        return existing
+
+
+def create_notifications(notifications):
+    """
+    Inserts several new Notification instances with one bulk_create (no coalescing,
+    so only use it for types outside COALESCED_TYPES).
+    bulk_create sends no post_save signals, so long-poll waiters are woken here
+    once the transaction commits.
+    """
+    created = Notification.objects.bulk_create(notifications)
+    recipient_ids = {notification.recipient_id for notification in created}
+    transaction.on_commit(lambda: [waiters.wake(recipient_id) for recipient_id in recipient_ids])
+    return created
@@ -1,13 +1,30 @@
 # apps/notifications/views.py
 
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import viewsets, permissions, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotAuthenticated, PermissionDenied
 from rest_framework.response import Response
 
+from apps.core.asyncviews import aauthenticate, aget_profile, api_error_response
+from apps.core.renderers import FastJSONRenderer
+
 # Import local models, serializers, and permissions
-from .models import Notification
-from .serializers import NotificationSerializer
+from .models import Device, Notification, NotificationBroadcast
+from .serializers import (
+    DeviceSerializer,
+    NotificationBroadcastSerializer,
+    NotificationSerializer,
+)
 from .permissions import IsNotificationRecipient
+from .broadcasts import start_broadcast
+from . import waiters
 
 
 class NotificationViewSet(
@@ -25,6 +42,10 @@ class NotificationViewSet(
     """
 
     serializer_class = NotificationSerializer
+    # Most queries a request may run (see apps/core/middleware.py); pinned by tests.py
+    query_budget = {"list": 4, "mark_all_read": 2}
+    # Reads of these actions may go to a read replica (see apps/core/routers.py)
+    replica_actions = {"list"}
     # Apply base authentication and ensure user is the recipient for detail views
     permission_classes = [permissions.IsAuthenticated, IsNotificationRecipient]
 
@@ -81,3 +102,238 @@ class NotificationViewSet(
             {"detail": f"Marked {updated_count} notifications as read."},
             status=status.HTTP_200_OK,
         )
+
+
+class NotificationBroadcastViewSet(
+    mixins.CreateModelMixin,  # For POST /notifications/broadcasts/
+    mixins.ListModelMixin,  # For GET /notifications/broadcasts/
+    mixins.RetrieveModelMixin,  # For GET /notifications/broadcasts/{pk}/ (progress)
+    viewsets.GenericViewSet,
+):
+    """
+    Staff-only ViewSet for community announcements.
+    - Create: Queues an announcement for every resident of the given communities.
+      Returns 202 immediately; the fan-out runs as a background job.
+    - List / Retrieve: Shows broadcasts with their status and progress.
+    """
+
+    queryset = NotificationBroadcast.objects.select_related("created_by").prefetch_related(
+        "communities"
+    )
+    serializer_class = NotificationBroadcastSerializer
+    permission_classes = [permissions.IsAdminUser]
+    # Most queries a request may run (see apps/core/middleware.py); pinned by tests.py
+    query_budget = {"list": 3, "retrieve": 3}
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        # 202: accepted for processing, poll the detail endpoint for progress
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    def perform_create(self, serializer):
+        broadcast = serializer.save(created_by=self.request.user)
+        start_broadcast(broadcast)
+
+
+class DeviceViewSet(
+    mixins.CreateModelMixin,  # For POST /notifications/devices/
+    mixins.ListModelMixin,  # For GET /notifications/devices/
+    mixins.DestroyModelMixin,  # For DELETE /notifications/devices/{pk}/ (e.g. on logout)
+    viewsets.GenericViewSet,
+):
+    """
+    ViewSet for the push devices of the logged-in user.
+    Pushes are sent by the deliver_notifications worker, never from a request.
+    """
+
+    serializer_class = DeviceSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    # Most queries a request may run (see apps/core/middleware.py); pinned by tests.py
+    query_budget = {"list": 2}
+
+    def get_queryset(self):
+        # Users only ever see their own devices (others return 404)
+        user_profile = getattr(self.request.user, "profile", None)
+        if not user_profile:
+            return Device.objects.none()
+        return Device.objects.filter(owner=user_profile, is_active=True)
+
+    def perform_create(self, serializer):
+        user_profile = getattr(self.request.user, "profile", None)
+        if not user_profile:
+            raise PermissionDenied("User profile not found.")
+        serializer.save(owner=user_profile)
+
+
+# --- Long-poll and server-sent events: wait for new notifications ---
+# DRF views are synchronous, so these endpoints are plain async Django views that
+# reuse the API's authentication (apps/core/asyncviews.py) and NotificationSerializer.
+
+
+async def _get_request_profile_id(request):
+    """
+    Authenticates the request with the API's default authentication classes
+    (JWT / session) and returns the user's profile id, or None.
+    Raises APIException for invalid credentials.
+    """
+    user = await aauthenticate(request)
+    if not user or not user.is_authenticated:
+        return None
+    user_profile = await aget_profile(user)
+    return user_profile.pk if user_profile else None
+
+
+async def _authenticate_or_error(request):
+    """(profile id, None), or (None, the error response to send)."""
+    try:
+        profile_id = await _get_request_profile_id(request)
+    except APIException as exc:  # e.g. an invalid or expired token
+        return None, api_error_response(exc, request)
+    if profile_id is None:
+        return None, api_error_response(NotAuthenticated(), request)
+    return profile_id, None
+
+
+def _get_new_notifications(profile_id, since_id, changed_after):
+    """
+    Serializes notifications newer than since_id, or coalesced after changed_after.
+    Filters on last_occurred_at rather than updated_at: marking a notification read
+    (or digesting it) saves the row too, but is not a new event.
+    """
+    new_rows = Q(id__gt=since_id)
+    if changed_after is not None:
+        new_rows |= Q(last_occurred_at__gt=changed_after)
+    queryset = Notification.objects.filter(new_rows, recipient_id=profile_id).order_by(
+        "-created_at"
+    )
+    return NotificationSerializer(queryset, many=True).data
+
+
+async def wait_for_notifications(request):
+    """
+    Long-poll alternative to SSE for clients and proxies that cannot hold a stream.
+    GET /notifications/wait/?since=<id>&timeout=<seconds>
+
+    Returns immediately when the user has notifications newer than `since`;
+    otherwise waits (without querying the database) until a notification for the
+    user is written in this process and returns it. A wake-up that finds nothing
+    new (e.g. a notification was only marked read) keeps waiting; an empty list
+    is returned when the timeout expires.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    profile_id, error = await _authenticate_or_error(request)
+    if error is not None:
+        return error
+
+    max_timeout = settings.NOTIFICATION_WAIT_MAX_TIMEOUT
+    try:
+        since_id = int(request.GET.get("since", 0))
+        timeout = float(request.GET.get("timeout", max_timeout))
+    except ValueError:
+        return JsonResponse(
+            {"detail": "'since' and 'timeout' must be numbers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    timeout = min(max(timeout, 0), max_timeout)
+
+    # Register before the first check so a notification written in between is not missed
+    waiter = waiters.register(profile_id)
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Taken before the first query, so a row coalesced while it runs is not missed
+        waiting_since = timezone.now()
+        data = await sync_to_async(_get_new_notifications)(profile_id, since_id, None)
+        while not data:
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not await waiter.wait(remaining):
+                break
+            # Cleared before the query, so a notification written during it wakes the next wait
+            waiter.event.clear()
+            data = await sync_to_async(_get_new_notifications)(
+                profile_id, since_id, waiting_since
+            )
+    finally:
+        waiters.unregister(waiter)
+
+    return JsonResponse(data, safe=False)
+
+
+# Checked by apps/core/middleware.py; pinned by tests.py. Authentication, rendering,
+# the first check and two wake-ups: each further wake-up that finds nothing new
+# costs one more query (logged, not an error outside tests).
+wait_for_notifications.query_budget = 6
+
+
+def _event(notification):
+    """One server-sent event; its id lets EventSource resume after a reconnect."""
+    data = FastJSONRenderer().render(notification).decode()
+    return f"id: {notification['id']}\nevent: notification\ndata: {data}\n\n"
+
+
+async def _notification_events(profile_id, since_id):
+    """
+    The event stream of stream_notifications(): new notifications as events,
+    a comment line as heartbeat, until NOTIFICATION_STREAM_MAX_DURATION is over.
+    """
+    waiter = waiters.register(profile_id)
+    try:
+        yield f"retry: {settings.NOTIFICATION_STREAM_RETRY_MS}\n\n"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.NOTIFICATION_STREAM_MAX_DURATION
+        changed_after = None
+        while True:
+            # Cleared before the query, so a notification written during it wakes the next wait
+            waiter.event.clear()
+            checked_at = timezone.now()
+            data = await sync_to_async(_get_new_notifications)(profile_id, since_id, changed_after)
+            for notification in reversed(data):  # Oldest first
+                yield _event(notification)
+                since_id = max(since_id, notification["id"])
+            changed_after = checked_at
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return  # The client reconnects (sending Last-Event-ID)
+            if not await waiter.wait(min(settings.NOTIFICATION_STREAM_HEARTBEAT, remaining)):
+                yield ": keep-alive\n\n"  # Stops proxies from closing an idle connection
+    finally:
+        waiters.unregister(waiter)
+
+
+async def stream_notifications(request):
+    """
+    Server-sent events (EventSource): GET /notifications/stream/?since=<id>
+    Sends every notification newer than `since` (or the Last-Event-ID header a
+    reconnecting EventSource sends), then each new or coalesced notification as
+    it is written in this process. No thread is held while the stream is idle.
+    Needs the ASGI server (gunicorn.conf.py): under WSGI the whole stream would be
+    buffered until NOTIFICATION_STREAM_MAX_DURATION ends it.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    profile_id, error = await _authenticate_or_error(request)
+    if error is not None:
+        return error
+
+    try:
+        since_id = int(request.headers.get("Last-Event-ID") or request.GET.get("since", 0))
+    except ValueError:
+        return JsonResponse(
+            {"detail": "'since' must be a number."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    response = StreamingHttpResponse(
+        _notification_events(profile_id, since_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Tells nginx not to buffer the stream
+    return response
+
+
+stream_notifications.query_budget = 2  # Authentication only: the stream itself runs later
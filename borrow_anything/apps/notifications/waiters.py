@@ -0,0 +1,58 @@
+# apps/notifications/waiters.py
+
+import asyncio
+import threading
+from collections import defaultdict
+
+# In-memory registry of long-poll requests waiting for new notifications,
+# keyed by recipient profile id. Waiters are woken by notification inserts in
+# the same process, so an idle waiter costs no database queries.
+# Each entry remembers its event loop because, under WSGI, every async view
+# runs in its own loop/thread and must be woken thread-safely.
+_waiters = defaultdict(set)
+_lock = threading.Lock()
+
+
+class Waiter:
+    """A single pending long-poll request."""
+
+    def __init__(self, recipient_id):
+        self.recipient_id = recipient_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    async def wait(self, timeout):
+        """Returns True if woken, False if the timeout expired first."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+def register(recipient_id):
+    """Registers a waiter for the recipient. Must be called from a running event loop."""
+    waiter = Waiter(recipient_id)
+    with _lock:
+        _waiters[recipient_id].add(waiter)
+    return waiter
+
+
+def unregister(waiter):
+    with _lock:
+        waiters = _waiters.get(waiter.recipient_id)
+        if waiters is not None:
+            waiters.discard(waiter)
+            if not waiters:
+                del _waiters[waiter.recipient_id]
+
+
+def wake(recipient_id):
+    """Wakes every request waiting on the recipient's notifications. Safe from any thread."""
+    with _lock:
+        waiters = list(_waiters.get(recipient_id, ()))
+    for waiter in waiters:
+        try:
+            waiter.loop.call_soon_threadsafe(waiter.event.set)
+        except RuntimeError:
+            pass  # The waiter's loop already closed (request finished)
@@ -0,0 +1,14 @@
+# apps/storage/admin.py
+
+from django.contrib import admin
+
+from .models import ContentBlob
+
+
+@admin.register(ContentBlob)
+class ContentBlobAdmin(admin.ModelAdmin):
+    # Blobs are managed by the upload code and gc_blobs; the admin is for inspection
+    list_display = ("s3_key", "content_type", "size", "ref_count", "is_collecting", "created_at", "updated_at")
+    list_filter = ("content_type", "is_collecting")
+    search_fields = ("sha256", "s3_key")
+    readonly_fields = ("sha256", "s3_key", "size", "content_type", "ref_count", "is_collecting", "created_at", "updated_at")
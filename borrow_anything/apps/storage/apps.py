@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class StorageConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = "apps.storage"
+
+    def ready(self):
+        import apps.storage.signals  # noqa F401 - registers the signal receivers
@@ -0,0 +1,101 @@
+# apps/storage/management/commands/gc_blobs.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.storage.models import ContentBlob, StoredUpload
+from apps.storage.utils import delete_objects
+from apps.users.imaging import IMAGE_VARIANTS, variant_key
+from apps.users.utils import S3ImageUploader
+
+
+class Command(BaseCommand):
+    """
+    Deletes content-addressed blobs that nothing references any more.
+    A blob is only collected once its reference count has been zero for the
+    whole grace period, and it is claimed with a conditional update first, so
+    an upload that re-acquires the blob at the same moment keeps it.
+    Intended to be run from cron, e.g. daily:
+        python manage.py gc_blobs
+    """
+
+    help = "Delete unreferenced content-addressed image blobs and their variants."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=int,
+            default=settings.STORAGE_BLOB_GC_GRACE_HOURS,
+            help="Only collect blobs that have been unreferenced for at least this many hours.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Blobs handled per database query / S3 delete request.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be deleted without changing anything.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["grace_hours"])
+        candidates = ContentBlob.objects.filter(
+            ref_count=0, updated_at__lt=cutoff, is_collecting=False
+        )
+        batch_size = options["batch_size"]
+
+        if options["dry_run"]:
+            blobs = candidates.values_list("s3_key", "size")
+            collected = freed = 0
+            for s3_key, size in blobs.iterator(chunk_size=batch_size):
+                self.stdout.write(f"Would delete {s3_key} ({size} bytes)")
+                collected += 1
+                freed += size
+            self.stdout.write(
+                self.style.SUCCESS(f"[dry run] Would collect {collected} blobs ({freed} bytes).")
+            )
+            return
+
+        # Records of finalized uploads are only needed while their upload tokens are
+        # valid (see apps/users/uploads.verify_upload)
+        StoredUpload.objects.filter(
+            created_at__lt=timezone.now() - timedelta(seconds=settings.IMAGE_UPLOAD_EXPIRATION * 2)
+        ).delete()
+
+        uploader = S3ImageUploader()
+        collected = freed = 0
+        while True:
+            # Claim a batch with a conditional update: a blob acquired in the
+            # meantime no longer matches and is left alone. Claimed blobs cannot be
+            # acquired, and new uploads of the same content wait for the row to go.
+            # Rows left claimed by an interrupted run are picked up again below.
+            pks = list(candidates.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            ContentBlob.objects.filter(pk__in=pks, ref_count=0).update(is_collecting=True)
+            batch = list(
+                ContentBlob.objects.filter(is_collecting=True)
+                .order_by("pk")
+                .values("pk", "s3_key", "size")[:batch_size]
+            )
+            if not batch:
+                break
+
+            keys = []
+            for blob in batch:
+                keys.append(blob["s3_key"])
+                keys.extend(variant_key(blob["s3_key"], name) for name in IMAGE_VARIANTS)
+            failed = delete_objects(uploader, keys)
+            if failed:
+                # Their rows are removed anyway; `manage.py gc_orphans` deletes the leftovers
+                self.stderr.write(f"Could not delete {len(failed)} objects: {failed[:10]}")
+
+            ContentBlob.objects.filter(pk__in=[blob["pk"] for blob in batch]).delete()
+            collected += len(batch)
+            freed += sum(blob["size"] for blob in batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Collected {collected} blobs ({freed} bytes)."))
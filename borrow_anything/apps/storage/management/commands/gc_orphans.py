@@ -0,0 +1,180 @@
+# apps/storage/management/commands/gc_orphans.py
+
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Collate
+from django.utils import timezone
+
+from apps.items.models import ItemImage
+from apps.storage.models import ContentBlob
+from apps.storage.utils import delete_objects
+from apps.users.imaging import IMAGE_VARIANTS, variant_key
+from apps.users.models import UserProfile
+from apps.users.utils import S3ImageUploader
+
+# Everything the app writes lives under these prefixes
+DEFAULT_PREFIXES = ["blobs/", "items/", "uploads/", "users/"]
+
+# Every S3 key the database refers to: (model, field)
+KEY_FIELDS = [
+    (ItemImage, "s3_key"),
+    (UserProfile, "profile_picture_s3_key"),
+    (UserProfile, "cover_photo_s3_key"),
+    (ContentBlob, "s3_key"),  # Unreferenced blobs too: they belong to gc_blobs
+]
+
+
+def _sorted_keys(model, field, chunk_size):
+    """Streams one key column in S3 listing order (by code point / UTF-8 bytes)."""
+    order = F(field)
+    if connection.vendor == "postgresql":
+        order = Collate(field, "C")  # The default collation ignores punctuation/case
+    keys = (
+        model.objects.exclude(**{field: ""})
+        .exclude(**{f"{field}__isnull": True})
+        .order_by(order)
+        .values_list(field, flat=True)
+    )
+    return keys.iterator(chunk_size=chunk_size)
+
+
+def _in_order(keys, model, field):
+    """Passes keys through, raising CommandError at the first one out of binary order."""
+    previous = ""
+    for key in keys:
+        if key < previous:
+            # Deleting against a wrongly ordered stream would delete live objects
+            raise CommandError(
+                f"{model.__name__}.{field} keys from the database are not in binary order "
+                f"({previous!r} > {key!r})."
+            )
+        previous = key
+        yield key
+
+
+def check_key_order(chunk_size=2000):
+    """
+    Streams every key column once and raises CommandError if the database does
+    not return it in binary order. Run before anything is deleted: the merge
+    below only notices a wrongly ordered column when it reaches the bad key,
+    after objects compared against the earlier keys may already be gone.
+    """
+    for model, field in KEY_FIELDS:
+        for _ in _in_order(_sorted_keys(model, field, chunk_size), model, field):
+            pass
+
+
+def referenced_keys(chunk_size=2000):
+    """
+    Yields every referenced key, including the variants of each image, in sorted
+    order. Each database column is streamed separately and merged; variant keys
+    ("<key>.<name>.webp") sort after their original and are held in a small heap
+    until the merged stream has moved past them.
+    """
+    merged = heapq.merge(
+        *(_in_order(_sorted_keys(model, field, chunk_size), model, field) for model, field in KEY_FIELDS)
+    )
+    pending = []
+    for key in merged:
+        while pending and pending[0] <= key:
+            yield heapq.heappop(pending)
+        yield key
+        for name in IMAGE_VARIANTS:
+            heapq.heappush(pending, variant_key(key, name))
+    while pending:
+        yield heapq.heappop(pending)
+
+
+def list_objects(uploader, prefixes):
+    """Streams the bucket listing page by page (1000 keys per request), in key order."""
+    paginator = uploader.s3_client.get_paginator("list_objects_v2")
+    for prefix in sorted(prefixes):
+        for page in paginator.paginate(Bucket=uploader.bucket_name, Prefix=prefix):
+            yield from page.get("Contents", [])
+
+
+class Command(BaseCommand):
+    """
+    Reconciles the bucket with the database and deletes objects nothing refers to:
+    images of deleted items, leftovers of failed or abandoned uploads, stale
+    variants. The listing and the referenced keys are both streamed in sorted
+    order and compared with a merge, so memory use does not grow with the bucket.
+    Recently written objects are skipped, as their rows may not be committed yet.
+    Intended to be run from cron, e.g. weekly:
+        python manage.py gc_orphans
+    """
+
+    help = "Delete S3 objects that are not referenced by any database row."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefix",
+            nargs="+",
+            default=DEFAULT_PREFIXES,
+            help="Key prefixes to scan (must not overlap).",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=settings.STORAGE_BLOB_GC_GRACE_HOURS,
+            help="Only delete objects last modified at least this many hours ago.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Keys per multi-object delete request (S3 allows at most 1000).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be deleted without changing anything.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = min(options["batch_size"], 1000)
+        cutoff = timezone.now() - timedelta(hours=options["min_age"])
+        uploader = S3ImageUploader()
+
+        check_key_order()
+        referenced = referenced_keys()
+        current = next(referenced, None)
+        scanned = orphans = freed = 0
+        failed = []
+        batch = []
+
+        for obj in list_objects(uploader, options["prefix"]):
+            key = obj["Key"]
+            scanned += 1
+            # Advance the referenced stream up to this key
+            while current is not None and current < key:
+                current = next(referenced, None)
+            if key == current or obj["LastModified"] > cutoff:
+                continue
+
+            orphans += 1
+            freed += obj["Size"]
+            if options["dry_run"]:
+                self.stdout.write(f"Would delete {key} ({obj['Size']} bytes)")
+                continue
+            batch.append(key)
+            if len(batch) >= batch_size:
+                failed.extend(delete_objects(uploader, batch))
+                batch = []
+
+        if batch:
+            failed.extend(delete_objects(uploader, batch))
+        if failed:
+            self.stderr.write(f"Could not delete {len(failed)} objects: {failed[:10]}")
+
+        prefix = "[dry run] " if options["dry_run"] else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}Scanned {scanned} objects, {orphans} orphaned ({freed} bytes)."
+            )
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-19 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('s3_key', models.CharField(max_length=1024, unique=True)),
+                ('size', models.PositiveBigIntegerField(help_text='Size in bytes')),
+                ('content_type', models.CharField(max_length=100)),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='How many image rows/fields reference this blob.')),
+                ('is_collecting', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='storage_con_ref_cou_1f66fe_idx')],
+            },
+        ),
+    ]
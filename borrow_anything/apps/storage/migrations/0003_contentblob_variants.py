@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-19 01:57
+
+from django.db import migrations, models
+
+
+def copy_variants_to_blobs(apps, schema_editor):
+    """Variants generated so far were only stored on the image rows: copy them to their blobs."""
+    ContentBlob = apps.get_model("storage", "ContentBlob")
+    ItemImage = apps.get_model("items", "ItemImage")
+    UserProfile = apps.get_model("users", "UserProfile")
+    for model, key_field, variants_field in (
+        (ItemImage, "s3_key", "variants"),
+        (UserProfile, "profile_picture_s3_key", "profile_picture_variants"),
+        (UserProfile, "cover_photo_s3_key", "cover_photo_variants"),
+    ):
+        rows = model.objects.filter(**{f"{key_field}__startswith": "blobs/"}).values_list(
+            key_field, variants_field
+        )
+        for s3_key, variants in rows.iterator():
+            if variants and variants.get("source") == s3_key:
+                ContentBlob.objects.filter(s3_key=s3_key, variants={}).update(variants=variants)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0002_storedupload'),
+        ('items', '0003_itemimage_variants'),
+        ('users', '0008_profile_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentblob',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(copy_variants_to_blobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# apps/storage/models.py
+
+from django.db import models
+
+
+class ContentBlob(models.Model):
+    """
+    An uploaded file stored once under a key derived from its SHA-256 hash
+    ("blobs/<first 2 hex chars>/<sha256>"). Identical uploads share one blob.
+
+    ref_count is the number of ItemImage rows and UserProfile image fields using
+    the blob. Blobs that stay unreferenced are removed by `manage.py gc_blobs`.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    s3_key = models.CharField(max_length=1024, unique=True)
+    size = models.PositiveBigIntegerField(help_text="Size in bytes")
+    content_type = models.CharField(max_length=100)
+    ref_count = models.PositiveIntegerField(
+        default=0, help_text="How many image rows/fields reference this blob."
+    )
+    # Resized variants of an image blob (see apps/users/imaging.py), shared by every
+    # row using the blob: {"source": s3_key, "thumb": "<key>", ...}
+    variants = models.JSONField(default=dict, blank=True)
+    # Set by gc_blobs while it deletes the object; such a blob can no longer be acquired
+    is_collecting = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every acquire/release so the GC can leave recently used blobs alone
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ref_count", "updated_at"]),  # Index for the GC
+        ]
+
+    def __str__(self):
+        return f"{self.s3_key} ({self.ref_count} refs)"
+
+
+class StoredUpload(models.Model):
+    """
+    A direct-to-S3 upload (apps/users/uploads.py) whose staging object was moved
+    into the blob store. Lets a retried finalize with the same upload token
+    resolve to the blob after the staging object is gone. Rows are only useful
+    while the token is valid; gc_blobs deletes older ones.
+    """
+
+    staging_key = models.CharField(max_length=1024, unique=True)
+    blob = models.ForeignKey(ContentBlob, on_delete=models.CASCADE, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.staging_key} -> {self.blob_id}"
@@ -0,0 +1,19 @@
+# apps/storage/signals.py
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.items.models import ItemImage
+from apps.users.models import UserProfile
+from .utils import release_blobs
+
+
+@receiver(post_delete, sender=ItemImage)
+def release_item_image_blob(sender, instance, **kwargs):
+    """Also runs for images deleted together with their item (cascade)."""
+    release_blobs(instance.s3_key)
+
+
+@receiver(post_delete, sender=UserProfile)
+def release_profile_blobs(sender, instance, **kwargs):
+    release_blobs(instance.profile_picture_s3_key, instance.cover_photo_s3_key)
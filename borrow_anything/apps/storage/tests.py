@@ -0,0 +1,317 @@
+# apps/storage/tests.py
+
+import hashlib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.core.testing import fake_s3, make_category, make_community, make_item, make_profile
+from apps.items.models import ItemImage
+from apps.users.imaging import IMAGE_VARIANTS, variant_key
+from . import utils
+from .management.commands import gc_orphans
+from .models import ContentBlob, StoredUpload
+from .utils import (
+    BlobBusy,
+    acquire_blob,
+    blob_key,
+    release_blobs,
+    store_files,
+    store_uploaded_object,
+    wait_for_collection,
+)
+
+
+def sha256_of(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def upload(data, name="photo.jpg"):
+    return SimpleUploadedFile(name, data, content_type="image/jpeg")
+
+
+def make_blob(data, ref_count=1, **fields):
+    sha256 = sha256_of(data)
+    return ContentBlob.objects.create(
+        sha256=sha256,
+        s3_key=blob_key(sha256),
+        size=len(data),
+        content_type="image/jpeg",
+        ref_count=ref_count,
+        **fields,
+    )
+
+
+class ReferenceCountTests(TestCase):
+    """acquire_blob() / release_blobs()."""
+
+    def test_acquire_and_release(self):
+        blob = make_blob(b"one")
+        self.assertTrue(acquire_blob(blob.sha256, 2))
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 3)
+
+        # One reference per key, repeated keys included
+        release_blobs(blob.s3_key, blob.s3_key)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    def test_acquire_unknown_content(self):
+        self.assertFalse(acquire_blob(sha256_of(b"nothing")))
+
+    def test_release_never_goes_below_zero(self):
+        blob = make_blob(b"one", ref_count=1)
+        release_blobs(blob.s3_key, blob.s3_key)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    def test_release_ignores_keys_outside_the_blob_store(self):
+        blob = make_blob(b"one")
+        release_blobs("items/1/photo.jpg", "", None)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    def test_collecting_blob_cannot_be_acquired_or_released(self):
+        blob = make_blob(b"one", ref_count=0, is_collecting=True)
+        self.assertFalse(acquire_blob(blob.sha256))
+        release_blobs(blob.s3_key)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+
+
+class StoreFilesTests(TestCase):
+    """store_files(): dedup, references, cleanup after a failed upload."""
+
+    def setUp(self):
+        self.s3 = fake_s3(self)
+
+    def test_stores_each_content_once(self):
+        keys = store_files([upload(b"one"), upload(b"two"), upload(b"one", "copy.jpg")])
+
+        self.assertEqual(keys, [blob_key(sha256_of(b"one")), blob_key(sha256_of(b"two")), keys[0]])
+        self.assertEqual(set(self.s3.objects), {keys[0], keys[1]})
+        self.assertEqual(self.s3.objects[keys[0]]["Body"], b"one")
+        self.assertEqual(self.s3.objects[keys[0]]["CacheControl"], utils.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(
+            dict(ContentBlob.objects.values_list("s3_key", "ref_count")), {keys[0]: 2, keys[1]: 1}
+        )
+
+    def test_existing_content_is_acquired_not_uploaded(self):
+        blob = make_blob(b"one")
+        with mock.patch.object(utils, "_upload_blob") as upload_blob:
+            keys = store_files([upload(b"one")])
+        upload_blob.assert_not_called()
+        self.assertEqual(keys, [blob.s3_key])
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+
+    def test_failed_upload_undoes_the_whole_call(self):
+        existing = make_blob(b"one")
+        self.s3.failing_keys.add(blob_key(sha256_of(b"three")))
+
+        with self.assertRaises(Exception):
+            store_files([upload(b"one"), upload(b"two"), upload(b"three")])
+
+        # The reference taken on existing content is dropped, the uploaded object deleted
+        existing.refresh_from_db()
+        self.assertEqual(existing.ref_count, 1)
+        self.assertEqual(ContentBlob.objects.count(), 1)
+        self.assertNotIn(blob_key(sha256_of(b"two")), self.s3.objects)
+
+    def test_content_being_collected_is_uploaded_again_once_gone(self):
+        blob = make_blob(b"one", ref_count=0, is_collecting=True)
+
+        def collector_finishes(sha256, timeout=5):
+            ContentBlob.objects.filter(sha256=sha256).delete()
+
+        with mock.patch.object(utils, "wait_for_collection", side_effect=collector_finishes):
+            keys = store_files([upload(b"one")])
+
+        self.assertEqual(keys, [blob.s3_key])
+        self.assertEqual(self.s3.objects[blob.s3_key]["Body"], b"one")
+        new_blob = ContentBlob.objects.get(sha256=blob.sha256)
+        self.assertEqual((new_blob.ref_count, new_blob.is_collecting), (1, False))
+
+    def test_waiting_for_a_collection_gives_up(self):
+        blob = make_blob(b"one", ref_count=0, is_collecting=True)
+        with self.assertRaises(BlobBusy):
+            wait_for_collection(blob.sha256, timeout=0)
+
+
+class StoreUploadedObjectTests(TestCase):
+    """store_uploaded_object(): moving a direct upload into the blob store."""
+
+    def setUp(self):
+        self.s3 = fake_s3(self)
+
+    def test_moves_new_content_into_the_blob_store(self):
+        self.s3.put("uploads/1/a", b"photo", "image/jpeg")
+
+        key = store_uploaded_object("uploads/1/a", "image/jpeg")
+
+        self.assertEqual(key, blob_key(sha256_of(b"photo")))
+        self.assertEqual(set(self.s3.objects), {key})  # Staging object deleted
+        self.assertEqual(self.s3.objects[key]["ContentType"], "image/jpeg")
+        blob = ContentBlob.objects.get(s3_key=key)
+        self.assertEqual((blob.ref_count, blob.size), (1, len(b"photo")))
+        self.assertEqual(StoredUpload.objects.get(staging_key="uploads/1/a").blob, blob)
+
+    def test_existing_content_is_not_copied(self):
+        blob = make_blob(b"photo")
+        self.s3.put(blob.s3_key, b"photo", "image/jpeg")
+        self.s3.put("uploads/1/a", b"photo", "image/jpeg")
+
+        with mock.patch.object(self.s3, "copy_object") as copy_object:
+            key = store_uploaded_object("uploads/1/a", "image/jpeg")
+
+        copy_object.assert_not_called()
+        self.assertEqual(key, blob.s3_key)
+        self.assertNotIn("uploads/1/a", self.s3.objects)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+
+
+class GarbageCollectionTests(TestCase):
+    """manage.py gc_blobs."""
+
+    def setUp(self):
+        self.s3 = fake_s3(self)
+
+    def make_stored_blob(self, data, ref_count, hours_ago):
+        blob = make_blob(data, ref_count=ref_count)
+        ContentBlob.objects.filter(pk=blob.pk).update(updated_at=timezone.now() - timedelta(hours=hours_ago))
+        self.s3.put(blob.s3_key, data, "image/jpeg")
+        for name in IMAGE_VARIANTS:
+            self.s3.put(variant_key(blob.s3_key, name), b"variant", "image/webp")
+        return blob
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command("gc_blobs", "--grace-hours", "24", *args, stdout=out)
+        return out.getvalue()
+
+    def test_collects_only_blobs_unreferenced_for_the_grace_period(self):
+        garbage = self.make_stored_blob(b"garbage", ref_count=0, hours_ago=48)
+        recent = self.make_stored_blob(b"recent", ref_count=0, hours_ago=1)
+        used = self.make_stored_blob(b"used", ref_count=1, hours_ago=48)
+
+        self.gc()
+
+        self.assertEqual(
+            set(ContentBlob.objects.values_list("pk", flat=True)), {recent.pk, used.pk}
+        )
+        self.assertNotIn(garbage.s3_key, self.s3.objects)
+        for name in IMAGE_VARIANTS:
+            self.assertNotIn(variant_key(garbage.s3_key, name), self.s3.objects)
+        self.assertIn(recent.s3_key, self.s3.objects)
+        self.assertIn(used.s3_key, self.s3.objects)
+
+    def test_dry_run_changes_nothing(self):
+        garbage = self.make_stored_blob(b"garbage", ref_count=0, hours_ago=48)
+        output = self.gc("--dry-run")
+        self.assertIn(f"Would delete {garbage.s3_key}", output)
+        self.assertTrue(ContentBlob.objects.filter(pk=garbage.pk).exists())
+        self.assertIn(garbage.s3_key, self.s3.objects)
+
+    def test_blob_acquired_before_the_claim_is_kept(self):
+        blob = self.make_stored_blob(b"photo", ref_count=0, hours_ago=48)
+        claim = ContentBlob.objects.filter
+
+        def acquired_meanwhile(*args, **kwargs):
+            # An upload of the same content acquires the blob between the
+            # collector's candidate query and its claim
+            if kwargs.get("ref_count") == 0 and "pk__in" in kwargs:
+                acquire_blob(blob.sha256)
+            return claim(*args, **kwargs)
+
+        with mock.patch.object(ContentBlob.objects, "filter", side_effect=acquired_meanwhile):
+            self.gc()
+
+        blob.refresh_from_db()
+        self.assertEqual((blob.ref_count, blob.is_collecting), (1, False))
+        self.assertIn(blob.s3_key, self.s3.objects)
+
+    def test_claimed_blob_cannot_be_acquired_while_deleted(self):
+        blob = self.make_stored_blob(b"photo", ref_count=0, hours_ago=48)
+        delete_objects = utils.delete_objects
+        acquired = []
+
+        def acquire_during_delete(uploader, keys):
+            acquired.append(acquire_blob(blob.sha256))
+            return delete_objects(uploader, keys)
+
+        with mock.patch(
+            "apps.storage.management.commands.gc_blobs.delete_objects", side_effect=acquire_during_delete
+        ):
+            self.gc()
+
+        self.assertEqual(acquired, [False])
+        self.assertFalse(ContentBlob.objects.filter(pk=blob.pk).exists())
+
+
+class OrphanCollectionTests(TestCase):
+    """manage.py gc_orphans: the merge of the bucket listing with the referenced keys."""
+
+    def setUp(self):
+        self.s3 = fake_s3(self)
+        old = timedelta(days=30)
+        owner = make_profile(make_community())
+        item = make_item(owner, make_category())
+
+        # Referenced: a blob shared by an item image, with its variants
+        self.blob = make_blob(b"photo")
+        ItemImage.objects.create(item=item, s3_key=self.blob.s3_key)
+        self.live = [self.blob.s3_key] + [variant_key(self.blob.s3_key, name) for name in IMAGE_VARIANTS]
+        # A legacy per-item key with one variant
+        legacy = f"items/{item.pk}/legacy.jpg"
+        ItemImage.objects.create(item=item, s3_key=legacy)
+        self.live += [legacy, variant_key(legacy, "thumb")]
+        for key in self.live:
+            self.s3.put(key, b"live", age=old)
+
+        # Orphans: a blob whose row is gone (with variants), an abandoned upload,
+        # and a stale variant next to a live original
+        gone = blob_key(sha256_of(b"gone"))
+        self.orphans = [gone, variant_key(gone, "thumb"), variant_key(gone, "full"), "uploads/1/abandoned"]
+        self.orphans.append(f"items/{item.pk}/legacy.jpg.stale.webp")
+        for key in self.orphans:
+            self.s3.put(key, b"orphan", age=old)
+
+        # Too recent to judge: its row may not be committed yet
+        self.recent = "uploads/1/in-progress"
+        self.s3.put(self.recent, b"new", age=timedelta(minutes=5))
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command("gc_orphans", "--min-age", "24", *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_dry_run_reports_orphans_only(self):
+        output = self.gc("--dry-run")
+        reported = {line.split()[2] for line in output.splitlines() if line.startswith("Would delete")}
+        self.assertEqual(reported, set(self.orphans))
+        self.assertIn(f"{len(self.orphans)} orphaned", output)
+        self.assertEqual(self.s3.delete_batches, [])
+
+    def test_deletes_orphans_in_batches(self):
+        self.gc("--batch-size", "2")
+        self.assertEqual(set(self.s3.objects), set(self.live) | {self.recent})
+        self.assertTrue(all(len(batch) <= 2 for batch in self.s3.delete_batches))
+
+    def test_wrongly_ordered_keys_abort_before_any_delete(self):
+        sorted_keys = gc_orphans._sorted_keys
+
+        def misordered(model, field, chunk_size):
+            keys = list(sorted_keys(model, field, chunk_size))
+            # Out of order near the end, after the orphans listed first
+            return iter(keys + ["blobs/00/first"] if model is ContentBlob else keys)
+
+        with mock.patch.object(gc_orphans, "_sorted_keys", side_effect=misordered):
+            with self.assertRaises(CommandError):
+                self.gc("--batch-size", "1")
+        self.assertEqual(self.s3.delete_batches, [])
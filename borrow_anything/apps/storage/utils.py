@@ -0,0 +1,238 @@
+# apps/storage/utils.py
+
+import hashlib
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from apps.users.utils import S3ImageUploader
+from .models import ContentBlob, StoredUpload
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed storage: a file's key is derived from its SHA-256, so the same
+# bytes are stored once no matter how often they are uploaded, and the object
+# behind a key never changes (which allows far-future cache headers).
+#
+# Reference counting: every function that returns a blob key has already taken
+# one reference per returned key for the caller. The caller stores the key on an
+# ItemImage/UserProfile; signals.py releases the reference when that row is
+# deleted or the key is replaced.
+BLOB_PREFIX = "blobs/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class BlobBusy(APIException):
+    """The content is being garbage collected right now; the client can simply retry."""
+    status_code = 503
+    default_detail = "The upload could not be stored right now, please try again."
+    default_code = "blob_busy"
+
+
+def blob_key(sha256):
+    return f"{BLOB_PREFIX}{sha256[:2]}/{sha256}"
+
+
+def is_blob_key(s3_key):
+    return bool(s3_key) and s3_key.startswith(BLOB_PREFIX)
+
+
+def hash_file(file):
+    """Returns (sha256 hex digest, size) of an uploaded file, rewinding it afterwards."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def acquire_blob(sha256, count=1):
+    """
+    Takes `count` references on an existing blob. Returns False if there is no
+    such blob or gc_blobs is deleting it (see wait_for_collection()).
+    """
+    return bool(
+        ContentBlob.objects.filter(sha256=sha256, is_collecting=False).update(
+            ref_count=F("ref_count") + count, updated_at=timezone.now()
+        )
+    )
+
+
+def wait_for_collection(sha256, timeout=5):
+    """
+    Waits until a blob that gc_blobs is deleting is gone, so the same content can
+    be uploaded again without the collector deleting the new object.
+    """
+    deadline = time.monotonic() + timeout
+    while ContentBlob.objects.filter(sha256=sha256).exists():
+        if time.monotonic() > deadline:
+            raise BlobBusy(f"Blob {sha256} is being garbage collected, try again.")
+        time.sleep(0.1)
+
+
+def register_blob(sha256, size, content_type, count=1):
+    """Records a freshly uploaded blob with `count` references (or adds them if it exists)."""
+    try:
+        with transaction.atomic():
+            ContentBlob.objects.create(
+                sha256=sha256,
+                s3_key=blob_key(sha256),
+                size=size,
+                content_type=content_type,
+                ref_count=count,
+            )
+    except IntegrityError:
+        # Someone registered the same content concurrently. A brand new blob is
+        # within the GC grace period, so it cannot be collecting.
+        acquire_blob(sha256, count)
+
+
+def release_blobs(*s3_keys):
+    """Drops one reference per given key. Keys outside the blob store are ignored."""
+    for s3_key, count in Counter(key for key in s3_keys if is_blob_key(key)).items():
+        ContentBlob.objects.filter(s3_key=s3_key, ref_count__gte=count, is_collecting=False).update(
+            ref_count=F("ref_count") - count, updated_at=timezone.now()
+        )
+
+
+def _upload_blob(uploader, file, sha256):
+    uploader.s3_client.upload_fileobj(
+        file,
+        uploader.bucket_name,
+        blob_key(sha256),
+        ExtraArgs={
+            "ContentType": file.content_type,
+            "CacheControl": IMMUTABLE_CACHE_CONTROL,
+        },
+    )
+
+
+def delete_objects(uploader, s3_keys):
+    """Deletes objects in batches of 1000 (the S3 limit). Returns the keys S3 reported as failed."""
+    failed = []
+    s3_keys = list(s3_keys)
+    for start in range(0, len(s3_keys), 1000):
+        response = uploader.s3_client.delete_objects(
+            Bucket=uploader.bucket_name,
+            Delete={
+                "Objects": [{"Key": key} for key in s3_keys[start:start + 1000]],
+                "Quiet": True,
+            },
+        )
+        failed.extend(error["Key"] for error in response.get("Errors", []))
+    return failed
+
+
+def store_files(files, uploader=None):
+    """
+    Stores uploaded files as content-addressed blobs and returns their keys, in order.
+    Hashing and S3 uploads run on a bounded thread pool; content that is already
+    stored (or repeated within `files`) is not uploaded again. If an upload fails,
+    the references taken and the objects uploaded by this call are undone and the
+    error is re-raised. Database work stays on the calling thread (and inside its
+    transaction).
+    """
+    uploader = uploader or S3ImageUploader()  # boto3 clients are thread-safe, so one is shared
+    workers = max(1, min(len(files), settings.ITEM_IMAGE_UPLOAD_WORKERS))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blob-upload") as executor:
+        hashes = list(executor.map(hash_file, files))
+
+        # One reference per file: existing content is just acquired, the rest uploaded once
+        counts = Counter(sha256 for sha256, size in hashes)
+        first_file = {}
+        for index, (sha256, size) in enumerate(hashes):
+            first_file.setdefault(sha256, index)
+        acquired, missing = [], []
+        for sha256, count in counts.items():
+            if acquire_blob(sha256, count):
+                acquired.extend([blob_key(sha256)] * count)
+            else:
+                wait_for_collection(sha256)
+                missing.append(sha256)
+
+        futures = {
+            sha256: executor.submit(_upload_blob, uploader, files[first_file[sha256]], sha256)
+            for sha256 in missing
+        }
+        uploaded, errors = [], []
+        for sha256, future in futures.items():
+            try:
+                future.result()
+                uploaded.append(sha256)
+            except Exception as e:
+                errors.append(e)
+
+    if errors:
+        release_blobs(*acquired)
+        try:
+            delete_objects(uploader, [blob_key(sha256) for sha256 in uploaded])
+        except Exception as e:
+            logger.error(f"Could not clean up uploaded blobs {uploaded}: {e}")
+        raise errors[0]
+
+    for sha256 in missing:
+        index = first_file[sha256]
+        register_blob(sha256, hashes[index][1], files[index].content_type, counts[sha256])
+
+    return [blob_key(sha256) for sha256, size in hashes]
+
+
+def acquire_stored_upload(staging_key):
+    """
+    For a staging object that store_uploaded_object() already moved into the blob
+    store: takes one reference on its blob and returns the blob key. Returns None
+    if it was never stored (or the blob is being garbage collected).
+    """
+    stored = StoredUpload.objects.filter(staging_key=staging_key).values_list(
+        "blob__sha256", flat=True
+    ).first()
+    if stored is None or not acquire_blob(stored):
+        return None
+    return blob_key(stored)
+
+
+def store_uploaded_object(staging_key, content_type, uploader=None):
+    """
+    Moves an object uploaded directly to S3 (see apps/users/uploads.py) into the
+    blob store. The content is hashed server-side rather than trusting the client,
+    copied to its blob key with S3's server-side copy unless it is already stored,
+    and the staging object is deleted. Returns the blob key (one reference taken).
+    The move is recorded (StoredUpload) before the staging object is deleted, so
+    acquire_stored_upload() can resolve a retry.
+    """
+    uploader = uploader or S3ImageUploader()
+    response = uploader.s3_client.get_object(Bucket=uploader.bucket_name, Key=staging_key)
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in response["Body"].iter_chunks(chunk_size=1024 * 1024):
+        digest.update(chunk)
+        size += len(chunk)
+    sha256 = digest.hexdigest()
+
+    if not acquire_blob(sha256):
+        wait_for_collection(sha256)
+        uploader.s3_client.copy_object(
+            Bucket=uploader.bucket_name,
+            Key=blob_key(sha256),
+            CopySource={"Bucket": uploader.bucket_name, "Key": staging_key},
+            MetadataDirective="REPLACE",
+            ContentType=content_type,
+            CacheControl=IMMUTABLE_CACHE_CONTROL,
+        )
+        register_blob(sha256, size, content_type)
+
+    StoredUpload.objects.get_or_create(
+        staging_key=staging_key, defaults={"blob": ContentBlob.objects.get(sha256=sha256)}
+    )
+    uploader.delete_image(staging_key)
+    return blob_key(sha256)
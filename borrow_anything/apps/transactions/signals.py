@@ -11,9 +11,7 @@ from .models import BorrowingRequest, Review
 logger = logging.getLogger(__name__)
 
 from apps.notifications.models import Notification
-
-# Import UserProfile to link actor/recipient correctly
-from apps.users.models import UserProfile
+from apps.notifications.utils import create_notification  # Merges repeated events
 
 
 # Decorator connects this function to the post_save signal for the BorrowingRequest model
@@ -56,124 +54,115 @@ def handle_request_status_change(
     Listens for saves on BorrowingRequest and creates Notifications
     for relevant status changes or creation.
     """
-    recipient: UserProfile | None = None
-    actor: UserProfile | None = None
-    message: str = ""
+    # Notifications only store ids and params; the message text is rendered at
+    # read time, so no related rows need to be loaded here.
+    recipient_id: int | None = None
+    actor_id: int | None = None
+    params: dict = {}
     notification_type: Notification.NotificationTypeChoices | None = None
-    related_item = instance.item  # Get the item once
 
     # Determine if status was actually updated if update_fields is available
     status_updated = update_fields is None or "status" in update_fields
 
     # --- Event: New Request Created ---
     if created:
-        recipient = instance.lender_profile
-        actor = instance.borrower_profile
+        recipient_id = instance.lender_profile_id
+        actor_id = instance.borrower_profile_id
         notification_type = Notification.NotificationTypeChoices.REQUEST_RECEIVED
-        message = (
-            f"{actor.user.username} requested to borrow your item: {related_item.title}"
-        )
 
     # --- Event: Status Updated (Not Creation) ---
     elif status_updated:
         current_status = instance.status
-        actor = None  # Actor determined by who likely triggered the change
 
         # Lender Actions -> Notify Borrower
         if current_status == BorrowingRequest.StatusChoices.ACCEPTED:
-            recipient = instance.borrower_profile
-            actor = instance.lender_profile  # Lender accepted
+            recipient_id = instance.borrower_profile_id
+            actor_id = instance.lender_profile_id  # Lender accepted
             notification_type = Notification.NotificationTypeChoices.REQUEST_ACCEPTED
-            message = f"Your request for '{related_item.title}' was accepted by {actor.user.username}."
         elif current_status == BorrowingRequest.StatusChoices.DECLINED:
-            recipient = instance.borrower_profile
-            actor = instance.lender_profile  # Lender declined
+            recipient_id = instance.borrower_profile_id
+            actor_id = instance.lender_profile_id  # Lender declined
             notification_type = Notification.NotificationTypeChoices.REQUEST_DECLINED
-            message = f"Your request for '{related_item.title}' was declined by {actor.user.username}."
             if instance.lender_response_message:
-                message += f" Reason: {instance.lender_response_message}"
+                params = {
+                    "variant": "with_reason",
+                    "reason": instance.lender_response_message,
+                }
         elif current_status == BorrowingRequest.StatusChoices.COMPLETED:
-            lender = instance.lender_profile
-            borrower = instance.borrower_profile
+            lender_id = instance.lender_profile_id
+            borrower_id = instance.borrower_profile_id
 
             # 1. Notify Borrower
             try:
-                Notification.objects.create(
-                    recipient=borrower,
-                    actor=lender,  # Lender performed the completion action
-                    message=f"Your borrowing of '{related_item.title}' is complete. Please leave a review for {lender.user.username}!",
+                create_notification(
+                    recipient_id=borrower_id,
+                    actor_id=lender_id,  # Lender performed the completion action
                     notification_type=Notification.NotificationTypeChoices.REQUEST_COMPLETED,  # Or REVIEW_PROMPT
-                    related_request=instance,
-                    related_item=related_item,
+                    related_request_id=instance.pk,
+                    related_item_id=instance.item_id,
                 )
                 logger.info(
-                    f"Notification '{Notification.NotificationTypeChoices.REQUEST_COMPLETED}' created for BORROWER {borrower.user_id} regarding request {instance.pk}"
+                    f"Notification '{Notification.NotificationTypeChoices.REQUEST_COMPLETED}' created for BORROWER {borrower_id} regarding request {instance.pk}"
                 )
-                notification_created = True
             except Exception as e_bor:
                 logger.error(
-                    f"Failed to create COMPLETION notification for borrower {borrower.user_id} on request {instance.pk}: {e_bor}"
+                    f"Failed to create COMPLETION notification for borrower {borrower_id} on request {instance.pk}: {e_bor}"
                 )
 
             # 2. Notify Lender
             try:
-                Notification.objects.create(
-                    recipient=lender,
-                    actor=lender,  # Lender performed the completion action
-                    message=f"You marked the borrowing of '{related_item.title}' by {borrower.user.username} as complete. Please leave a review!",
+                create_notification(
+                    recipient_id=lender_id,
+                    actor_id=lender_id,  # Lender performed the completion action
                     notification_type=Notification.NotificationTypeChoices.REQUEST_COMPLETED,  # Or REVIEW_PROMPT
-                    related_request=instance,
-                    related_item=related_item,
+                    related_request_id=instance.pk,
+                    related_item_id=instance.item_id,
+                    related_user_profile_id=borrower_id,  # Named in the lender's message
+                    params={"variant": "lender"},
                 )
                 logger.info(
-                    f"Notification '{Notification.NotificationTypeChoices.REQUEST_COMPLETED}' created for LENDER {lender.user_id} regarding request {instance.pk}"
-                )
-                notification_created = (
-                    True  # Mark as handled even if only one succeeded
+                    f"Notification '{Notification.NotificationTypeChoices.REQUEST_COMPLETED}' created for LENDER {lender_id} regarding request {instance.pk}"
                 )
             except Exception as e_len:
                 logger.error(
-                    f"Failed to create COMPLETION notification for lender {lender.user_id} on request {instance.pk}: {e_len}"
+                    f"Failed to create COMPLETION notification for lender {lender_id} on request {instance.pk}: {e_len}"
                 )
 
             # Prevent further processing below for COMPLETED status
-            recipient = None  # Reset recipient as we handled creation here
+            recipient_id = None  # Reset recipient as we handled creation here
 
         # Borrower Actions -> Notify Lender
         elif current_status == BorrowingRequest.StatusChoices.CANCELLED_BORROWER:
-            recipient = instance.lender_profile
-            actor = instance.borrower_profile  # Borrower cancelled
+            recipient_id = instance.lender_profile_id
+            actor_id = instance.borrower_profile_id  # Borrower cancelled
             notification_type = (
                 Notification.NotificationTypeChoices.REQUEST_CANCELLED_BORROWER
             )
-            message = f"{actor.user.username} cancelled their request for your item: {related_item.title}"
         elif current_status == BorrowingRequest.StatusChoices.PICKED_UP:
-            recipient = instance.lender_profile
-            actor = instance.borrower_profile  # Borrower confirmed pickup
+            recipient_id = instance.lender_profile_id
+            actor_id = instance.borrower_profile_id  # Borrower confirmed pickup
             notification_type = Notification.NotificationTypeChoices.PICKUP_CONFIRMED
-            message = f"{actor.user.username} confirmed pickup for your item: {related_item.title}"
         elif current_status == BorrowingRequest.StatusChoices.RETURNED:
-            recipient = instance.lender_profile
-            actor = instance.borrower_profile  # Borrower confirmed return
+            recipient_id = instance.lender_profile_id
+            actor_id = instance.borrower_profile_id  # Borrower confirmed return
             notification_type = (
                 Notification.NotificationTypeChoices.RETURN_CONFIRMED_BORROWER
             )
-            message = f"{actor.user.username} marked '{related_item.title}' as returned. Please confirm receipt."
 
     # --- Create Notification if relevant event occurred ---
-    if recipient and notification_type and message:
+    if recipient_id and notification_type:
         try:
-            Notification.objects.create(
-                recipient=recipient,
-                actor=actor,
-                message=message,
+            create_notification(
+                recipient_id=recipient_id,
+                actor_id=actor_id,
                 notification_type=notification_type,
-                related_request=instance,
-                related_item=related_item,
+                related_request_id=instance.pk,
+                related_item_id=instance.item_id,
+                params=params,
                 # related_user_profile could be actor or recipient depending on context if needed
             )
             logger.info(
-                f"Notification '{notification_type}' created for user {recipient.user_id} regarding request {instance.pk}"
+                f"Notification '{notification_type}' created for user {recipient_id} regarding request {instance.pk}"
             )
         except Exception as e:
             logger.error(
@@ -195,9 +184,8 @@ def handle_review_submission(
     # We only care about updates where a submission timestamp was set
     if not created:
         borrowing_request = instance.borrowing_request
-        recipient: UserProfile | None = None
-        actor: UserProfile | None = None
-        message: str = ""
+        recipient_id: int | None = None
+        actor_id: int | None = None
         notification_type: Notification.NotificationTypeChoices = (
             Notification.NotificationTypeChoices.REVIEW_RECEIVED
         )
@@ -209,31 +197,28 @@ def handle_review_submission(
         if borrower_submitted and instance.borrower_review_submitted_at is not None:
             # Check if this is the *first* time it's being set (might need pre_save state or check against old value)
             # Simple approach: Notify on any save that includes the timestamp update
-            recipient = borrowing_request.lender_profile
-            actor = borrowing_request.borrower_profile
-            message = f"{actor.user.username} left a review for your transaction regarding '{borrowing_request.item.title}'."
+            recipient_id = borrowing_request.lender_profile_id
+            actor_id = borrowing_request.borrower_profile_id
 
         # Check if lender review timestamp was just updated (use elif to avoid double notification on same save)
         elif update_fields is None or "lender_review_submitted_at" in update_fields:
             if instance.lender_review_submitted_at is not None:
-                recipient = borrowing_request.borrower_profile
-                actor = borrowing_request.lender_profile
-                message = f"{actor.user.username} left a review for your transaction regarding '{borrowing_request.item.title}'."
+                recipient_id = borrowing_request.borrower_profile_id
+                actor_id = borrowing_request.lender_profile_id
 
         # Create Notification if relevant event occurred
-        if recipient and actor and message:
+        if recipient_id and actor_id:
             try:
-                Notification.objects.create(
-                    recipient=recipient,
-                    actor=actor,
-                    message=message,
+                create_notification(
+                    recipient_id=recipient_id,
+                    actor_id=actor_id,
                     notification_type=notification_type,
-                    related_request=borrowing_request,
-                    related_item=borrowing_request.item,
+                    related_request_id=borrowing_request.pk,
+                    related_item_id=borrowing_request.item_id,
                     # related_review=instance # Add if you have related_review FK on Notification model
                 )
                 logger.info(
-                    f"Notification '{notification_type}' created for user {recipient.user_id} regarding review for request {borrowing_request.pk}"
+                    f"Notification '{notification_type}' created for user {recipient_id} regarding review for request {borrowing_request.pk}"
                 )
             except Exception as e:
                 logger.error(
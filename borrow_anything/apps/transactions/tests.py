@@ -1,3 +1,152 @@
-from django.test import TestCase
+# apps/transactions/tests.py
 
-# Create your tests here.
+from unittest import mock
+
+from django.test import override_settings
+
+from apps.core.testing import (
+    QueryCountTestCase,
+    make_category,
+    make_community,
+    make_item,
+    make_profile,
+    make_request,
+)
+from apps.notifications.models import Notification
+from .models import BorrowingRequest
+
+
+class BorrowingRequestQueryCountTests(QueryCountTestCase):
+    """Query counts of the borrowing request endpoints must not grow with the rows involved."""
+
+    def setUp(self):
+        self.community = make_community()
+        self.category = make_category()
+        self.lender = make_profile(self.community)
+        self.borrower = make_profile(self.community)
+
+    def add_requests(self, number):
+        # Requests for different items, half borrowed and half lent by the viewer
+        for n in range(number):
+            other = make_profile(self.community)
+            if n % 2:
+                make_request(make_item(self.lender, self.category), other)
+            else:
+                make_request(make_item(other, self.category), self.lender)
+
+    def test_list(self):
+        self.authenticate(self.lender)
+        small, large = self.assertConstantQueries("/api/v1/requests/", self.add_requests)
+        self.assertEqual(len(large.data), 10 * self.N)
+
+    def test_detail(self):
+        self.authenticate(self.borrower)
+        borrowing_request = make_request(make_item(self.lender, self.category), self.borrower)
+        self.assertConstantQueries(f"/api/v1/requests/{borrowing_request.pk}/", self.add_requests)
+
+    def test_accept_declines_conflicting_requests_in_bulk(self):
+        self.authenticate(self.lender)
+
+        def add_conflicting_requests(number):
+            item = make_item(self.lender, self.category)
+            accepted = make_request(item, self.borrower)
+            for _ in range(number):
+                make_request(item, make_profile(self.community))
+            return accepted
+
+        def accept(borrowing_request):
+            response = self.client.patch(f"/api/v1/requests/{borrowing_request.pk}/accept/")
+            self.assertEqual(response.status_code, 200, response.data)
+
+        self.assertActionQueries(accept, add_conflicting_requests)
+
+        # The conflicting requests were still declined, and their borrowers notified
+        declined = BorrowingRequest.objects.filter(status=BorrowingRequest.StatusChoices.DECLINED)
+        self.assertEqual(declined.count(), 11 * self.N)
+        self.assertEqual(
+            Notification.objects.filter(
+                notification_type=Notification.NotificationTypeChoices.REQUEST_DECLINED,
+                related_request__in=declined,
+                params__variant="with_reason",
+            ).count(),
+            11 * self.N,
+        )
+
+    def test_lifecycle_actions(self):
+        # Each step costs the same however many other requests the users have
+        steps = [
+            (self.lender, "accept"),
+            (self.borrower, "confirm-pickup"),
+            (self.borrower, "confirm-return"),
+            (self.lender, "complete"),
+        ]
+
+        for index, (profile, action) in enumerate(steps):
+
+            def add_rows(number):
+                self.add_requests(number)
+                borrowing_request = make_request(make_item(self.lender, self.category), self.borrower)
+                for earlier_profile, earlier_action in steps[:index]:
+                    self.authenticate(earlier_profile)
+                    self.client.patch(f"/api/v1/requests/{borrowing_request.pk}/{earlier_action}/")
+                self.authenticate(profile)
+                return borrowing_request
+
+            def run_action(borrowing_request):
+                response = self.client.patch(f"/api/v1/requests/{borrowing_request.pk}/{action}/")
+                self.assertEqual(response.status_code, 200, response.data)
+
+            with self.subTest(action=action):
+                self.assertActionQueries(run_action, add_rows)
+
+    def test_decline_and_cancel(self):
+        for profile, action in [(self.lender, "decline"), (self.borrower, "cancel")]:
+
+            def add_rows(number):
+                self.add_requests(number)
+                self.authenticate(profile)
+                return make_request(make_item(self.lender, self.category), self.borrower)
+
+            def run_action(borrowing_request):
+                response = self.client.patch(f"/api/v1/requests/{borrowing_request.pk}/{action}/")
+                self.assertEqual(response.status_code, 200, response.data)
+
+            with self.subTest(action=action):
+                self.assertActionQueries(run_action, add_rows)
+
+
+class AutoDeclineTests(QueryCountTestCase):
+    """Accepting a request declines the other pending requests for the same dates."""
+
+    # The simulated cancellation runs inside the request and counts against its budget
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_request_cancelled_meanwhile_is_not_declined_or_notified(self):
+        community = make_community()
+        lender, borrower = make_profile(community), make_profile(community)
+        item = make_item(lender, make_category())
+        accepted = make_request(item, borrower)
+        conflicting = [make_request(item, make_profile(community)) for _ in range(2)]
+        cancelled = conflicting[0]
+        self.authenticate(lender)
+
+        original_filter = BorrowingRequest.objects.filter
+
+        def cancel_before_the_update(*args, **kwargs):
+            # The borrower cancels between the view's SELECT and its UPDATE
+            if "pk__in" in kwargs and kwargs.get("status") == BorrowingRequest.StatusChoices.PENDING:
+                original_filter(pk=cancelled.pk).update(
+                    status=BorrowingRequest.StatusChoices.CANCELLED_BORROWER
+                )
+            return original_filter(*args, **kwargs)
+
+        with mock.patch.object(BorrowingRequest.objects, "filter", side_effect=cancel_before_the_update):
+            response = self.client.patch(f"/api/v1/requests/{accepted.pk}/accept/")
+        self.assertEqual(response.status_code, 200, response.data)
+
+        statuses = dict(BorrowingRequest.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[cancelled.pk], BorrowingRequest.StatusChoices.CANCELLED_BORROWER)
+        self.assertEqual(statuses[conflicting[1].pk], BorrowingRequest.StatusChoices.DECLINED)
+        notified = Notification.objects.filter(
+            notification_type=Notification.NotificationTypeChoices.REQUEST_DECLINED
+        ).values_list("related_request_id", flat=True)
+        self.assertEqual(list(notified), [conflicting[1].pk])
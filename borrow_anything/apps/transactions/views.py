@@ -1,5 +1,7 @@
 # apps/transactions/views.py
 
+import logging
+
 # Django imports
 from django.db.models import Q, Avg  # Import Avg
 from django.utils import timezone
@@ -18,10 +20,14 @@ from .serializers import (
     ReviewSerializer,
 )
 from apps.items.models import Item
+from apps.notifications.models import Notification
+from apps.notifications.utils import create_notifications
 from apps.users.models import UserProfile  # Import UserProfile
 
 from .permissions import IsReviewParticipant
 
+logger = logging.getLogger(__name__)
+
 
 # Permissions (Defined here for clarity, could be in permissions.py)
 class IsBorrowerOrLender(permissions.BasePermission):
@@ -110,6 +116,19 @@ class BorrowingRequestViewSet(
     permission_classes = [
         permissions.IsAuthenticated
     ]  # Base permission for all actions
+    # Most queries a request may run (see apps/core/middleware.py); pinned by tests.py
+    query_budget = {
+        "list": 2,
+        "retrieve": 2,
+        # Conflicting requests are declined and notified in bulk (one more query
+        # if one of them changed status in the meantime)
+        "accept": 10,
+        "decline": 5,
+        "cancel": 7,
+        "confirm_pickup": 5,
+        "confirm_return": 4,
+        "complete": 11,  # Creates the review and notifies both users
+    }
 
     def get_queryset(self):
         """
@@ -230,28 +249,51 @@ class BorrowingRequestViewSet(
             pk=instance.pk
         )  # Exclude the one just accepted
 
-        declined_count = 0
-        for req in conflicting_requests:
-            req.status = BorrowingRequest.StatusChoices.DECLINED
-            req.processed_at = timezone.now()
-            req.lender_response_message = (
+        # Declined with one UPDATE and notified with one INSERT, however many there are.
+        # update() sends no post_save, so the "declined" notifications that
+        # signals.py would create per request are written here instead.
+        declined = list(conflicting_requests.values_list("pk", "borrower_profile_id"))
+        if declined:
+            auto_decline_message = (
                 "Item automatically declined as it was booked for conflicting dates."
             )
-            req.save(
-                update_fields=[
-                    "status",
-                    "processed_at",
-                    "lender_response_message",
-                    "updated_at",
+            now = timezone.now()
+            updated = BorrowingRequest.objects.filter(
+                pk__in=[pk for pk, _ in declined],
+                status=BorrowingRequest.StatusChoices.PENDING,  # Never overwrite a cancellation
+            ).update(
+                status=BorrowingRequest.StatusChoices.DECLINED,
+                processed_at=now,
+                lender_response_message=auto_decline_message,
+                updated_at=now,
+            )
+            if updated < len(declined):
+                # Some changed status (e.g. cancelled) since they were read: only
+                # notify the borrowers whose requests this UPDATE declined
+                declined = list(
+                    BorrowingRequest.objects.filter(
+                        pk__in=[pk for pk, _ in declined],
+                        status=BorrowingRequest.StatusChoices.DECLINED,
+                        processed_at=now,
+                    ).values_list("pk", "borrower_profile_id")
+                )
+        if declined:
+            create_notifications(
+                [
+                    Notification(
+                        recipient_id=borrower_profile_id,
+                        actor_id=instance.lender_profile_id,
+                        notification_type=Notification.NotificationTypeChoices.REQUEST_DECLINED,
+                        related_request_id=request_id,
+                        related_item_id=instance.item_id,
+                        params={"variant": "with_reason", "reason": auto_decline_message},
+                    )
+                    for request_id, borrower_profile_id in declined
                 ]
             )
-            declined_count += 1
-            # TODO (Signal): Trigger 'Request Declined' Notification for req.borrower_profile
-
-        if declined_count > 0:
-            print(
-                f"Auto-declined {declined_count} conflicting requests for item {instance.item.id}"
-            )  # Replace with logging
+            logger.info(
+                f"Auto-declined {len(declined)} conflicting requests for item {instance.item_id}"
+            )
 
         # TODO (Signal): Trigger 'Request Accepted' Notification for instance.borrower_profile
 
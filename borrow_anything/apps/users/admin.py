@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import UserProfile
+from django import forms
+from django.contrib import admin, messages
+from django.utils.translation import ngettext
+from .models import ResidentImport, UserProfile
+from .onboarding import runnable_imports, start_resident_import
 
 
 @admin.register(UserProfile)
@@ -7,3 +10,100 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "community", "phone_number", "is_community_member_verified")
     search_fields = ("user__username", "phone_number", "community__name")
     list_filter = ("is_community_member_verified", "community")
+
+
+class ResidentImportForm(forms.ModelForm):
+    """Upload form: the file's content is stored on the import and processed in the background."""
+    upload = forms.FileField(help_text="CSV or JSON Lines file of residents (see apps/users/onboarding.py).")
+
+    class Meta:
+        model = ResidentImport
+        fields = ("community",)
+
+    def clean_upload(self):
+        upload = self.cleaned_data["upload"]
+        try:
+            self.instance.data = upload.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise forms.ValidationError("The file must be UTF-8 encoded.")
+        self.instance.file_name = upload.name
+        self.instance.file_format = (
+            ResidentImport.FormatChoices.JSONL
+            if upload.name.endswith((".jsonl", ".ndjson"))
+            else ResidentImport.FormatChoices.CSV
+        )
+        return upload
+
+
+@admin.register(ResidentImport)
+class ResidentImportAdmin(admin.ModelAdmin):
+    # Show progress of each import in the list view
+    list_display = (
+        "__str__",
+        "file_name",
+        "status",
+        "created_count",
+        "error_count",
+        "total_rows",
+        "created_by",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("community__name", "file_name")
+    # Everything except the upload is set by the job
+    readonly_fields = (
+        "file_name",
+        "file_format",
+        "created_by",
+        "status",
+        "total_rows",
+        "created_count",
+        "error_count",
+        "errors",
+        "error",
+        "created_at",
+        "started_at",
+        "progress_at",
+        "finished_at",
+    )
+    ordering = ("-created_at",)
+    actions = ["run_pending_imports"]
+
+    def get_form(self, request, obj=None, **kwargs):
+        if obj is None:
+            kwargs["form"] = ResidentImportForm  # Adding: community + file upload
+        return super().get_form(request, obj, **kwargs)
+
+    def get_fields(self, request, obj=None):
+        if obj is None:
+            return ("community", "upload")
+        return ("community",) + self.readonly_fields
+
+    def has_change_permission(self, request, obj=None):
+        return False  # Imports are records of a job; start a new one instead
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+        if not change:
+            start_resident_import(obj)
+
+    @admin.action(description="Run selected pending or interrupted imports")
+    def run_pending_imports(self, request, queryset):
+        """Queues imports that are still pending or were interrupted (e.g. by a restart)."""
+        pending = queryset & runnable_imports()
+        for resident_import in pending:
+            start_resident_import(resident_import)
+        count = len(pending)
+        self.message_user(
+            request,
+            ngettext(
+                "%d import was queued.",
+                "%d imports were queued.",
+                count,
+            )
+            % count,
+            messages.SUCCESS,
+        )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = "apps.users"
+
+    def ready(self):
+        import apps.users.signals  # noqa F401 - registers the signal receivers
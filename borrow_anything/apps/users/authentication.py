@@ -0,0 +1,67 @@
+# apps/users/authentication.py
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import get_cached_auth_user, set_cached_auth_user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the user together with their profile and
+    primary community in a single query, and caches the result per user id for
+    USERS_AUTH_CACHE_TIMEOUT seconds.
+
+    `request.user.profile` (and `.profile.community`) therefore cost no extra
+    queries in views. The cache is invalidated by signals.py whenever the user or
+    profile changes (once the change commits), so deactivations and password
+    changes apply from the next request.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_auth_user(user_id)
+        if user is None:
+            try:
+                user = self.user_model.objects.select_related(
+                    "profile", "profile__community"
+                ).get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            # Users without a profile are cached too: the empty reverse relation is
+            # remembered, so getattr(user, "profile", None) stays query-free.
+            set_cached_auth_user(user_id, user)
+
+        # Same checks as JWTAuthentication.get_user()
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Trusts the token's claims without loading the user at all: request.user is a
+    TokenUser carrying only the id (no profile, no is_staff).
+    Opt in per view, for read-only endpoints that just need "is authenticated"
+    (e.g. categories, communities). A deactivated user keeps access to them until
+    their access token expires.
+    """
@@ -0,0 +1,60 @@
+# apps/users/backends.py
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.core.exceptions import PermissionDenied
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+
+from .hashing import HashingPoolFull, run_hashing
+
+UserModel = get_user_model()
+
+
+def _needs_rehash(encoded):
+    """Same rule Django uses to upgrade hashes on login (algorithm or iterations changed)."""
+    preferred = get_hasher("default")
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend that verifies passwords on the bounded hashing pool (hashing.py).
+    Used by TokenObtainPairView (via django.contrib.auth.authenticate) and the admin login.
+    Only the hash runs on the pool; database access stays on the request thread.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            try:
+                user = UserModel._default_manager.get_by_natural_key(username)
+            except UserModel.DoesNotExist:
+                # Hash anyway so unknown usernames take as long as wrong passwords
+                run_hashing(make_password, password)
+                return None
+
+            if not run_hashing(check_password, password, user.password):
+                return None
+            if _needs_rehash(user.password):
+                user.password = run_hashing(make_password, password)
+                user.save(update_fields=["password"])
+        except HashingPoolFull:
+            if isinstance(request, Request):
+                raise Throttled(
+                    wait=settings.PASSWORD_HASHING_RETRY_AFTER,
+                    detail="Too many sign-in attempts right now, please try again shortly.",
+                )
+            # Plain Django views (e.g. the admin login): stop here and fail the login
+            raise PermissionDenied("Too many sign-in attempts right now.")
+
+        return user if self.user_can_authenticate(user) else None
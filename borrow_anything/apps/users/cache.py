@@ -0,0 +1,63 @@
+# apps/users/cache.py
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.core.cache import aset_value, set_value
+
+# Per-user caches, dropped by the receivers in signals.py:
+# - the serialized /users/me/ response. The frontend calls /me/ on every page
+#   load, so a hit skips the profile queries and the S3 URL signing.
+# - the User (with profile and primary community) resolved by
+#   authentication.CachedJWTAuthentication on every authenticated request.
+# Both are per-user keys dropped directly, not versioned namespaces (see
+# apps/core/cache.py): one user's change must not invalidate everybody's entry.
+
+
+def me_cache_key(user_id):
+    return f"users:me:{user_id}"
+
+
+def auth_user_cache_key(user_id):
+    return f"users:auth:{user_id}"
+
+
+async def aget_cached_me(user_id):
+    return await cache.aget(me_cache_key(user_id))
+
+
+async def aset_cached_me(user_id, data):
+    await aset_value(me_cache_key(user_id), data, settings.USERS_ME_CACHE_TIMEOUT)
+
+
+def get_cached_auth_user(user_id):
+    return cache.get(auth_user_cache_key(user_id))
+
+
+def set_cached_auth_user(user_id, user):
+    set_value(auth_user_cache_key(user_id), user, settings.USERS_AUTH_CACHE_TIMEOUT)
+
+
+def _delete_after_commit(keys):
+    """
+    Deletes once the transaction commits (immediately outside one): deleting
+    earlier would let a concurrent request cache the old rows again before the
+    new ones are visible.
+    """
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_me(*user_ids):
+    """Drops the cached /me/ response of the given users."""
+    if user_ids:
+        _delete_after_commit([me_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidate_user(*user_ids):
+    """Drops everything cached for the given users (auth user and /me/)."""
+    if user_ids:
+        _delete_after_commit(
+            [auth_user_cache_key(user_id) for user_id in user_ids]
+            + [me_cache_key(user_id) for user_id in user_ids]
+        )
@@ -0,0 +1,126 @@
+# apps/users/hashing.py
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HashingPoolFull(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class PasswordHashingPool:
+    """
+    A small, dedicated executor for password hashing (PBKDF2 by default).
+
+    At most `workers` hashes run at once per process; up to `queue_size` more
+    wait for a free worker. Anything beyond that is rejected immediately with
+    HashingPoolFull (turned into a 429 by the callers), so a burst of signups or
+    logins is capped instead of occupying every request worker with hashing.
+    """
+
+    def __init__(self, workers, queue_size, sample_size=1000):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hashing"
+        )
+        # One slot per running or queued job
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        # Metrics
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._hash_times = deque(maxlen=sample_size)  # Seconds spent hashing
+        self._wait_times = deque(maxlen=sample_size)  # Seconds spent queued
+
+    def run(self, fn, *args):
+        """Runs fn(*args) on the pool and returns its result (blocking)."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            logger.warning("Password hashing pool is saturated, rejecting request.")
+            raise HashingPoolFull()
+
+        with self._lock:
+            self._in_flight += 1
+        submitted_at = time.perf_counter()
+        try:
+            future = self._executor.submit(self._timed, submitted_at, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the job finishes, even if the caller stopped waiting
+        future.add_done_callback(lambda f: self._release())
+        return future.result()
+
+    def _timed(self, submitted_at, fn, *args):
+        started_at = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            finished_at = time.perf_counter()
+            with self._lock:
+                self._completed += 1
+                self._wait_times.append(started_at - submitted_at)
+                self._hash_times.append(finished_at - started_at)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def metrics(self):
+        """Snapshot of the pool's counters and recent latencies (in milliseconds)."""
+        with self._lock:
+            hash_times = sorted(self._hash_times)
+            wait_times = sorted(self._wait_times)
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "hash_ms": _percentiles(hash_times),
+                "queue_wait_ms": _percentiles(wait_times),
+            }
+
+
+def _percentiles(sorted_samples):
+    if not sorted_samples:
+        return None
+
+    def pick(fraction):
+        index = min(int(fraction * len(sorted_samples)), len(sorted_samples) - 1)
+        return round(sorted_samples[index] * 1000, 2)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": pick(1.0)}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide hashing pool, created on first use from settings."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordHashingPool(
+                    workers=settings.PASSWORD_HASHING_WORKERS,
+                    queue_size=settings.PASSWORD_HASHING_QUEUE_SIZE,
+                )
+    return _pool
+
+
+def run_hashing(fn, *args):
+    """Shortcut for get_pool().run(fn, *args)."""
+    return get_pool().run(fn, *args)
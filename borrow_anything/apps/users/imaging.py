@@ -0,0 +1,214 @@
+# apps/users/imaging.py
+
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from apps.storage.models import ContentBlob
+from apps.storage.utils import IMMUTABLE_CACHE_CONTROL, is_blob_key
+from .utils import S3ImageUploader
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: without it images are served as uploaded
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+# Size variants generated for every uploaded image: name -> longest edge in pixels.
+# Variants are WEBP without metadata and are stored next to the original as
+# "<original key>.<name>.webp". The image row records them in its variants field:
+#   {"source": "<original key>", "thumb": "<key>", "medium": "<key>", "full": "<key>"}
+# "source" tells serializers whether the variants still belong to the current image.
+IMAGE_VARIANTS = {
+    "thumb": 320,  # List screens and avatars
+    "medium": 800,  # Profile pictures, item cards on larger screens
+    "full": 1600,  # Detail screens
+}
+VARIANT_CONTENT_TYPE = "image/webp"
+
+# Background worker for processing new uploads (see schedule()).
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_PROCESSING_WORKERS, thread_name_prefix="image-processing"
+)
+
+
+def is_available():
+    """True if Pillow is installed and can write WEBP."""
+    if Image is None:
+        return False
+    from PIL import features
+
+    return features.check("webp")
+
+
+def variant_key(s3_key, name):
+    return f"{s3_key}.{name}.webp"
+
+
+def pick_variant(s3_key, variants, name):
+    """
+    Returns the S3 key to serve for `name`: the variant if it was generated from
+    the current image, otherwise the original (not processed yet, or no Pillow).
+    """
+    if s3_key and variants and variants.get("source") == s3_key and variants.get(name):
+        return variants[name]
+    return s3_key
+
+
+def render_variants(data):
+    """
+    Generates every variant from the original image bytes.
+    Returns {name: webp_bytes}. EXIF orientation is applied first; no metadata
+    (EXIF, GPS, ICC comments) is copied into the variants.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+    rendered = {}
+    for name, max_edge in IMAGE_VARIANTS.items():
+        variant = image.copy()
+        variant.thumbnail((max_edge, max_edge), Image.LANCZOS)  # Never upscales
+        buffer = io.BytesIO()
+        variant.save(buffer, format="WEBP", quality=settings.IMAGE_VARIANT_QUALITY, method=4)
+        rendered[name] = buffer.getvalue()
+    return rendered
+
+
+def existing_variants(s3_key):
+    """
+    Variants already generated for the same blob. Blob keys are shared by
+    identical uploads, and so are their variants, which are recorded on the
+    ContentBlob row (one indexed lookup by key).
+    """
+    if not is_blob_key(s3_key):
+        return None
+    variants = ContentBlob.objects.filter(s3_key=s3_key).values_list("variants", flat=True).first()
+    if variants and variants.get("source") == s3_key:
+        return variants
+    return None
+
+
+def process_image(s3_key, uploader=None):
+    """
+    Downloads the original, renders and uploads its variants (unless the same
+    blob was processed before). Returns the variants mapping to store on the image row.
+    """
+    variants = existing_variants(s3_key)
+    if variants:
+        return variants
+    uploader = uploader or S3ImageUploader()
+    response = uploader.s3_client.get_object(Bucket=uploader.bucket_name, Key=s3_key)
+    rendered = render_variants(response["Body"].read())
+
+    variants = {"source": s3_key}
+    for name, body in rendered.items():
+        key = variant_key(s3_key, name)
+        uploader.s3_client.put_object(
+            Bucket=uploader.bucket_name,
+            Key=key,
+            Body=body,
+            ContentType=VARIANT_CONTENT_TYPE,
+            # Variants of a key never change (a new upload gets a new key)
+            CacheControl=IMMUTABLE_CACHE_CONTROL,
+        )
+        variants[name] = key
+    if is_blob_key(s3_key):
+        # Later uploads of the same content reuse them (see existing_variants())
+        ContentBlob.objects.filter(s3_key=s3_key).update(variants=variants)
+    return variants
+
+
+def delete_variants(variants, uploader=None):
+    """
+    Best-effort removal of an image's variant objects. Variants of blobs are shared
+    and are deleted together with the blob by `manage.py gc_blobs`.
+    """
+    if is_blob_key((variants or {}).get("source")):
+        return
+    keys = [key for name, key in (variants or {}).items() if name != "source"]
+    if not keys:
+        return
+    uploader = uploader or S3ImageUploader()
+    try:
+        uploader.s3_client.delete_objects(
+            Bucket=uploader.bucket_name,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+    except Exception as e:
+        logger.warning(f"Could not delete image variants {keys}: {e}")
+
+
+def process_item_image(image_id):
+    """Generates the variants of one ItemImage (no-op if already up to date)."""
+    from apps.items.models import ItemImage
+
+    image = ItemImage.objects.filter(pk=image_id).only("s3_key", "variants").first()
+    if image is None or (image.variants or {}).get("source") == image.s3_key:
+        return
+    variants = process_image(image.s3_key)
+    # Only store them if the image still points at the same original
+    ItemImage.objects.filter(pk=image_id, s3_key=image.s3_key).update(variants=variants)
+
+
+# UserProfile image fields: original key field -> variants field
+PROFILE_IMAGE_FIELDS = {
+    "profile_picture_s3_key": "profile_picture_variants",
+    "cover_photo_s3_key": "cover_photo_variants",
+}
+
+
+def process_profile_images(user_id):
+    """Generates the variants of a user's profile picture and cover photo."""
+    from apps.core.cache import bump_version
+    from .cache import invalidate_user
+    from .models import UserProfile
+
+    profile = UserProfile.objects.filter(user_id=user_id).first()
+    if profile is None:
+        return
+    for key_field, variants_field in PROFILE_IMAGE_FIELDS.items():
+        s3_key = getattr(profile, key_field)
+        if not s3_key or (getattr(profile, variants_field) or {}).get("source") == s3_key:
+            continue
+        variants = process_image(s3_key)
+        updated = UserProfile.objects.filter(user_id=user_id, **{key_field: s3_key}).update(
+            **{variants_field: variants}
+        )
+        if updated:
+            invalidate_user(user_id)  # update() sends no signal; /me/ embeds the URLs
+            bump_version(UserProfile)
+
+
+def _run_in_background(func, *args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception as e:
+        logger.error(f"Image processing {func.__name__}{args} failed: {e}")
+    finally:
+        close_old_connections()
+
+
+def schedule(func, *args):
+    """
+    Runs func(*args) on the image processing worker after the current transaction
+    commits. Images that were never processed (e.g. the process restarted) are
+    picked up by `python manage.py process_images`.
+    """
+    if not is_available():
+        return
+    transaction.on_commit(lambda: _executor.submit(_run_in_background, func, *args))
+
+
+def schedule_item_images(image_ids):
+    for image_id in image_ids:
+        schedule(process_item_image, image_id)
+
+
+def schedule_profile_images(user_id):
+    schedule(process_profile_images, user_id)
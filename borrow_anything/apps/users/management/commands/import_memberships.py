@@ -0,0 +1,81 @@
+# apps/users/management/commands/import_memberships.py
+
+import csv
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.communities.models import Community
+from apps.users.services import import_memberships
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+class Command(BaseCommand):
+    """
+    Adds existing users to a community from a CSV file, e.g. when onboarding a
+    whole apartment complex. The file needs a "username" or "email" column and
+    may have "is_primary" and "is_verified" columns (1/true/yes).
+        python manage.py import_memberships residents.csv --community 12
+    Users that are already members are left as they are; unknown users are reported.
+    """
+
+    help = "Bulk-add users from a CSV file to a community."
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_file", help="Path to the CSV file.")
+        parser.add_argument(
+            "--community",
+            type=int,
+            required=True,
+            help="ID of the community to add the users to.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows imported per transaction.",
+        )
+        parser.add_argument(
+            "--verified",
+            action="store_true",
+            help="Mark every imported membership as verified.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            community = Community.objects.get(pk=options["community"])
+        except Community.DoesNotExist:
+            raise CommandError(f"Community {options['community']} does not exist.")
+
+        created = 0
+        skipped = []
+        with open(options["csv_file"], newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            fields = {name.strip().lower() for name in reader.fieldnames or []}
+            if not fields & {"username", "email"}:
+                raise CommandError("The CSV file needs a 'username' or 'email' column.")
+
+            rows = (self.parse_row(row, options["verified"]) for row in reader)
+            while chunk := list(islice(rows, options["chunk_size"])):
+                chunk_created, chunk_skipped = import_memberships(community, chunk)
+                created += chunk_created
+                skipped.extend(chunk_skipped)
+                self.stdout.write(f"Imported {created} memberships so far...")
+
+        for row in skipped:
+            self.stderr.write(f"Unknown user: {row.get('username') or row.get('email')}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Added {created} members to {community.name}, skipped {len(skipped)} unknown users."
+            )
+        )
+
+    def parse_row(self, row, verified):
+        row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+        return {
+            "username": row.get("username"),
+            "email": row.get("email"),
+            "is_primary": row.get("is_primary", "").lower() in TRUE_VALUES,
+            "is_verified": verified or row.get("is_verified", "").lower() in TRUE_VALUES,
+        }
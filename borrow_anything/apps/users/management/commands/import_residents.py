@@ -0,0 +1,95 @@
+# apps/users/management/commands/import_residents.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.communities.models import Community
+from apps.users.models import ResidentImport
+from apps.users.onboarding import import_residents, run_resident_import, runnable_imports
+
+
+class Command(BaseCommand):
+    """
+    Creates accounts for a community's residents from a CSV or JSON Lines file
+    (see apps/users/onboarding.py for the columns):
+        python manage.py import_residents residents.csv --community 12
+        python manage.py import_residents residents.jsonl --community 12 --dry-run
+    Imports started from the admin run in the background; any left pending or
+    interrupted (e.g. the process restarted) are run, or resumed, with:
+        python manage.py import_residents --pending
+    """
+
+    help = "Bulk-create users, profiles and memberships from a CSV/JSONL file of residents."
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", nargs="?", help="Path to the CSV or JSONL file.")
+        parser.add_argument("--community", type=int, help="ID of the residents' community.")
+        parser.add_argument(
+            "--format",
+            choices=ResidentImport.FormatChoices.values,
+            help="File format (default: from the file extension).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=None, help="Rows written per transaction.")
+        parser.add_argument(
+            "--workers", type=int, default=None, help="Processes hashing passwords in parallel."
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate the file (and check for existing users) without creating anything.",
+        )
+        parser.add_argument(
+            "--pending",
+            action="store_true",
+            help="Run the imports uploaded in the admin that are still pending or were interrupted.",
+        )
+
+    def handle(self, *args, **options):
+        if options["pending"]:
+            pending = runnable_imports().order_by("created_at").values_list("pk", flat=True)
+            for import_id in pending:
+                run_resident_import(import_id)
+                self.stdout.write(f"Ran resident import {import_id}.")
+            return
+
+        if not options["file"] or not options["community"]:
+            raise CommandError("Give a file and --community (or use --pending).")
+        try:
+            community = Community.objects.get(pk=options["community"])
+        except Community.DoesNotExist:
+            raise CommandError(f"Community {options['community']} does not exist.")
+        file_format = options["format"] or (
+            ResidentImport.FormatChoices.JSONL
+            if options["file"].endswith((".jsonl", ".ndjson"))
+            else ResidentImport.FormatChoices.CSV
+        )
+
+        def progress(report):
+            self.stdout.write(
+                f"{report.total} rows read, {report.created} created, {len(report.errors)} rejected..."
+            )
+
+        with open(options["file"], newline="", encoding="utf-8-sig") as f:
+            report = import_residents(
+                community,
+                f,
+                file_format,
+                chunk_size=options["chunk_size"],
+                workers=options["workers"],
+                dry_run=options["dry_run"],
+                on_chunk=progress,
+            )
+
+        for line, error in report.errors:
+            self.stderr.write(f"Line {line}: {error}")
+        if options["dry_run"]:
+            valid = report.total - len(report.errors)
+            self.stdout.write(
+                self.style.SUCCESS(f"[dry run] {valid} of {report.total} rows are valid.")
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Created {report.created} residents in {community.name}, "
+                    f"rejected {len(report.errors)} of {report.total} rows."
+                )
+            )
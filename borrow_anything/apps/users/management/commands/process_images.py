@@ -0,0 +1,92 @@
+# apps/users/management/commands/process_images.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from apps.items.models import ItemImage
+from apps.storage.models import ContentBlob
+from apps.users import imaging
+from apps.users.models import UserProfile
+
+
+class Command(BaseCommand):
+    """
+    Generates missing or outdated image variants in the foreground.
+    New uploads are processed by a background worker in the web process; this
+    command backfills existing images and picks up any the worker missed.
+        python manage.py process_images --limit 500
+    """
+
+    help = "Generate thumb/medium/full WEBP variants for item and profile images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Process at most this many item images and profiles.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate variants even if they are up to date.",
+        )
+
+    def handle(self, *args, **options):
+        if not imaging.is_available():
+            raise CommandError("Pillow with WEBP support is required to process images.")
+        limit = options["limit"]
+
+        if options["force"]:
+            ItemImage.objects.update(variants={})
+            UserProfile.objects.update(profile_picture_variants={}, cover_photo_variants={})
+            # Otherwise imaging.existing_variants() hands the old variants of a blob back
+            ContentBlob.objects.update(variants={})
+
+        # Variants are current when they were generated from the current key
+        image_ids = [
+            image_id
+            for image_id, s3_key, variants in ItemImage.objects.order_by("pk")
+            .values_list("pk", "s3_key", "variants")
+            .iterator()
+            if (variants or {}).get("source") != s3_key
+        ][:limit]
+        profile_ids = [
+            row[0]
+            for row in UserProfile.objects.exclude(
+                Q(profile_picture_s3_key__isnull=True) | Q(profile_picture_s3_key=""),
+                Q(cover_photo_s3_key__isnull=True) | Q(cover_photo_s3_key=""),
+            )
+            .order_by("pk")
+            .values_list(
+                "user_id",
+                "profile_picture_s3_key",
+                "profile_picture_variants",
+                "cover_photo_s3_key",
+                "cover_photo_variants",
+            )
+            .iterator()
+            if any(
+                s3_key and (variants or {}).get("source") != s3_key
+                for s3_key, variants in (row[1:3], row[3:5])
+            )
+        ][:limit]
+
+        processed = failed = 0
+        for image_id in image_ids:
+            try:
+                imaging.process_item_image(image_id)
+                processed += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"Item image {image_id} failed: {e}"))
+
+        for user_id in profile_ids:
+            try:
+                imaging.process_profile_images(user_id)
+                processed += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"Profile images of user {user_id} failed: {e}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} images, {failed} failed."))
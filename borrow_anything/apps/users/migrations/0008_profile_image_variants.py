@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_alter_userprofile_average_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='cover_photo_variants',
+            field=models.JSONField(blank=True, default=dict, help_text="S3 keys of the cover photo's size variants"),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, help_text="S3 keys of the profile picture's size variants"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_resident_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='residentimport',
+            name='progress_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
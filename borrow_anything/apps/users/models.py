@@ -1,10 +1,12 @@
 # apps/users/models.py
 
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models import F, ExpressionWrapper, FloatField
 from apps.communities.models import Community
+from apps.core.cache import bump_version
+from .cache import invalidate_user
 
 # Note: We are NOT importing Community model yet
 
@@ -51,6 +53,18 @@ class UserProfile(models.Model):
         help_text="S3 object key for the cover photo",
     )
 
+    # Resized WEBP copies generated after upload (see imaging.py)
+    profile_picture_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="S3 keys of the profile picture's size variants",
+    )
+    cover_photo_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="S3 keys of the cover photo's size variants",
+    )
+
     is_community_member_verified = models.BooleanField(
         default=False,
         help_text="Is user's membership in their selected community verified (e.g., via RWA check)?",
@@ -103,6 +117,9 @@ class UserProfile(models.Model):
         )
         # Refresh the instance data from the database
         self.refresh_from_db(fields=['average_rating', 'rating_count'])
+        # update() sends no post_save signal, so drop the cached profile here
+        invalidate_user(self.user_id)
+        transaction.on_commit(lambda: bump_version(UserProfile))
 
 
 class UserCommunityMembership(models.Model):
@@ -139,17 +156,74 @@ class UserCommunityMembership(models.Model):
         return f"{self.user.username} in {self.community.name}"
     
     def save(self, *args, **kwargs):
-        # If this membership is being set as primary, unset any other primary memberships
-        if self.is_primary:
-            # Get all other memberships for this user
-            UserCommunityMembership.objects.filter(
-                user=self.user, 
-                is_primary=True
-            ).exclude(pk=self.pk).update(is_primary=False)
-            
-            # Also update the user's profile to make this their primary community
-            profile, created = UserProfile.objects.get_or_create(user=self.user)
-            profile.community = self.community
-            profile.save(update_fields=['community'])
-            
         super().save(*args, **kwargs)
+        # Admin/shell edits: keep the other memberships and the profile in line.
+        # The API uses apps/users/services.py directly.
+        if self.is_primary:
+            from .services import set_primary_community
+
+            set_primary_community(self.user_id, self.community_id)
+
+
+class ResidentImport(models.Model):
+    """
+    A bulk onboarding job started from the admin: creates users, profiles and
+    memberships for every valid row of an uploaded CSV/JSONL file of residents.
+    Runs as a background job (see onboarding.py); per-row errors are kept here.
+    """
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RUNNING = "RUNNING", "Running"
+        COMPLETED = "COMPLETED", "Completed"
+        FAILED = "FAILED", "Failed"
+
+    class FormatChoices(models.TextChoices):
+        CSV = "csv", "CSV"
+        JSONL = "jsonl", "JSON Lines"
+
+    community = models.ForeignKey(
+        Community,
+        on_delete=models.CASCADE,
+        related_name="resident_imports",
+        help_text="Every imported resident joins this community (as their primary one).",
+    )
+    file_name = models.CharField(max_length=255, blank=True)
+    file_format = models.CharField(max_length=10, choices=FormatChoices.choices)
+    # The uploaded file itself; partner files are a few MB at most
+    data = models.TextField()
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="resident_imports",
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+        db_index=True,
+    )
+    # Progress reporting
+    total_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(
+        default=list,
+        blank=True,
+        help_text='Rejected rows: [{"line": 12, "error": "..."}] (first 1000 only).',
+    )
+    error = models.TextField(blank=True, help_text="Failure reason, if the job failed.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Bumped after every chunk: a RUNNING import without progress for
+    # USERS_IMPORT_STALE_AFTER seconds was interrupted and can be resumed
+    progress_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Import #{self.pk} into {self.community} ({self.get_status_display()})"
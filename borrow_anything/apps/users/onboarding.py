@@ -0,0 +1,407 @@
+# apps/users/onboarding.py
+
+import csv
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Lower
+from django.utils import timezone
+
+from .models import ResidentImport, UserCommunityMembership, UserProfile
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+# Bulk onboarding of a community's residents from a CSV or JSON Lines file.
+# Columns/keys: username, email (required), first_name, last_name, password,
+# phone_number, address_details, is_verified (all optional). Rows without a
+# password get an unusable one (residents set theirs via password reset).
+#
+# The file is read and validated in one streaming pass, chunk by chunk. Each
+# valid chunk is checked against the database with one query per unique field,
+# its passwords are hashed on a process pool (hashing is CPU-bound and would
+# otherwise take hours for thousands of residents), and the users, profiles and
+# memberships are written with three bulk_creates in one transaction.
+
+RESIDENT_FIELDS = [
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "password",
+    "phone_number",
+    "address_details",
+    "is_verified",
+]
+TRUE_VALUES = {"1", "true", "yes", "y"}
+MAX_STORED_ERRORS = 1000
+
+# Background worker for imports started from the admin (one at a time)
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="resident-import")
+
+
+class ImportReport:
+    """Totals and per-row errors of an import."""
+
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.errors = []  # [(line number, message)]
+        self.unstored_errors = 0  # Errors of a resumed import's earlier rows beyond MAX_STORED_ERRORS
+
+    @property
+    def error_count(self):
+        return len(self.errors) + self.unstored_errors
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+
+def read_rows(lines, file_format):
+    """
+    Yields (line number, row dict or error message) for every record in the file.
+    `lines` is any iterable of text lines (an open file, str.splitlines(), ...).
+    """
+    if file_format == ResidentImport.FormatChoices.JSONL:
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, "Each line must be a JSON object."
+                continue
+            yield line_no, row
+        return
+
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # Header names are matched case-insensitively
+        yield reader.line_num, {(key or "").strip().lower(): value for key, value in row.items()}
+
+
+def clean_row(row, seen):
+    """
+    Validates and normalizes one resident. Returns the cleaned dict; raises
+    ValidationError with a readable message otherwise. `seen` collects the
+    usernames/emails/phone numbers of earlier rows to reject duplicates in the file.
+    """
+    cleaned = {}
+    for field in RESIDENT_FIELDS:
+        value = row.get(field)
+        cleaned[field] = "" if value is None else str(value).strip()
+
+    username = User.normalize_username(cleaned["username"])
+    if not username:
+        raise ValidationError("username is required.")
+    if len(username) > 150:
+        raise ValidationError("username is longer than 150 characters.")
+    User.username_validator(username)
+    email = User.objects.normalize_email(cleaned["email"])
+    if not email:
+        raise ValidationError("email is required.")
+    validate_email(email)
+    if len(cleaned["phone_number"]) > 15:
+        raise ValidationError("phone_number is longer than 15 characters.")
+
+    unique_values = [
+        (kind, value)
+        for kind, value in (("username", username), ("email", email.lower()), ("phone_number", cleaned["phone_number"]))
+        if value
+    ]
+    for kind, value in unique_values:
+        if value in seen[kind]:
+            raise ValidationError(f"Duplicate {kind} {value!r} earlier in the file.")
+
+    if cleaned["password"]:
+        validate_password(cleaned["password"], User(username=username, email=email))
+
+    # Only rows that passed every check count as seen: a fixed copy of a
+    # rejected row later in the file is not a duplicate
+    for kind, value in unique_values:
+        seen[kind].add(value)
+
+    cleaned["username"] = username
+    cleaned["email"] = email
+    cleaned["is_verified"] = cleaned["is_verified"].lower() in TRUE_VALUES or row.get("is_verified") is True
+    return cleaned
+
+
+def _existing_values(residents):
+    """Usernames, emails (lowercase) and phone numbers of the chunk already in use."""
+    usernames = [r["username"] for r in residents]
+    emails = [r["email"].lower() for r in residents]
+    phones = [r["phone_number"] for r in residents if r["phone_number"]]
+    return {
+        "username": set(User.objects.filter(username__in=usernames).values_list("username", flat=True)),
+        "email": set(
+            User.objects.annotate(email_lower=Lower("email"))
+            .filter(email_lower__in=emails)
+            .values_list("email_lower", flat=True)
+        ),
+        "phone_number": set(
+            UserProfile.objects.filter(phone_number__in=phones).values_list("phone_number", flat=True)
+        ),
+    }
+
+
+def _create_chunk(community, residents):
+    """Writes one chunk of validated residents (users, profiles, memberships)."""
+    with transaction.atomic():
+        User.objects.bulk_create(
+            [
+                User(
+                    username=r["username"],
+                    email=r["email"],
+                    first_name=r["first_name"][:150],
+                    last_name=r["last_name"][:150],
+                    password=r["password_hash"],
+                )
+                for r in residents
+            ]
+        )
+        # Not every database returns primary keys from bulk_create, so look them up
+        user_ids = dict(
+            User.objects.filter(username__in=[r["username"] for r in residents]).values_list(
+                "username", "pk"
+            )
+        )
+        UserProfile.objects.bulk_create(
+            [
+                UserProfile(
+                    user_id=user_ids[r["username"]],
+                    community=community,
+                    phone_number=r["phone_number"] or None,
+                    address_details=r["address_details"][:255],
+                    is_community_member_verified=r["is_verified"],
+                )
+                for r in residents
+            ]
+        )
+        # New users have no other communities, so this one is their primary
+        UserCommunityMembership.objects.bulk_create(
+            [
+                UserCommunityMembership(
+                    user_id=user_ids[r["username"]],
+                    community=community,
+                    is_primary=True,
+                    is_verified=r["is_verified"],
+                )
+                for r in residents
+            ]
+        )
+
+
+def _hashing_pool(workers):
+    # "spawn" instead of fork: imports may run inside the threaded web process.
+    # Children start with a fresh interpreter, so set Django up before hashing.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    )
+
+
+def import_residents(
+    community,
+    lines,
+    file_format,
+    chunk_size=None,
+    workers=None,
+    dry_run=False,
+    on_chunk=None,
+    report=None,
+):
+    """
+    Imports residents into `community` from the lines of a CSV/JSONL file.
+    Invalid rows are skipped and reported; valid rows are created in chunks.
+    `on_chunk(report)` is called after every chunk (progress reporting).
+    To resume an interrupted import, pass the report of the chunks already
+    written: its first report.total records are skipped.
+    Returns an ImportReport.
+    """
+    chunk_size = chunk_size or settings.USERS_IMPORT_CHUNK_SIZE
+    workers = workers or settings.USERS_IMPORT_HASHING_WORKERS or os.cpu_count() or 1
+    report = report or ImportReport()
+    seen = {"username": set(), "email": set(), "phone_number": set()}
+    records = islice(read_rows(lines, file_format), report.total, None)
+    pool = None if dry_run else _hashing_pool(workers)
+
+    try:
+        while chunk := list(islice(records, chunk_size)):
+            # 1. Validate the rows of this chunk
+            residents = []
+            for line_no, row in chunk:
+                report.total += 1
+                if isinstance(row, str):
+                    report.add_error(line_no, row)
+                    continue
+                try:
+                    resident = clean_row(row, seen)
+                except ValidationError as e:
+                    report.add_error(line_no, " ".join(e.messages))
+                    continue
+                resident["line"] = line_no
+                residents.append(resident)
+
+            # 2. Reject residents that already have an account (one query per field)
+            taken = _existing_values(residents) if residents else {}
+            valid = []
+            for resident in residents:
+                clash = next(
+                    (
+                        kind
+                        for kind, value in (
+                            ("username", resident["username"]),
+                            ("email", resident["email"].lower()),
+                            ("phone_number", resident["phone_number"]),
+                        )
+                        if value and value in taken[kind]
+                    ),
+                    None,
+                )
+                if clash:
+                    report.add_error(resident["line"], f"A user with this {clash} already exists.")
+                else:
+                    valid.append(resident)
+
+            # 3. Hash the passwords in parallel and write the chunk
+            if valid and not dry_run:
+                passwords = [r["password"] or None for r in valid]  # None -> unusable password
+                hashes = pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4)))
+                for resident, password_hash in zip(valid, hashes):
+                    resident["password_hash"] = password_hash
+                try:
+                    _create_chunk(community, valid)
+                except IntegrityError as e:
+                    # Someone registered one of these users meanwhile; report the whole chunk
+                    for resident in valid:
+                        report.add_error(resident["line"], f"Not imported, chunk failed: {e}")
+                    valid = []
+            report.created += len(valid)
+
+            if on_chunk:
+                on_chunk(report)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    report.errors.sort()  # Database clashes are found after the chunk's own checks
+    return report
+
+
+def runnable_imports():
+    """
+    Imports that can be (re)started: pending ones, and running ones that saved
+    no progress for USERS_IMPORT_STALE_AFTER seconds, i.e. whose worker died.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.USERS_IMPORT_STALE_AFTER)
+    return ResidentImport.objects.filter(
+        Q(status=ResidentImport.StatusChoices.PENDING)
+        | Q(status=ResidentImport.StatusChoices.RUNNING, progress_at__lt=stale)
+        # Interrupted before progress_at existed
+        | Q(status=ResidentImport.StatusChoices.RUNNING, progress_at__isnull=True, started_at__lt=stale)
+    )
+
+
+def _stored_errors(report):
+    return [{"line": line, "error": error} for line, error in report.errors[:MAX_STORED_ERRORS]]
+
+
+def run_resident_import(import_id):
+    """
+    Runs a ResidentImport created in the admin and records its outcome.
+    An interrupted import is resumed after the last chunk it saved.
+    """
+    now = timezone.now()
+    claimed = runnable_imports().filter(pk=import_id).update(
+        status=ResidentImport.StatusChoices.RUNNING,
+        started_at=Coalesce(F("started_at"), Value(now)),
+        progress_at=now,
+    )
+    if not claimed:
+        logger.info(f"Resident import {import_id} is neither pending nor interrupted, skipping.")
+        return
+
+    job = ResidentImport.objects.select_related("community").get(pk=import_id)
+    # Progress is saved after each chunk is committed, so these rows are done
+    resumed = ImportReport()
+    resumed.total = job.total_rows
+    resumed.created = job.created_count
+    resumed.errors = [(error["line"], error["error"]) for error in job.errors]
+    resumed.unstored_errors = job.error_count - len(resumed.errors)
+    if resumed.total:
+        logger.info(f"Resuming resident import {job.pk} after row {resumed.total}.")
+
+    def save_progress(report):
+        ResidentImport.objects.filter(pk=job.pk).update(
+            total_rows=report.total,
+            created_count=report.created,
+            error_count=report.error_count,
+            errors=_stored_errors(report),
+            progress_at=timezone.now(),
+        )
+
+    try:
+        report = import_residents(
+            job.community,
+            job.data.splitlines(),
+            job.file_format,
+            on_chunk=save_progress,
+            report=resumed,
+        )
+    except Exception as e:
+        logger.error(f"Resident import {job.pk} failed: {e}")
+        ResidentImport.objects.filter(pk=job.pk).update(
+            status=ResidentImport.StatusChoices.FAILED,
+            error=str(e),
+            finished_at=timezone.now(),
+        )
+        raise
+
+    ResidentImport.objects.filter(pk=job.pk).update(
+        status=ResidentImport.StatusChoices.COMPLETED,
+        total_rows=report.total,
+        created_count=report.created,
+        error_count=report.error_count,
+        errors=_stored_errors(report),
+        finished_at=timezone.now(),
+    )
+    logger.info(f"Resident import {job.pk}: {report.created} created, {report.error_count} rejected.")
+
+
+def _run_in_background(import_id):
+    close_old_connections()
+    try:
+        run_resident_import(import_id)
+    except Exception:
+        pass  # Already logged and recorded on the import
+    finally:
+        close_old_connections()
+
+
+def start_resident_import(resident_import):
+    """
+    Queues the import on the background worker once the current transaction
+    commits. Imports left pending or interrupted (e.g. the process restarted)
+    can be run with `python manage.py import_residents --pending`.
+    """
+    import_id = resident_import.pk
+    transaction.on_commit(lambda: _executor.submit(_run_in_background, import_id))
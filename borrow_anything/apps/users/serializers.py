@@ -2,9 +2,15 @@
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model # Use this to get the active User model
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.password_validation import validate_password
+from rest_framework.exceptions import Throttled
 from .models import UserProfile, UserCommunityMembership
 from apps.communities.models import Community
+from .hashing import HashingPoolFull, run_hashing
+from .imaging import pick_variant
+from .services import join_community, set_primary_community
 from .utils import S3ImageUploader
 
 # Import the S3ImageUploader class for handling image uploads
@@ -75,7 +81,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         required=False,  # Not required for every profile update (e.g., updating phone only)
     )
     # Keep community_name read-only if you want to display it alongside the ID in GET responses
-    community_name = serializers.CharField(read_only=True, allow_null=True)
+    community_name = serializers.CharField(source="community.name", read_only=True, allow_null=True)
     first_name = serializers.CharField(required=False, allow_blank=True, max_length=150)
     last_name = serializers.CharField(required=False, allow_blank=True, max_length=150)
 
@@ -91,7 +97,9 @@ class UserProfileSerializer(serializers.ModelSerializer):
         This is read-only and should not be updated via the API.
         """
         if obj.profile_picture_s3_key:
-            return S3Helper.get_image_presigned_url(obj.profile_picture_s3_key)
+            # Avatars are shown small: serve the "medium" variant once it exists
+            s3_key = pick_variant(obj.profile_picture_s3_key, obj.profile_picture_variants, "medium")
+            return S3Helper.get_image_presigned_url(s3_key)
         return None
     
     def get_cover_image_url(self, obj):
@@ -100,15 +108,17 @@ class UserProfileSerializer(serializers.ModelSerializer):
         This is read-only and should not be updated via the API.
         """
         if obj.cover_photo_s3_key:
-            return S3Helper.get_image_presigned_url(obj.cover_photo_s3_key)
+            s3_key = pick_variant(obj.cover_photo_s3_key, obj.cover_photo_variants, "full")
+            return S3Helper.get_image_presigned_url(s3_key)
         return None
     
     def get_communities(self, obj):
         """
         Get all communities the user is a member of.
         Returns serialized membership data with community details.
+        Uses the memberships (and their communities) prefetched by views.get_me_queryset().
         """
-        memberships = UserCommunityMembership.objects.filter(user=obj.user)
+        memberships = obj.user.community_memberships.all()
         return UserCommunityMembershipSerializer(memberships, many=True).data
 
     class Meta:
@@ -119,7 +129,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
             "phone_number",
             "first_name",  # Use the source to map to the User model's field
             "last_name",  # Use the source to map to the User model's field
-            "profile_picture_s3_key",  # Use the key field name
+            "profile_picture_s3_key",  # Read-only: set by the upload endpoints, which count blob references
             # Include the 'community' field (writable ID)
             "community",
             # Read-only name for convenience in GET responses
@@ -136,6 +146,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
         # Specify fields that should *not* be updatable via a PUT/PATCH to /me/
         read_only_fields = [
             "user",
+            # Only the upload endpoints may set image keys: they take a reference on
+            # the blob (apps/storage), while a key written here would release someone
+            # else's blob when it is replaced later
+            "profile_picture_s3_key",
             "community_name",
             "is_community_member_verified",
             "average_lender_rating",
@@ -173,6 +187,18 @@ class UserProfileSerializer(serializers.ModelSerializer):
             )  # Specify fields for efficiency
             # user.save(update_fields=['first_name', 'last_name', 'email']) # If email included
 
+        # Changing the community goes through services.py, which keeps the primary
+        # membership in line and drops the cached /me/ response and profile data
+        if "community" in validated_data:
+            community = validated_data.pop("community")
+            if community is None:
+                set_primary_community(user.pk, None)
+            elif user.community_memberships.filter(community=community).exists():
+                set_primary_community(user.pk, community.pk)
+            else:
+                join_community(user, community, is_primary=True)  # Not a member yet
+            instance.community = community  # So the save below does not write the old one back
+
         # Update UserProfile fields - remaining items in validated_data
         # Let the default ModelSerializer update handle the direct fields on UserProfile
         # It iterates through remaining validated_data and sets attributes on 'instance'
@@ -180,7 +206,6 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
         # instance.phone_number = validated_data.get('phone_number', instance.phone_number)
         # instance.address_details = validated_data.get('address_details', instance.address_details)
-        # instance.community = validated_data.get('community', instance.community)
         # instance.save() # super().update() already saves the instance
 
         return instance
@@ -226,17 +251,40 @@ class UserCreateSerializer(serializers.ModelSerializer):
         Also creates the associated UserProfile.
         """
 
-        # Use create_user to handle password hashing automatically
-        user = User.objects.create_user(
-            username=validated_data["username"],
-            email=validated_data["email"],
-            password=validated_data["password"],  # create_user handles hashing
+        # Hash the password on the bounded hashing pool (see hashing.py) instead of
+        # letting create_user() hash it on the request thread. A full pool means 429.
+        try:
+            hashed_password = run_hashing(make_password, validated_data["password"])
+        except HashingPoolFull:
+            raise Throttled(
+                wait=settings.PASSWORD_HASHING_RETRY_AFTER,
+                detail="Too many sign-ups right now, please try again shortly.",
+            )
+
+        # Same normalization create_user() applies
+        user = User(
+            username=User.normalize_username(validated_data["username"]),
+            email=User.objects.normalize_email(validated_data["email"]),
             first_name=validated_data.get("first_name", ""),
             last_name=validated_data.get("last_name", ""),
         )
+        user.password = hashed_password
+        user.save()
 
         # Automatically create the linked UserProfile
         # This assumes UserProfile doesn't require any extra fields during creation
         UserProfile.objects.create(user=user)
 
         return user
+
+
+class ImageUploadIntentSerializer(serializers.Serializer):
+    """ Input for requesting a direct-to-S3 image upload (see uploads.py) """
+    content_type = serializers.ChoiceField(choices=settings.IMAGE_UPLOAD_CONTENT_TYPES)
+    size = serializers.IntegerField(min_value=1, max_value=settings.IMAGE_UPLOAD_MAX_SIZE) # Exact size in bytes, enforced by S3
+
+
+class ImageUploadFinalizeSerializer(serializers.Serializer):
+    """ Input for finalizing a direct-to-S3 image upload """
+    upload_token = serializers.CharField()
+    caption = serializers.CharField(required=False, allow_blank=True, max_length=100) # Item images only
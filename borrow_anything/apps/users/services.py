@@ -0,0 +1,157 @@
+# apps/users/services.py
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from apps.core.cache import bump_version
+from .cache import invalidate_user
+from .models import UserCommunityMembership, UserProfile
+
+User = get_user_model()
+
+# The single write path for community memberships. UserProfile.community always
+# mirrors the user's primary membership, so every join/leave/set-primary goes
+# through here and keeps both in line within one transaction, using set-based
+# UPDATEs instead of saving rows one by one. The views, the model's save() (for
+# admin/shell edits) and the import_memberships command all use these functions.
+
+
+def set_primary_community(user_ids, community_id):
+    """
+    Makes `community_id` the primary community of the given users (one id or a
+    list). Two statements no matter how many users or memberships: one UPDATE
+    flips is_primary on all their memberships, one points their profiles at it.
+    Pass community_id=None to clear the primary community.
+    """
+    if not isinstance(user_ids, (list, tuple, set)):
+        user_ids = [user_ids]
+    if not user_ids:
+        return
+    with transaction.atomic():
+        UserCommunityMembership.objects.filter(user_id__in=user_ids).update(
+            is_primary=Case(
+                When(community_id=community_id, then=Value(True)),
+                default=Value(False),
+            ),
+            updated_at=timezone.now(),
+        )
+        updated = UserProfile.objects.filter(user_id__in=user_ids).update(
+            community_id=community_id
+        )
+        if updated < len(user_ids):
+            # Users created outside the signup API may not have a profile yet
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=user_id, community_id=community_id) for user_id in user_ids],
+                ignore_conflicts=True,
+            )
+    # update() sends no signals: drop the cached auth user and /me/ response,
+    # and everything cached from profiles (see apps/core/cache.py)
+    invalidate_user(*user_ids)
+    transaction.on_commit(lambda: bump_version(UserProfile))
+
+
+def join_community(user, community, is_primary=False, is_verified=False):
+    """
+    Adds a membership. The user's first community always becomes primary.
+    Returns the new membership.
+    """
+    with transaction.atomic():
+        is_first = not UserCommunityMembership.objects.filter(user=user).exists()
+        # Saved as non-primary; set_primary_community() flips it together with the others
+        membership = UserCommunityMembership.objects.create(
+            user=user, community=community, is_verified=is_verified
+        )
+        if is_primary or is_first:
+            set_primary_community(user.pk, community.pk)
+            membership.is_primary = True
+    return membership
+
+
+def leave_community(membership):
+    """
+    Deletes a membership. If it was the primary one, the oldest remaining
+    membership becomes primary (or the profile's community is cleared).
+    """
+    with transaction.atomic():
+        membership.delete()
+        if membership.is_primary:
+            next_community_id = (
+                UserCommunityMembership.objects.filter(user_id=membership.user_id)
+                .order_by("joined_at", "pk")
+                .values_list("community_id", flat=True)
+                .first()
+            )
+            set_primary_community(membership.user_id, next_community_id)
+
+
+def import_memberships(community, rows):
+    """
+    Bulk-adds members to one community, e.g. when onboarding an apartment complex.
+    `rows` is an iterable of dicts with a "username" or "email" plus optional
+    "is_primary"/"is_verified" booleans; pass it in chunks of a few thousand.
+
+    Uses a fixed number of queries per call: users are resolved in one query,
+    memberships are inserted with one bulk_create (existing memberships are not
+    created again and keep their is_verified) and primaries are switched with
+    set_primary_community(). This community becomes a user's primary community if
+    the row says is_primary, whether or not the user was already a member, or if
+    the user had no primary community yet.
+    Returns (created, skipped) where skipped lists the rows whose user was not found.
+    """
+    rows = list(rows)
+    usernames = {row["username"] for row in rows if row.get("username")}
+    emails = {row["email"].lower() for row in rows if row.get("email")}
+    users = (
+        User.objects.annotate(email_lower=Lower("email"))  # Emails match case-insensitively
+        .filter(Q(username__in=usernames) | Q(email_lower__in=emails))
+        .values_list("pk", "username", "email")
+    )
+    by_username, by_email = {}, {}
+    for pk, username, email in users:
+        by_username[username] = pk
+        by_email[email.lower()] = pk
+
+    wanted = {}  # user id -> row
+    skipped = []
+    for row in rows:
+        user_id = by_username.get(row.get("username")) or by_email.get((row.get("email") or "").lower())
+        if user_id is None:
+            skipped.append(row)
+        else:
+            wanted[user_id] = row
+
+    with transaction.atomic():
+        existing = set(
+            UserCommunityMembership.objects.filter(
+                community=community, user_id__in=wanted
+            ).values_list("user_id", flat=True)
+        )
+        with_primary = set(
+            UserCommunityMembership.objects.filter(
+                user_id__in=wanted, is_primary=True
+            ).values_list("user_id", flat=True)
+        )
+        new_members = [user_id for user_id in wanted if user_id not in existing]
+        UserCommunityMembership.objects.bulk_create(
+            [
+                UserCommunityMembership(
+                    user_id=user_id,
+                    community=community,
+                    is_verified=bool(wanted[user_id].get("is_verified")),
+                )
+                for user_id in new_members
+            ],
+            ignore_conflicts=True,  # A concurrent join of the same user is fine
+        )
+        primary_ids = [
+            user_id
+            for user_id, row in wanted.items()
+            if row.get("is_primary") or user_id not in with_primary
+        ]
+        set_primary_community(primary_ids, community.pk)
+    invalidate_user(*new_members)  # bulk_create sends no signals either
+
+    return len(new_members), skipped
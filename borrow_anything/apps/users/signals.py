@@ -0,0 +1,47 @@
+# apps/users/signals.py
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.communities.models import Community
+from .cache import invalidate_me, invalidate_user
+from .models import UserCommunityMembership, UserProfile
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_on_user_change(sender, instance, **kwargs):
+    """Covers is_active/password changes (auth) and names/email (/me/)."""
+    invalidate_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_on_profile_change(sender, instance, **kwargs):
+    """Covers profile fields, the primary community and image keys."""
+    invalidate_user(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserCommunityMembership)
+def invalidate_me_on_membership_change(sender, instance, **kwargs):
+    invalidate_me(instance.user_id)
+
+
+@receiver(post_save, sender=Community)
+def invalidate_on_community_change(sender, instance, created, **kwargs):
+    """
+    The community is embedded in the /me/ response of every member and in the
+    cached auth user of its residents (profile.community).
+    """
+    if created:
+        return  # Nobody can be a member yet
+    user_ids = (
+        UserProfile.objects.filter(
+            Q(community=instance) | Q(user__community_memberships__community=instance)
+        )
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+    invalidate_user(*user_ids)
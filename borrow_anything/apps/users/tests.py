@@ -1,3 +1,755 @@
-from django.test import TestCase
+# apps/users/tests.py
 
-# Create your tests here.
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.core.testing import (
+    QueryCountTestCase,
+    fake_s3,
+    make_category,
+    make_community,
+    make_item,
+    make_profile,
+)
+from apps.items.models import ItemImage
+from apps.storage.models import ContentBlob
+from apps.storage.utils import blob_key
+from . import authentication, hashing, imaging, onboarding, services
+from .cache import auth_user_cache_key, invalidate_user, me_cache_key
+from .hashing import HashingPoolFull, PasswordHashingPool
+from .models import ResidentImport, UserCommunityMembership, UserProfile
+
+User = get_user_model()
+
+
+class UserQueryCountTests(QueryCountTestCase):
+    """Query counts of the user endpoints must not grow with the user's memberships."""
+
+    def setUp(self):
+        self.profile = make_profile(make_community())
+        self.profile.profile_picture_s3_key = "test/users/avatar.jpg"
+        self.profile.save()
+        self.authenticate(self.profile)
+
+    def add_memberships(self, number):
+        UserCommunityMembership.objects.bulk_create(
+            [
+                UserCommunityMembership(user=self.profile.user, community=make_community())
+                for _ in range(number)
+            ]
+        )
+
+    def test_me(self):
+        small, large = self.assertConstantQueries("/api/v1/users/me/", self.add_memberships)
+        # Served by the async MeView: a plain JSON response
+        self.assertEqual(len(large.json()["communities"]), 1 + 10 * self.N)
+        self.assertTrue(large.json()["profile_picture_url"])
+
+    def test_membership_list(self):
+        small, large = self.assertConstantQueries("/api/v1/users/communities/", self.add_memberships)
+        self.assertEqual(len(large.data), 1 + 10 * self.N)
+
+
+def authenticate(authenticator, user):
+    """Runs an authentication class on a request carrying the user's access token."""
+    request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+    return authenticator.authenticate(request)[0]
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """authentication.py: one query per user, until the user or profile changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_profile(make_community()).user
+        self.authenticator = authentication.CachedJWTAuthentication()
+
+    def test_cache_hit_runs_no_queries(self):
+        with self.assertNumQueries(1):  # User, profile and community in one query
+            user = authenticate(self.authenticator, self.user)
+        with self.assertNumQueries(0):
+            user = authenticate(self.authenticator, self.user)
+            self.assertEqual(user.profile.community_id, self.user.profile.community_id)
+
+    def test_deactivation_applies_to_the_next_request(self):
+        authenticate(self.authenticator, self.user)  # Cached
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            authenticate(self.authenticator, self.user)
+
+    @mock.patch.object(authentication.api_settings, "CHECK_REVOKE_TOKEN", True)
+    def test_password_change_applies_to_the_next_request(self):
+        token = AccessToken.for_user(self.user)  # Carries a hash of the current password
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.authenticator.authenticate(request)  # Cached
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("a new password")
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticator.authenticate(request)
+
+    def test_invalidation_waits_for_the_commit(self):
+        authenticate(self.authenticator, self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save()
+            # A request before the commit would still read the old row: keep the entry
+            self.assertIsNotNone(cache.get(auth_user_cache_key(self.user.pk)))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(auth_user_cache_key(self.user.pk)))
+
+    def test_stateless_authentication_loads_no_user(self):
+        authenticator = authentication.StatelessJWTAuthentication()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertNumQueries(0):
+            user = authenticate(authenticator, self.user)
+        # Only the token's claims: still authenticated until the token expires
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual(user.id, self.user.pk)
+
+
+class UserCacheInvalidationTests(TransactionTestCase):
+    """Outside a transaction, invalidate_user() drops the entries right away."""
+
+    def test_invalidates_immediately_in_autocommit(self):
+        cache.set_many({auth_user_cache_key(1): "user", me_cache_key(1): {}})
+        invalidate_user(1)
+        self.assertEqual(cache.get_many([auth_user_cache_key(1), me_cache_key(1)]), {})
+
+
+class HashingPoolTests(SimpleTestCase):
+    """The bounded password hashing pool (hashing.py)."""
+
+    def test_rejects_work_beyond_workers_and_queue(self):
+        pool = PasswordHashingPool(workers=1, queue_size=1)
+        release = threading.Event()
+        # One job running, one queued: the pool is full
+        blockers = [threading.Thread(target=pool.run, args=(release.wait,)) for _ in range(2)]
+        for blocker in blockers:
+            blocker.start()
+        try:
+            while pool.metrics()["in_flight"] < 2:
+                time.sleep(0.01)
+            with self.assertRaises(HashingPoolFull), self.assertLogs("apps.users.hashing", "WARNING"):
+                pool.run(str.upper, "x")
+        finally:
+            release.set()
+            for blocker in blockers:
+                blocker.join()
+
+        # Slots are given back once the jobs finish
+        self.assertEqual(pool.run(str.upper, "x"), "X")
+        metrics = pool.metrics()
+        self.assertEqual((metrics["completed"], metrics["rejected"], metrics["in_flight"]), (3, 1, 0))
+        self.assertIsNotNone(metrics["hash_ms"]["p99"])
+
+
+@override_settings(PASSWORD_HASHING_RETRY_AFTER=7)
+class HashingBackpressureTests(APITestCase):
+    """Sign-ups and logins answer 429 with Retry-After while the pool is full."""
+
+    def setUp(self):
+        self.user = User.objects.create_user("asha", "asha@example.com", "long-enough-pass-42")
+        full = mock.patch.object(hashing, "_pool", mock.Mock(run=mock.Mock(side_effect=HashingPoolFull)))
+        full.start()
+        self.addCleanup(full.stop)
+
+    def test_register(self):
+        response = self.client.post(
+            "/api/v1/users/register/",
+            {"username": "ravi", "email": "ravi@example.com", "password": "long-enough-pass-42"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertFalse(User.objects.filter(username="ravi").exists())
+
+    def test_login(self):
+        response = self.client.post(
+            "/api/v1/auth/token/",
+            {"username": "asha", "password": "long-enough-pass-42"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "7")
+
+    def test_login_works_when_the_pool_has_room(self):
+        with mock.patch.object(hashing, "_pool", PasswordHashingPool(workers=1, queue_size=0)):
+            response = self.client.post(
+                "/api/v1/auth/token/",
+                {"username": "asha", "password": "long-enough-pass-42"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.data)
+
+
+def make_jpeg(width, height, orientation=None):
+    image = imaging.Image.new("RGB", (width, height), "orange")
+    exif = imaging.Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation  # EXIF Orientation tag
+    exif[0x010F] = "Test camera"  # Make: metadata that must not reach the variants
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+@skipUnless(imaging.is_available(), "Pillow with WEBP support is not installed")
+class ImagingTests(TestCase):
+    """WEBP size variants (imaging.py)."""
+
+    def open(self, data):
+        image = imaging.Image.open(io.BytesIO(data))
+        image.load()
+        return image
+
+    def test_renders_every_variant_as_webp(self):
+        rendered = imaging.render_variants(make_jpeg(2000, 1000))
+        self.assertEqual(set(rendered), set(imaging.IMAGE_VARIANTS))
+        sizes = {name: self.open(data).size for name, data in rendered.items()}
+        self.assertEqual(sizes, {"thumb": (320, 160), "medium": (800, 400), "full": (1600, 800)})
+        for data in rendered.values():
+            variant = self.open(data)
+            self.assertEqual(variant.format, "WEBP")
+            self.assertFalse(variant.getexif())  # Metadata stripped
+
+    def test_small_images_are_not_upscaled(self):
+        rendered = imaging.render_variants(make_jpeg(200, 100))
+        self.assertEqual({self.open(data).size for data in rendered.values()}, {(200, 100)})
+
+    def test_exif_orientation_is_applied(self):
+        # Orientation 6: stored landscape, displayed rotated to portrait
+        rendered = imaging.render_variants(make_jpeg(1000, 500, orientation=6))
+        self.assertEqual(self.open(rendered["thumb"]).size, (160, 320))
+
+    def test_process_item_image_uploads_and_records_variants(self):
+        s3 = fake_s3(self)
+        owner = make_profile(make_community())
+        item = make_item(owner, make_category())
+        image = ItemImage.objects.create(item=item, s3_key=f"items/{item.pk}/photo.jpg")
+        s3.put(image.s3_key, make_jpeg(1200, 900), "image/jpeg")
+
+        imaging.process_item_image(image.pk)
+
+        image.refresh_from_db()
+        self.assertEqual(image.variants["source"], image.s3_key)
+        for name in imaging.IMAGE_VARIANTS:
+            key = imaging.variant_key(image.s3_key, name)
+            self.assertEqual(image.variants[name], key)
+            self.assertEqual(s3.objects[key]["ContentType"], "image/webp")
+            self.assertEqual(s3.objects[key]["CacheControl"], imaging.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(imaging.pick_variant(image.s3_key, image.variants, "thumb"), image.variants["thumb"])
+
+        # Up to date: nothing is downloaded or rendered again
+        with mock.patch.object(imaging, "process_image") as process_image:
+            imaging.process_item_image(image.pk)
+        process_image.assert_not_called()
+
+    def test_variants_of_a_blob_are_shared_by_its_images(self):
+        s3 = fake_s3(self)
+        owner = make_profile(make_community())
+        sha256 = "ab" * 32
+        blob = ContentBlob.objects.create(
+            sha256=sha256, s3_key=blob_key(sha256), size=1, content_type="image/jpeg", ref_count=2
+        )
+        s3.put(blob.s3_key, make_jpeg(1200, 900), "image/jpeg")
+        first = ItemImage.objects.create(item=make_item(owner, make_category()), s3_key=blob.s3_key)
+        second = ItemImage.objects.create(item=make_item(owner, make_category()), s3_key=blob.s3_key)
+
+        imaging.process_item_image(first.pk)
+        blob.refresh_from_db()
+        self.assertEqual(blob.variants["source"], blob.s3_key)
+
+        # Same blob: the variants are looked up on it instead of rendered again
+        with mock.patch.object(imaging, "render_variants") as render_variants:
+            imaging.process_item_image(second.pk)
+        render_variants.assert_not_called()
+        second.refresh_from_db()
+        self.assertEqual(second.variants, blob.variants)
+
+    def test_process_images_force_regenerates_blob_variants(self):
+        s3 = fake_s3(self)
+        owner = make_profile(make_community())
+        sha256 = "cd" * 32
+        blob = ContentBlob.objects.create(
+            sha256=sha256, s3_key=blob_key(sha256), size=1, content_type="image/jpeg"
+        )
+        s3.put(blob.s3_key, make_jpeg(1200, 900), "image/jpeg")
+        image = ItemImage.objects.create(item=make_item(owner, make_category()), s3_key=blob.s3_key)
+        imaging.process_item_image(image.pk)
+        blob.refresh_from_db()
+        for key in blob.variants.values():
+            if key != blob.s3_key:
+                s3.put(key, b"rendered by an older version", "image/webp")
+
+        call_command("process_images", "--force", stdout=io.StringIO())
+
+        for name in imaging.IMAGE_VARIANTS:
+            variant = s3.objects[imaging.variant_key(blob.s3_key, name)]
+            self.assertEqual(self.open(variant["Body"]).format, "WEBP")
+        image.refresh_from_db()
+        self.assertEqual(image.variants["source"], blob.s3_key)
+
+    def test_pick_variant_ignores_variants_of_a_replaced_image(self):
+        variants = {"source": "items/1/old.jpg", "thumb": "items/1/old.jpg.thumb.webp"}
+        self.assertEqual(imaging.pick_variant("items/1/new.jpg", variants, "thumb"), "items/1/new.jpg")
+        self.assertEqual(imaging.pick_variant("items/1/new.jpg", {}, "thumb"), "items/1/new.jpg")
+
+
+class DirectUploadTests(APITestCase):
+    """Direct-to-S3 uploads (uploads.py): intent, upload to S3, finalize."""
+
+    def setUp(self):
+        self.s3 = fake_s3(self)
+        self.profile = make_profile(make_community())
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.profile.user)}")
+        self.body = b"\xff\xd8 not really a jpeg"
+
+    def intent(self, size=None):
+        response = self.client.post(
+            "/api/v1/users/profile-image/intent/",
+            {"content_type": "image/jpeg", "size": size or len(self.body)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def finalize(self, intent):
+        return self.client.post(
+            "/api/v1/users/profile-image/finalize/", {"upload_token": intent["upload_token"]}, format="json"
+        )
+
+    def test_policy_pins_key_type_and_size(self):
+        with mock.patch.object(self.s3, "generate_presigned_post", wraps=self.s3.generate_presigned_post) as post:
+            intent = self.intent()
+        self.assertTrue(intent["s3_key"].startswith(f"uploads/{self.profile.user_id}/"))
+        self.assertEqual(intent["fields"], {"key": intent["s3_key"], "Content-Type": "image/jpeg"})
+        self.assertEqual(intent["size"], len(self.body))
+        self.assertEqual(
+            post.call_args.kwargs["Conditions"],
+            [{"Content-Type": "image/jpeg"}, ["content-length-range", len(self.body), len(self.body)]],
+        )
+
+    def test_upload_flow(self):
+        intent = self.intent()
+        self.assertEqual(self.finalize(intent).status_code, 400)  # Not uploaded yet
+
+        self.s3.put(intent["s3_key"], self.body, "image/jpeg")
+        response = self.finalize(intent)
+        self.assertEqual(response.status_code, 200, response.content)
+        key = response.json()["s3_key"]
+        self.assertTrue(key.startswith("blobs/"))
+        self.assertEqual(self.s3.objects[key]["Body"], self.body)
+        self.assertNotIn(intent["s3_key"], self.s3.objects)  # Staging object moved
+        self.assertEqual(UserProfile.objects.get(pk=self.profile.pk).profile_picture_s3_key, key)
+        self.assertEqual(ContentBlob.objects.get(s3_key=key).ref_count, 1)
+
+    def test_retried_finalize_resolves_to_the_stored_blob(self):
+        intent = self.intent()
+        self.s3.put(intent["s3_key"], self.body, "image/jpeg")
+        first = self.finalize(intent)
+        retry = self.finalize(intent)  # e.g. the first response was lost
+        self.assertEqual(retry.status_code, 200, retry.content)
+        self.assertEqual(retry.json()["s3_key"], first.json()["s3_key"])
+        # Still one reference: the profile field holds it, nothing leaked
+        self.assertEqual(ContentBlob.objects.get().ref_count, 1)
+
+    def test_rejects_files_that_do_not_match_the_intent(self):
+        intent = self.intent(size=len(self.body) + 1)
+        self.s3.put(intent["s3_key"], self.body, "image/jpeg")
+        response = self.finalize(intent)
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(intent["s3_key"], self.s3.objects)
+
+        intent = self.intent()
+        self.s3.put(intent["s3_key"], self.body, "image/png")
+        self.assertEqual(self.finalize(intent).status_code, 400)
+        self.assertFalse(ContentBlob.objects.exists())
+
+    def test_tokens_are_bound_to_user_and_target(self):
+        intent = self.intent()
+        self.s3.put(intent["s3_key"], self.body, "image/jpeg")
+        response = self.client.post(
+            "/api/v1/users/cover-image/finalize/", {"upload_token": intent["upload_token"]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        other = make_profile(make_community())
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(other.user)}")
+        self.assertEqual(self.finalize(intent).status_code, 400)
+
+
+class MeCacheInvalidationTests(APITestCase):
+    """GET /users/me/ is cached (views.MeView): every change must show on the next GET."""
+
+    def setUp(self):
+        cache.clear()
+        self.home, self.other = make_community(), make_community()
+        self.profile = make_profile(self.home, self.other)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.profile.user)}")
+        self.me()  # Cached from here on
+
+    def me(self):
+        response = self.client.get("/api/v1/users/me/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def change(self, method, url, data=None):
+        # The cached response is dropped once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 300, response.content)
+        return response
+
+    def membership(self, community):
+        return UserCommunityMembership.objects.get(user=self.profile.user, community=community)
+
+    def joined(self, data):
+        return {row["community"]: row["is_primary"] for row in data["communities"]}
+
+    def test_profile_patch(self):
+        self.change("patch", "/api/v1/users/me/", {"phone_number": "98765"})
+        self.assertEqual(self.me()["phone_number"], "98765")
+
+    def test_join(self):
+        new_community = make_community()
+        self.change("post", "/api/v1/users/communities/", {"community": new_community.pk})
+        self.assertIn(new_community.pk, self.joined(self.me()))
+
+    def test_leave(self):
+        self.change("delete", f"/api/v1/users/communities/{self.membership(self.other).pk}/")
+        self.assertNotIn(self.other.pk, self.joined(self.me()))
+
+    def test_set_primary_community(self):
+        self.change(
+            "patch", f"/api/v1/users/communities/{self.membership(self.other).pk}/", {"is_primary": True}
+        )
+        data = self.me()
+        self.assertEqual(data["community"], self.other.pk)
+        self.assertEqual(self.joined(data), {self.home.pk: False, self.other.pk: True})
+
+    def test_profile_image_finalize(self):
+        s3 = fake_s3(self)
+        self.assertIsNone(self.me()["profile_picture_url"])
+        intent = self.client.post(
+            "/api/v1/users/profile-image/intent/", {"content_type": "image/jpeg", "size": 4}, format="json"
+        ).data
+        s3.put(intent["s3_key"], b"\xff\xd8..", "image/jpeg")
+        self.change("post", "/api/v1/users/profile-image/finalize/", {"upload_token": intent["upload_token"]})
+        self.assertIsNotNone(self.me()["profile_picture_url"])
+
+
+class ManageProfileTests(APITestCase):
+    """GET/PUT/PATCH /users/me/"""
+
+    def setUp(self):
+        self.profile = make_profile(make_community())
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.profile.user)}")
+
+    async def test_anonymous_requests_are_challenged(self):
+        # Like DRF's APIView: a 401 names the scheme to authenticate with
+        for headers in ({}, {"Authorization": "Bearer not-a-token"}):
+            response = await self.async_client.get("/api/v1/users/me/", headers=headers)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response["WWW-Authenticate"], 'Bearer realm="api"')
+
+    def test_image_keys_cannot_be_set_directly(self):
+        # Another user's blob: writing its key would skip acquire_blob() and later
+        # release a reference this profile never held
+        other_key = blob_key("ab" * 32)
+        response = self.client.patch(
+            "/api/v1/users/me/",
+            {"profile_picture_s3_key": other_key, "cover_photo_s3_key": other_key, "phone_number": "12345"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.phone_number, "12345")
+        self.assertEqual(self.profile.profile_picture_s3_key or "", "")
+        self.assertEqual(self.profile.cover_photo_s3_key or "", "")
+
+    def primary_communities(self):
+        return list(
+            UserCommunityMembership.objects.filter(user=self.profile.user, is_primary=True)
+            .values_list("community_id", flat=True)
+        )
+
+    def test_changing_the_community_joins_it_as_primary(self):
+        self.client.get("/api/v1/users/me/")  # Cached
+        new_community = make_community()
+        with self.captureOnCommitCallbacks(execute=True):  # The cache is dropped after the commit
+            response = self.client.patch("/api/v1/users/me/", {"community": new_community.pk}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.primary_communities(), [new_community.pk])
+        self.assertEqual(self.profile.user.community_memberships.count(), 2)
+
+        data = self.client.get("/api/v1/users/me/").json()
+        self.assertEqual(data["community"], new_community.pk)
+        self.assertEqual(
+            {row["community"]: row["is_primary"] for row in data["communities"]},
+            {self.profile.community_id: False, new_community.pk: True},
+        )
+
+    def test_changing_to_a_joined_community_switches_the_primary(self):
+        other = make_community()
+        UserCommunityMembership.objects.create(user=self.profile.user, community=other)
+        response = self.client.patch("/api/v1/users/me/", {"community": other.pk}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.primary_communities(), [other.pk])
+        self.assertEqual(self.profile.user.community_memberships.count(), 2)
+
+        response = self.client.patch("/api/v1/users/me/", {"community": None}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.primary_communities(), [])
+        self.profile.refresh_from_db()
+        self.assertIsNone(self.profile.community_id)
+
+
+class MembershipServiceTests(TestCase):
+    """services.py: the primary membership and UserProfile.community stay in line."""
+
+    def setUp(self):
+        self.home, self.other = make_community(), make_community()
+        self.profile = make_profile(self.home, self.other)
+        self.user = self.profile.user
+
+    def memberships(self, user=None):
+        return dict(
+            UserCommunityMembership.objects.filter(user=user or self.user).values_list(
+                "community_id", "is_primary"
+            )
+        )
+
+    def assertPrimary(self, community, user=None):
+        user = user or self.user
+        expected = {pk: pk == getattr(community, "pk", None) for pk in self.memberships(user)}
+        self.assertEqual(self.memberships(user), expected)
+        self.assertEqual(UserProfile.objects.get(user=user).community_id, getattr(community, "pk", None))
+
+    def test_set_primary_community(self):
+        services.set_primary_community(self.user.pk, self.other.pk)
+        self.assertPrimary(self.other)
+
+    def test_set_primary_community_of_many_users_in_two_queries(self):
+        users = [self.user] + [make_profile(self.home, self.other).user for _ in range(3)]
+        with CaptureQueriesContext(connection) as queries:
+            services.set_primary_community([user.pk for user in users], self.other.pk)
+        self.assertEqual(len([q for q in queries if q["sql"].startswith("UPDATE")]), 2)
+        for user in users:
+            self.assertPrimary(self.other, user)
+
+    def test_set_primary_community_creates_missing_profiles(self):
+        user = User.objects.create(username="no-profile")
+        UserCommunityMembership.objects.create(user=user, community=self.home)
+        services.set_primary_community([user.pk], self.home.pk)
+        self.assertPrimary(self.home, user)
+
+    def test_leaving_the_primary_community_promotes_the_oldest_other(self):
+        newest = make_community()
+        services.join_community(self.user, newest)
+        services.leave_community(UserCommunityMembership.objects.get(user=self.user, community=self.home))
+        self.assertPrimary(self.other)
+
+    def test_leaving_another_community_keeps_the_primary(self):
+        services.leave_community(UserCommunityMembership.objects.get(user=self.user, community=self.other))
+        self.assertPrimary(self.home)
+
+    def test_leaving_the_last_community_clears_the_primary(self):
+        while UserCommunityMembership.objects.filter(user=self.user).exists():
+            services.leave_community(UserCommunityMembership.objects.filter(user=self.user).first())
+        self.assertEqual(self.memberships(), {})
+        self.assertIsNone(UserProfile.objects.get(user=self.user).community_id)
+
+    def test_import_memberships(self):
+        target = make_community()
+        member = make_profile(target).user  # Already a member: not created again
+        homeless = User.objects.create(username="homeless", email="Homeless@Example.com")
+        verified = make_profile(self.home).user
+        rows = [
+            {"username": self.user.username},
+            {"email": "homeless@example.com"},  # Emails match case-insensitively
+            {"username": verified.username, "is_verified": True},
+            {"username": member.username},
+            {"username": "nobody"},
+        ]
+
+        created, skipped = services.import_memberships(target, rows)
+
+        self.assertEqual((created, skipped), (3, [{"username": "nobody"}]))
+        self.assertEqual(UserCommunityMembership.objects.filter(community=target, user=member).count(), 1)
+        self.assertTrue(UserCommunityMembership.objects.get(community=target, user=verified).is_verified)
+        # Existing primaries are kept; users without one get the imported community
+        self.assertPrimary(self.home)
+        self.assertPrimary(target, homeless)
+        self.assertPrimary(target, member)
+
+    def test_import_memberships_is_primary_switches_existing_members(self):
+        # The documented exception to leaving members alone: is_primary rows win
+        services.import_memberships(self.other, [{"username": self.user.username, "is_primary": True}])
+        self.assertPrimary(self.other)
+        self.assertEqual(
+            UserCommunityMembership.objects.filter(user=self.user, community=self.other).count(), 1
+        )
+
+    def test_import_memberships_queries_do_not_grow_with_rows(self):
+        def import_users(number):
+            users = [make_profile(self.home).user for _ in range(number)]
+            with CaptureQueriesContext(connection) as queries:
+                services.import_memberships(
+                    make_community(), [{"username": user.username, "is_primary": True} for user in users]
+                )
+            return len(queries)
+
+        self.assertEqual(import_users(2), import_users(20))
+
+
+def thread_hashing_pool(test_case):
+    """Hashes imported passwords on threads: a process pool takes seconds to start."""
+    patcher = mock.patch.object(onboarding, "_hashing_pool", lambda workers: ThreadPoolExecutor(workers))
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+
+RESIDENTS_CSV = """Username,Email,First_name,Phone_number,Is_verified
+asha,asha@example.com,Asha,9000000001,yes
+ravi,ravi@example.com,Ravi,,
+,nobody@example.com,No name,,
+ravi,ravi2@example.com,Ravi again,,
+taken,TAKEN@example.com,Taken,,
+"""
+
+
+class ResidentImporterTests(TestCase):
+    """onboarding.import_residents()"""
+
+    def setUp(self):
+        thread_hashing_pool(self)
+        self.community = make_community()
+        make_profile(make_community(), username="existing", email="taken@example.com")
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        report = onboarding.import_residents(self.community, RESIDENTS_CSV.splitlines(), "csv", chunk_size=2)
+
+        self.assertEqual((report.total, report.created), (5, 2))
+        self.assertEqual([line for line, error in report.errors], [4, 5, 6])
+        self.assertIn("username is required", report.errors[0][1])
+        self.assertIn("Duplicate username", report.errors[1][1])
+        self.assertIn("email already exists", report.errors[2][1])
+
+        asha = User.objects.get(username="asha")
+        self.assertFalse(asha.has_usable_password())  # Residents set theirs via password reset
+        self.assertEqual(asha.profile.community, self.community)
+        self.assertTrue(asha.profile.is_community_member_verified)
+        membership = UserCommunityMembership.objects.get(user=asha)
+        self.assertEqual((membership.community, membership.is_primary), (self.community, True))
+
+    def test_jsonl_and_dry_run(self):
+        lines = ['{"username": "asha", "email": "asha@example.com", "is_verified": true}', "", "not json", "[1]"]
+        report = onboarding.import_residents(self.community, lines, "jsonl", dry_run=True)
+        self.assertEqual((report.total, report.created), (3, 1))  # Would be created
+        self.assertEqual([line for line, error in report.errors], [3, 4])
+        self.assertFalse(User.objects.filter(username="asha").exists())
+
+    def test_rejected_row_does_not_block_a_later_fix(self):
+        # The first row fails password validation; its corrected copy must not
+        # be reported as a duplicate of it
+        lines = [
+            '{"username": "asha", "email": "asha@example.com", "phone_number": "9000000001", "password": "123"}',
+            '{"username": "asha", "email": "asha@example.com", "phone_number": "9000000001"}',
+        ]
+        report = onboarding.import_residents(self.community, lines, "jsonl")
+        self.assertEqual(report.created, 1)
+        self.assertEqual([line for line, error in report.errors], [1])
+
+
+class ResidentImportHashingTests(TestCase):
+    """The real process pool: workers set Django up themselves (spawn start method)."""
+
+    def test_passwords_are_hashed_on_a_process_pool(self):
+        lines = ['{"username": "asha", "email": "asha@example.com", "password": "long-enough-pass-42"}']
+        report = onboarding.import_residents(make_community(), lines, "jsonl", workers=1)
+        self.assertEqual(report.created, 1)
+        self.assertTrue(check_password("long-enough-pass-42", User.objects.get(username="asha").password))
+
+
+class ResidentImportJobTests(TestCase):
+    """Imports uploaded in the admin, run in the background or with import_residents --pending."""
+
+    def setUp(self):
+        thread_hashing_pool(self)
+        self.community = make_community()
+
+    def test_admin_upload_runs_the_import(self):
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "long-enough-pass-42")
+        self.client.force_login(admin_user)
+        upload = SimpleUploadedFile("residents.csv", RESIDENTS_CSV.encode(), content_type="text/csv")
+
+        # The background worker runs the job right away instead of on its thread
+        run_inline = mock.patch.object(
+            onboarding._executor, "submit", side_effect=lambda fn, import_id: onboarding.run_resident_import(import_id)
+        )
+        with run_inline, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/admin/users/residentimport/add/", {"community": self.community.pk, "upload": upload}
+            )
+        self.assertEqual(response.status_code, 302)
+
+        job = ResidentImport.objects.get()
+        self.assertEqual(job.status, ResidentImport.StatusChoices.COMPLETED)
+        self.assertEqual((job.file_name, job.file_format, job.created_by), ("residents.csv", "csv", admin_user))
+        self.assertEqual((job.total_rows, job.created_count, job.error_count), (5, 3, 2))
+        self.assertEqual([error["line"] for error in job.errors], [4, 5])
+
+    def make_job(self, **fields):
+        lines = [f'{{"username": "user{n}", "email": "user{n}@example.com"}}' for n in range(4)]
+        return ResidentImport.objects.create(
+            community=self.community, file_format="jsonl", data="\n".join(lines), **fields
+        )
+
+    @override_settings(USERS_IMPORT_CHUNK_SIZE=2, USERS_IMPORT_STALE_AFTER=600)
+    def test_pending_command_resumes_interrupted_imports(self):
+        # Interrupted after its first chunk: those residents exist already
+        interrupted = self.make_job()
+        onboarding.import_residents(self.community, interrupted.data.splitlines()[:2], "jsonl")
+        ResidentImport.objects.filter(pk=interrupted.pk).update(
+            status=ResidentImport.StatusChoices.RUNNING,
+            total_rows=2,
+            created_count=2,
+            started_at=timezone.now() - timedelta(hours=1),
+            progress_at=timezone.now() - timedelta(hours=1),
+        )
+        # Still making progress: left alone
+        running = self.make_job(
+            status=ResidentImport.StatusChoices.RUNNING, started_at=timezone.now(), progress_at=timezone.now()
+        )
+
+        call_command("import_residents", "--pending", stdout=io.StringIO())
+
+        interrupted.refresh_from_db()
+        self.assertEqual(interrupted.status, ResidentImport.StatusChoices.COMPLETED)
+        # The first chunk is skipped rather than reported as existing users
+        self.assertEqual((interrupted.total_rows, interrupted.created_count, interrupted.error_count), (4, 4, 0))
+        self.assertEqual(User.objects.filter(username__startswith="user").count(), 4)
+        running.refresh_from_db()
+        self.assertEqual(running.status, ResidentImport.StatusChoices.RUNNING)
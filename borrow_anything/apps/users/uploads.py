@@ -0,0 +1,132 @@
+# apps/users/uploads.py
+
+import logging
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from rest_framework.exceptions import ValidationError
+
+from apps.storage.utils import (
+    acquire_stored_upload,
+    is_blob_key,
+    release_blobs,
+    store_uploaded_object,
+)
+from .utils import S3ImageUploader
+
+logger = logging.getLogger(__name__)
+
+# Direct-to-S3 uploads, used for profile, cover and item images:
+#   1. intent:   the API picks the S3 key and returns a presigned POST policy
+#                (key, content type and the declared size are enforced by S3)
+#                plus a signed upload token describing what the upload is for.
+#   2. upload:   the client POSTs the file straight to S3 - never through Django.
+#   3. finalize: the client sends the token back; the API checks the object with
+#                head_object, moves it into the content-addressed blob store
+#                (apps/storage) and only then records the blob key on the profile/item.
+# Uploads land under a per-upload staging key, so clients never choose or
+# overwrite the key that is eventually served.
+
+UPLOAD_TOKEN_SALT = "apps.users.uploads"
+
+
+def create_upload_intent(user_id, target, content_type, size, **claims):
+    """
+    Returns a presigned POST to a fresh staging key and a signed token for finalizing it.
+    S3 only accepts a file of exactly `size` bytes (as declared by the client).
+    `claims` (e.g. item_id) are stored in the token and returned by verify_upload().
+    """
+    s3_key = f"uploads/{user_id}/{uuid.uuid4().hex}"
+    post = S3ImageUploader().create_presigned_post(
+        s3_key,
+        content_type,
+        size=size,
+        expires_in=settings.IMAGE_UPLOAD_EXPIRATION,
+    )
+    token = signing.dumps(
+        {
+            "user_id": user_id,
+            "target": target,
+            "s3_key": s3_key,
+            "content_type": content_type,
+            "size": size,
+            **claims,
+        },
+        salt=UPLOAD_TOKEN_SALT,
+    )
+    return {
+        "upload_url": post["url"],
+        "fields": post["fields"],  # Send these as form fields, followed by 'file'
+        "s3_key": s3_key,
+        "upload_token": token,
+        "expires_in": settings.IMAGE_UPLOAD_EXPIRATION,
+        "size": size,  # The file must be exactly this many bytes
+    }
+
+
+def verify_upload(upload_token, user_id, target, **expected):
+    """
+    Validates the upload token, checks that the object was uploaded as promised
+    and moves it into the blob store. Returns the token's claims with "s3_key"
+    replaced by the blob key (one reference taken for the caller); raises
+    ValidationError otherwise. Idempotent: finalizing the same token again
+    returns the same blob key (with a new reference for the caller).
+    `expected` claims (e.g. item_id=...) must match the token; they are checked
+    before anything is stored, so a mismatch leaves no reference behind.
+    """
+    try:
+        # An upload may start just before the policy expires, so allow some slack
+        claims = signing.loads(
+            upload_token,
+            salt=UPLOAD_TOKEN_SALT,
+            max_age=settings.IMAGE_UPLOAD_EXPIRATION * 2,
+        )
+    except signing.BadSignature:  # Also covers SignatureExpired
+        raise ValidationError({"upload_token": "Invalid or expired upload token."})
+    if claims.get("user_id") != user_id or claims.get("target") != target:
+        raise ValidationError({"upload_token": "Invalid or expired upload token."})
+    for name, value in expected.items():
+        if claims.get(name) != value:
+            raise ValidationError(
+                {"upload_token": f"This upload belongs to a different {name.removesuffix('_id')}."}
+            )
+
+    uploader = S3ImageUploader()
+    metadata = uploader.find_image_metadata(claims["s3_key"])
+    if metadata is None:
+        # A retry (e.g. the response to the first finalize was lost): the staging
+        # object was already moved into the blob store, so resolve to that blob
+        stored_key = acquire_stored_upload(claims["s3_key"])
+        if stored_key is None:
+            raise ValidationError({"upload_token": "The file has not been uploaded yet."})
+        claims["s3_key"] = stored_key
+        return claims
+
+    # The policy already enforces both, but never trust the stored object blindly
+    if (
+        metadata["Size"] != claims["size"]
+        or metadata["ContentType"] != claims["content_type"]
+    ):
+        uploader.delete_image(claims["s3_key"])
+        raise ValidationError({"upload_token": "The uploaded file does not match the upload request."})
+
+    claims["s3_key"] = store_uploaded_object(claims["s3_key"], claims["content_type"], uploader)
+    return claims
+
+
+def delete_replaced_image(old_s3_key, new_s3_key):
+    """
+    Drops an image that was replaced by a new upload: blobs lose the old field's
+    reference (even if the new upload has the same content, since storing it took
+    a reference of its own); images from before the blob store are deleted.
+    """
+    if is_blob_key(old_s3_key):
+        release_blobs(old_s3_key)
+        return
+    if not old_s3_key or old_s3_key == new_s3_key:
+        return
+    try:
+        S3ImageUploader().delete_image(old_s3_key)
+    except Exception as e:
+        logger.warning(f"Could not delete replaced image {old_s3_key}: {e}")
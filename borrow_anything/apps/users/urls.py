@@ -6,8 +6,8 @@ from . import views
 app_name = 'users' # Optional namespace
 
 urlpatterns = [
-    # Maps GET/PUT/PATCH requests on 'me/' to the ManageUserView
-    path("me/", views.ManageUserView.as_view(), name="me"),
+    # GET on 'me/' is async (MeView); PUT/PATCH go to ManageUserView
+    path("me/", views.MeView.as_view(), name="me"),
     path("register/", views.UserCreateView.as_view(), name="register"),
     path(
         "profile-image/", views.ProfileImageUploadView.as_view(), name="profile-image"
@@ -15,6 +15,27 @@ urlpatterns = [
     path(
         "cover-image/", views.CoverImageUploadView.as_view(), name="cover-image"
     ),
+    # Direct-to-S3 uploads: get a presigned POST, upload to S3, then finalize
+    path(
+        "profile-image/intent/",
+        views.ProfileImageUploadIntentView.as_view(target="profile"),
+        name="profile-image-intent",
+    ),
+    path(
+        "profile-image/finalize/",
+        views.ProfileImageUploadFinalizeView.as_view(target="profile"),
+        name="profile-image-finalize",
+    ),
+    path(
+        "cover-image/intent/",
+        views.ProfileImageUploadIntentView.as_view(target="cover"),
+        name="cover-image-intent",
+    ),
+    path(
+        "cover-image/finalize/",
+        views.ProfileImageUploadFinalizeView.as_view(target="cover"),
+        name="cover-image-finalize",
+    ),
     # Community membership endpoints
     path(
         "communities/", 
@@ -26,5 +47,11 @@ urlpatterns = [
         views.UserCommunityMembershipDetailView.as_view(), 
         name="community-membership-detail"
     ),
+    # Staff-only metrics for the password hashing pool
+    path(
+        "hashing-metrics/",
+        views.PasswordHashingMetricsView.as_view(),
+        name="hashing-metrics"
+    ),
     # Add other user-related URLs later (e.g., signup, password change)
 ]
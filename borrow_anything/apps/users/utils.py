@@ -1,19 +1,34 @@
+from functools import lru_cache
+
 import boto3
 from django.conf import settings
 from botocore.config import Config
+from botocore.exceptions import ClientError
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """
+    One boto3 S3 client per process. Creating a client loads the service model
+    from disk (tens of milliseconds), which dominated list endpoints that build
+    an S3ImageUploader per image. Clients are thread-safe once created.
+    """
+    return boto3.client(
+        's3',
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        # config=Config(signature_version='s3v4'),
+        region_name=settings.AWS_S3_REGION_NAME,
+        # Optional S3-compatible endpoint (e.g. a local MinIO for development/tests)
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL or None,
+    )
+
 
 class S3ImageUploader:
     def __init__(self):
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            # config=Config(signature_version='s3v4'),
-            region_name=settings.AWS_S3_REGION_NAME
-        )
+        self.s3_client = get_s3_client()
         self.bucket_name = settings.AWS_STORAGE_BUCKET_NAME
 
-
     def upload_image(self, file, s3_key):
         """Upload an image to S3."""
         try:
@@ -26,6 +41,7 @@ class S3ImageUploader:
             return self.get_image_presigned_url(s3_key)
         except Exception as e:
             raise Exception(f"Error uploading image to S3: {str(e)}")
+
     def delete_image(self, s3_key):
         """Delete an image from S3."""
         try:
@@ -35,6 +51,7 @@ class S3ImageUploader:
             )
         except Exception as e:
             raise Exception(f"Error deleting image from S3: {str(e)}")
+
     def get_image_presigned_url(self, s3_key):
         """Get the URL of an image stored in S3."""
         try:
@@ -46,6 +63,7 @@ class S3ImageUploader:
             return url
         except Exception as e:
             raise Exception(f"Error generating image URL: {str(e)}")
+
     def get_image_metadata(self, s3_key):
         """Get metadata of an image stored in S3."""
         try:
@@ -61,3 +79,39 @@ class S3ImageUploader:
         except Exception as e:
             raise Exception(f"Error retrieving image metadata: {str(e)}")
 
+    def create_presigned_post(self, s3_key, content_type, size, expires_in):
+        """
+        Create a presigned POST policy so a client can upload one object straight
+        to S3. The policy pins the key, the content type and the exact size in bytes.
+        Returns {"url": ..., "fields": {...}} for a multipart/form-data POST.
+        """
+        try:
+            return self.s3_client.generate_presigned_post(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Fields={'Content-Type': content_type},
+                Conditions=[
+                    {'Content-Type': content_type},
+                    ['content-length-range', size, size],
+                ],
+                ExpiresIn=expires_in,
+            )
+        except Exception as e:
+            raise Exception(f"Error creating presigned upload: {str(e)}")
+
+    def find_image_metadata(self, s3_key):
+        """Like get_image_metadata(), but returns None if the object does not exist."""
+        try:
+            response = self.s3_client.head_object(
+                Bucket=self.bucket_name,
+                Key=s3_key
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise Exception(f"Error retrieving image metadata: {str(e)}")
+        return {
+            'ContentType': response['ContentType'],
+            'LastModified': response['LastModified'],
+            'Size': response['ContentLength']
+        }
@@ -3,24 +3,52 @@ from django.shortcuts import render, get_object_or_404
 # Create your views here.
 # apps/users/views.py
 
+from asgiref.sync import sync_to_async
 from rest_framework import generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from .models import UserProfile, UserCommunityMembership
-from .serializers import UserProfileSerializer, UserCreateSerializer, UserCommunityMembershipSerializer
+from .serializers import (
+    UserProfileSerializer,
+    UserCreateSerializer,
+    UserCommunityMembershipSerializer,
+    ImageUploadIntentSerializer,
+    ImageUploadFinalizeSerializer,
+)
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from .cache import aget_cached_me, aset_cached_me
+from . import imaging
+from .hashing import get_pool
+from .services import join_community, leave_community, set_primary_community
+from .uploads import create_upload_intent, delete_replaced_image, verify_upload
 from .utils import S3ImageUploader
 from apps.communities.models import Community
+from apps.core.asyncviews import AsyncAPIView, api_response
+from apps.storage.utils import store_files
 from rest_framework.exceptions import ValidationError
-import uuid
 
 User = get_user_model()
 
+def get_me_queryset():
+    """
+    Profiles with the user, primary community and memberships (with their
+    communities) loaded up front, so serializing one takes two queries in total.
+    """
+    return UserProfile.objects.select_related("user", "community").prefetch_related(
+        Prefetch(
+            "user__community_memberships",
+            queryset=UserCommunityMembership.objects.select_related("community"),
+        )
+    )
+
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """
     View to retrieve and update the profile of the currently authenticated user.
-    Handles GET (retrieve) and PUT/PATCH (update) requests to /api/v1/users/me/.
+    Handles PUT/PATCH (update) requests to /api/v1/users/me/ for MeView below,
+    which serves GET itself.
     """
 
     serializer_class = UserProfileSerializer
@@ -31,19 +59,51 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         """
         Override get_object to return the UserProfile linked to the request.user.
-        Uses get_or_create to handle cases where a profile might not exist yet
+        Creates the profile if it does not exist yet
         (e.g., if user was created before profile logic/signals were added).
         """
-        profile, created = UserProfile.objects.get_or_create(user=self.request.user)
-        # You might want to log the 'created' status during development
-        # if created:
-        #     print(f"Created profile for user {self.request.user.username}")
-        return profile
+        queryset = get_me_queryset()
+        try:
+            return queryset.get(user=self.request.user)
+        except UserProfile.DoesNotExist:
+            UserProfile.objects.get_or_create(user=self.request.user)
+            return queryset.get(user=self.request.user)
 
     # Note: By inheriting from RetrieveUpdateAPIView, this view automatically
-    # handles GET (retrieve profile), PUT (full update), and PATCH (partial update)
-    # based on the UserProfileSerializer definition. Ensure the serializer's
-    # read_only_fields are set appropriately to control what can be updated.
+    # handles PUT (full update) and PATCH (partial update) based on the
+    # UserProfileSerializer definition. Ensure the serializer's read_only_fields
+    # are set appropriately to control what can be updated.
+
+
+class MeView(AsyncAPIView):
+    """
+    /api/v1/users/me/. The frontend calls GET on every page load, so it is async:
+    a cache hit (see cache.py) needs no thread at all, a miss loads the profile
+    with the async ORM. Updates go to the synchronous ManageUserView.
+    """
+
+    # Most queries a request may run (see apps/core/middleware.py); pinned by tests.py
+    query_budget = {"get": 3}  # Uncached; a cache hit needs at most the auth query
+    update_view = staticmethod(ManageUserView.as_view())
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method in ("PUT", "PATCH"):
+            return await sync_to_async(self.update_view)(request, *args, **kwargs)
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request):
+        data = await aget_cached_me(request.user.pk)
+        if data is None:
+            queryset = get_me_queryset()
+            try:
+                profile = await queryset.aget(user=request.user)
+            except UserProfile.DoesNotExist:
+                await UserProfile.objects.aget_or_create(user=request.user)
+                profile = await queryset.aget(user=request.user)
+            # Presigns the image URLs; all relations are loaded already
+            data = await sync_to_async(lambda: UserProfileSerializer(profile).data)()
+            await aset_cached_me(request.user.pk, data)
+        return api_response(data)
 
 
 class UserCreateView(generics.CreateAPIView):
@@ -66,12 +126,35 @@ class UserCreateView(generics.CreateAPIView):
     # 6. Returns a 400 Bad Request response if validation fails.
 
 
+# Maps the upload target to the UserProfile fields storing its S3 key and variants
+PROFILE_IMAGE_FIELDS = {
+    "profile": ("profile_picture_s3_key", "profile_picture_variants"),
+    "cover": ("cover_photo_s3_key", "cover_photo_variants"),
+}
+
+
+def set_profile_image(profile, target, s3_key):
+    """
+    Stores a new (blob) key for the profile picture or cover photo, releases the
+    previous image and schedules the resized variants of the new one.
+    """
+    field, variants_field = PROFILE_IMAGE_FIELDS[target]
+    old_s3_key = getattr(profile, field)
+    old_variants = getattr(profile, variants_field)
+    setattr(profile, field, s3_key)
+    setattr(profile, variants_field, {})
+    profile.save(update_fields=[field, variants_field, "updated_at"])
+    delete_replaced_image(old_s3_key, s3_key)
+    if old_s3_key != s3_key:
+        imaging.delete_variants(old_variants)
+    imaging.schedule_profile_images(profile.user_id)  # Resized variants
+
+
 class ProfileImageUploadView(APIView):
+    # Streams the file through Django; prefer profile-image/intent/ + finalize/
     def post(self, request):
         """Get a presigned URL for uploading profile image."""
         try:
-            # Generate a unique S3 key for the image
-            s3_key = f"users/{request.user.id}/profile.jpg"
             # get the file from the request
             file = request.data.get("image")
             # Check if the file is provided
@@ -79,15 +162,13 @@ class ProfileImageUploadView(APIView):
                 return Response(
                     {"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST
                 )
-            uploader = S3ImageUploader()
-            presigned_url = uploader.upload_image(file, s3_key)
-            if presigned_url:
-                # Optionally, you can save the image metadata to the user's profile
-                user_profile = UserProfile.objects.get(user=request.user)
-                user_profile.profile_picture_s3_key = s3_key
-                user_profile.save()
-                # Return the presigned URL and S3 key
-                # in the response
+            user_profile = UserProfile.objects.get(user=request.user)
+            # Stored under a key derived from the file's content (see apps/storage)
+            s3_key = store_files([file])[0]
+            set_profile_image(user_profile, "profile", s3_key)
+            # Return the presigned URL and S3 key
+            # in the response
+            presigned_url = S3ImageUploader().get_image_presigned_url(s3_key)
             return Response({"presigned_url": presigned_url, "s3_key": s3_key})
         except Exception as e:
             return Response(
@@ -96,11 +177,10 @@ class ProfileImageUploadView(APIView):
 
 
 class CoverImageUploadView(APIView):
+    # Streams the file through Django; prefer cover-image/intent/ + finalize/
     def post(self, request):
         """Get a presigned URL for uploading cover image."""
         try:
-            # Generate a unique S3 key for the image
-            s3_key = f"users/{request.user.id}/cover-image.jpg"
             # get the file from the request
             file = request.data.get("cover-image")
             # Check if the file is provided
@@ -108,15 +188,13 @@ class CoverImageUploadView(APIView):
                 return Response(
                     {"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST
                 )
-            uploader = S3ImageUploader()
-            presigned_url = uploader.upload_image(file, s3_key)
-            if presigned_url:
-                # Optionally, you can save the image metadata to the user's profile
-                user_profile = UserProfile.objects.get(user=request.user)
-                user_profile.cover_photo_s3_key = s3_key
-                user_profile.save()
-                # Return the presigned URL and S3 key
-                # in the response
+            user_profile = UserProfile.objects.get(user=request.user)
+            # Stored under a key derived from the file's content (see apps/storage)
+            s3_key = store_files([file])[0]
+            set_profile_image(user_profile, "cover", s3_key)
+            # Return the presigned URL and S3 key
+            # in the response
+            presigned_url = S3ImageUploader().get_image_presigned_url(s3_key)
             return Response({"presigned_url": presigned_url, "s3_key": s3_key})
         except Exception as e:
             return Response(
@@ -124,16 +202,68 @@ class CoverImageUploadView(APIView):
             )
 
 
+class ProfileImageUploadIntentView(APIView):
+    """
+    Step 1 of a direct-to-S3 upload of the profile (or cover) image.
+    POST {"content_type": "image/jpeg", "size": 123456}
+    Returns a presigned POST (upload_url + fields) and an upload_token for finalize.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    target = "profile"  # Overridden with as_view(target="cover") in urls.py
+
+    def post(self, request):
+        serializer = ImageUploadIntentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        intent = create_upload_intent(
+            request.user.id,
+            self.target,
+            serializer.validated_data["content_type"],
+            serializer.validated_data["size"],
+        )
+        return Response(intent, status=status.HTTP_201_CREATED)
+
+
+class ProfileImageUploadFinalizeView(AsyncAPIView):
+    """
+    Step 3 of a direct-to-S3 upload: verifies the uploaded object and stores its
+    blob key on the profile, replacing (and releasing) the previous image.
+    POST {"upload_token": "..."}
+    Async: checking and copying the object in S3 takes several round trips, which
+    run in a thread while the worker serves other requests.
+    """
+    target = "profile"  # Overridden with as_view(target="cover") in urls.py
+
+    async def post(self, request):
+        serializer = ImageUploadFinalizeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        claims = await sync_to_async(verify_upload)(
+            serializer.validated_data["upload_token"], request.user.id, self.target
+        )
+
+        profile, created = await UserProfile.objects.aget_or_create(user=request.user)
+        await sync_to_async(set_profile_image)(profile, self.target, claims["s3_key"])
+
+        uploader = S3ImageUploader()
+        return api_response({
+            "presigned_url": await sync_to_async(uploader.get_image_presigned_url)(claims["s3_key"]),
+            "s3_key": claims["s3_key"],
+        })
+
+
 class UserCommunityMembershipListView(generics.ListCreateAPIView):
     """
     View to list all communities a user is a member of and to join new communities.
     """
     serializer_class = UserCommunityMembershipSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Most queries a request may run (see apps/core/middleware.py); pinned by tests.py
+    query_budget = {"get": 2}
 
     def get_queryset(self):
         """Return all communities the current user is a member of"""
-        return UserCommunityMembership.objects.filter(user=self.request.user)
+        return UserCommunityMembership.objects.filter(user=self.request.user).select_related(
+            "community"
+        )
     
     def perform_create(self, serializer):
         """Join a new community"""
@@ -141,15 +271,13 @@ class UserCommunityMembershipListView(generics.ListCreateAPIView):
         community = serializer.validated_data['community']
         if UserCommunityMembership.objects.filter(user=self.request.user, community=community).exists():
             raise ValidationError("You are already a member of this community.")
-        
-        # Determine if this should be the primary community
-        is_primary = serializer.validated_data.get('is_primary', False)
-        
-        # If this is the user's first community, automatically make it primary
-        if not UserCommunityMembership.objects.filter(user=self.request.user).exists():
-            is_primary = True
-            
-        serializer.save(user=self.request.user, is_primary=is_primary)
+
+        # The user's first community automatically becomes primary (see services.py)
+        serializer.instance = join_community(
+            self.request.user,
+            community,
+            is_primary=serializer.validated_data.get('is_primary', False),
+        )
 
 
 class UserCommunityMembershipDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -163,39 +291,34 @@ class UserCommunityMembershipDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         """Return only memberships owned by the current user"""
-        return UserCommunityMembership.objects.filter(user=self.request.user)
-    
-    def destroy(self, request, *args, **kwargs):
-        """Handle leaving a community"""
-        membership = self.get_object()
-        
-        # Check if this is the user's primary community
-        if membership.is_primary:
-            # Find another community to make primary if possible
-            other_membership = UserCommunityMembership.objects.filter(
-                user=self.request.user
-            ).exclude(id=membership.id).first()
-            
-            # If user has another community, make it primary
-            if other_membership:
-                other_membership.is_primary = True
-                other_membership.save()
-                
-                # Update user profile to use this community
-                profile, created = UserProfile.objects.get_or_create(user=self.request.user)
-                profile.community = other_membership.community
-                profile.save(update_fields=['community'])
-            else:
-                # If no other communities, clear the primary community in user profile
-                profile, created = UserProfile.objects.get_or_create(user=self.request.user)
-                profile.community = None
-                profile.save(update_fields=['community'])
-        
-        return super().destroy(request, *args, **kwargs)
+        return UserCommunityMembership.objects.filter(user=self.request.user).select_related(
+            "community"
+        )
     
+    def perform_destroy(self, instance):
+        """Handle leaving a community (another membership becomes primary if needed)"""
+        leave_community(instance)
+
     def perform_update(self, serializer):
-        """Handle updating a membership, particularly when setting as primary"""
-        is_primary = serializer.validated_data.get('is_primary', False)
-        
-        # If setting as primary, the save method in the model will handle making other memberships non-primary
-        serializer.save(is_primary=is_primary)
\ No newline at end of file
+        """
+        Handle updating a membership, particularly when setting as primary.
+        The primary community is changed by making another membership primary,
+        so is_primary=false on its own is ignored.
+        """
+        make_primary = serializer.validated_data.pop('is_primary', False)
+        membership = serializer.save()
+        if make_primary:
+            set_primary_community(self.request.user.pk, membership.community_id)
+            membership.refresh_from_db(fields=['is_primary', 'updated_at'])
+
+
+class PasswordHashingMetricsView(APIView):
+    """
+    Staff-only snapshot of this process's password hashing pool:
+    in-flight/completed/rejected counts and hash/queue latency percentiles.
+    GET /api/v1/users/hashing-metrics/
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_pool().metrics())
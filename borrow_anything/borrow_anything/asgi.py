@@ -3,6 +3,9 @@ ASGI config for borrow_anything project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served by uvicorn workers under gunicorn in production (see gunicorn.conf.py,
+SERVER_MODE=asgi). For local development: `uvicorn borrow_anything.asgi:application --reload`.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -12,5 +15,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'borrow_anything.settings')
+# Tells settings.py it is served over ASGI (persistent connections are turned off there)
+os.environ['DJANGO_ASGI'] = '1'
 
 application = get_asgi_application()
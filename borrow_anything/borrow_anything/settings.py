@@ -12,7 +12,9 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from decouple import config
+import dj_database_url
 from urllib.parse import urlparse
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +47,8 @@ INSTALLED_APPS = [
     "django.contrib.contenttypes",
     "django.contrib.sessions",
     "django.contrib.messages",
+    # runserver serves static files through WhiteNoise too, like production
+    "whitenoise.runserver_nostatic",
     "django.contrib.staticfiles",
     # Add Your Custom Apps Here:
     "apps.communities.apps.CommunitiesConfig",  # Tells Django to look inside apps/communities/apps.py
@@ -53,6 +57,8 @@ INSTALLED_APPS = [
     "apps.transactions.apps.TransactionsConfig",
     "apps.messaging.apps.MessagingConfig",
     "apps.notifications.apps.NotificationsConfig",
+    "apps.storage.apps.StorageConfig",
+    "apps.core.apps.CoreConfig",
     # Third-party apps
     "rest_framework",
     "rest_framework_simplejwt",  # Add Simple JWT
@@ -61,20 +67,30 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # Serves collected static files (admin, browsable API) with far-future caching
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # gzip/brotli for JSON and text responses (see COMPRESSION_* below)
+    "apps.core.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Sends reads of opted-in views to the read replicas (see DB_REPLICA_URLS)
+    "apps.core.middleware.ReplicaRoutingMiddleware",
+    # Query count / DB time per request, slow-query logs and view query budgets
+    "apps.core.middleware.QueryInstrumentationMiddleware",
+    # Samples the stacks of some requests (off unless configured below)
+    "apps.core.middleware.SamplingProfilerMiddleware",
 ]
 
 ROOT_URLCONF = 'borrow_anything.urls'
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        # Use JWT Authentication
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # Use JWT Authentication (user + profile resolved in one query and cached)
+        "apps.users.authentication.CachedJWTAuthentication",
         # Keep SessionAuthentication if you want to use the Browsable API during development
         "rest_framework.authentication.SessionAuthentication",
     ),
@@ -83,6 +99,17 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
         # Or maybe: 'rest_framework.permissions.IsAuthenticated',
     ),
+    # JSON through orjson when it is installed, DRF's json-based classes otherwise
+    # (see apps/core/renderers.py and parsers.py)
+    "DEFAULT_RENDERER_CLASSES": (
+        "apps.core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "apps.core.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     # Add pagination later if desired
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     # 'PAGE_SIZE': 10
@@ -170,6 +197,117 @@ else:
         }
     }
 
+# A DATABASE_URL (e.g. the Neon connection string, with ?sslmode=require)
+# takes precedence over both of the above.
+DATABASE_URL = config("DATABASE_URL", default="")
+if DATABASE_URL:
+    DATABASES = {"default": dj_database_url.parse(DATABASE_URL)}
+
+# Read replicas (apps/core/routers.py): comma-separated database URLs, added as
+# replica_1, replica_2, ... Views opt in with `replica_actions`; everything else
+# keeps using "default".
+DB_REPLICA_URLS = config("DB_REPLICA_URLS", default="")
+DB_REPLICAS = []
+for number, url in enumerate(filter(None, map(str.strip, DB_REPLICA_URLS.split(","))), start=1):
+    DB_REPLICAS.append(f"replica_{number}")
+    DATABASES[f"replica_{number}"] = dj_database_url.parse(url)
+if "test" in sys.argv and not DB_REPLICAS:
+    # A second SQLite database standing in for a replica in apps/core/tests.py.
+    # Not listed in DB_REPLICAS: only tests that opt in route reads to it.
+    DATABASES["replica"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "db_replica.sqlite3"}
+DATABASE_ROUTERS = ["apps.core.routers.ReplicaRouter"]
+# After a user writes, their reads go to the primary for this many seconds, so
+# they see their own changes even if the replicas have not caught up yet.
+# Remembered in the cache: use a shared cache when running several processes.
+DB_REPLICA_STICKY_SECONDS = config("DB_REPLICA_STICKY_SECONDS", default=10, cast=int)
+# A replica lagging more than MAX_LAG seconds behind is skipped until it catches
+# up; its lag is checked at most every CHECK_INTERVAL seconds per process.
+DB_REPLICA_MAX_LAG = config("DB_REPLICA_MAX_LAG", default=5, cast=float)
+DB_REPLICA_CHECK_INTERVAL = config("DB_REPLICA_CHECK_INTERVAL", default=5, cast=int)
+
+# Connection management (see apps/core/dbmetrics.py for the metrics)
+# Seconds a connection is kept open and reused by later requests (0 = close after
+# every request, as Django does by default). Opening a TLS connection to a
+# remote database costs several round trips, so reuse matters. WSGI only: under
+# ASGI connections come from DB_POOL instead (see SERVED_OVER_ASGI).
+DB_CONN_MAX_AGE = config("DB_CONN_MAX_AGE", default=60, cast=int)
+# Check a reused connection before the first query of a request, and reconnect if it died
+DB_CONN_HEALTH_CHECKS = config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool)
+# Seconds to wait for a new PostgreSQL connection before failing
+DB_CONNECT_TIMEOUT = config("DB_CONNECT_TIMEOUT", default=5, cast=int)
+# Set by asgi.py. Under ASGI, Django runs sync code on threads that change from
+# request to request, and connections belong to a thread: a persistent connection
+# would never be reused nor closed, and every request would leak one. So
+# DB_CONN_MAX_AGE is ignored there and connections are reused through DB_POOL.
+SERVED_OVER_ASGI = config("DJANGO_ASGI", default=False, cast=bool)
+# psycopg 3 connection pool ("psycopg[binary,pool]" in requirements.txt) instead of
+# persistent connections; on by default under ASGI. Pool connections are shared by
+# all threads of a process: MAX_SIZE bounds them, TIMEOUT is how long (in seconds)
+# a request waits for one. PostgreSQL only.
+DB_POOL = config("DB_POOL", default=SERVED_OVER_ASGI, cast=bool)
+DB_POOL_MIN_SIZE = config("DB_POOL_MIN_SIZE", default=2, cast=int)
+DB_POOL_MAX_SIZE = config("DB_POOL_MAX_SIZE", default=10, cast=int)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", default=10, cast=int)
+# Required behind a transaction-mode pooler (e.g. Neon's "-pooler" host / PgBouncer)
+DB_DISABLE_SERVER_SIDE_CURSORS = config("DB_DISABLE_SERVER_SIDE_CURSORS", default=False, cast=bool)
+
+for database in DATABASES.values():
+    database["CONN_HEALTH_CHECKS"] = DB_CONN_HEALTH_CHECKS
+    # Django refuses persistent connections together with a pool
+    database["CONN_MAX_AGE"] = 0 if DB_POOL or SERVED_OVER_ASGI else DB_CONN_MAX_AGE
+    if database["ENGINE"] == "django.db.backends.postgresql":
+        # Same backend, plus connection checkout metrics
+        database["ENGINE"] = "apps.core.backends.postgresql"
+        database["DISABLE_SERVER_SIDE_CURSORS"] = DB_DISABLE_SERVER_SIDE_CURSORS
+        options = database.setdefault("OPTIONS", {})
+        options.setdefault("connect_timeout", DB_CONNECT_TIMEOUT)
+        if DB_POOL:
+            options["pool"] = {
+                "min_size": DB_POOL_MIN_SIZE,
+                "max_size": DB_POOL_MAX_SIZE,
+                "timeout": DB_POOL_TIMEOUT,
+            }
+
+# Cache (helpers in apps/core/cache.py)
+# CACHE_URL selects the backend shared by all caches (auth users, /me/, category
+# and community lists, sticky-primary markers):
+#   redis://host:6379/0 (or rediss://)  - shared by all processes (pip install redis)
+#   memcached://host:11211[,host2:11211] - shared by all processes (pip install pymemcache)
+#   locmem://                            - per process (the default; fine for one process)
+#   dummy://                             - caches nothing
+CACHE_URL = config("CACHE_URL", default="locmem://")
+CACHE_DEFAULT_TIMEOUT = config("CACHE_DEFAULT_TIMEOUT", default=300, cast=int)
+_cache = urlparse(CACHE_URL)
+if _cache.scheme in ("redis", "rediss"):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}}
+elif _cache.scheme == "memcached":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": _cache.netloc.split(","),
+        }
+    }
+elif _cache.scheme == "locmem":
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "default"}}
+elif _cache.scheme == "dummy":
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+else:
+    raise ValueError(f"Unsupported CACHE_URL scheme: {_cache.scheme!r}")
+CACHES["default"]["TIMEOUT"] = CACHE_DEFAULT_TIMEOUT
+# Namespaces the keys, so several deployments can share one Redis/memcached
+CACHES["default"]["KEY_PREFIX"] = config("CACHE_KEY_PREFIX", default="borrow")
+# Timeouts are shortened by a random fraction up to this, so entries cached together
+# do not all expire (and get recomputed) at the same moment
+CACHE_TTL_JITTER = config("CACHE_TTL_JITTER", default=0.1, cast=float)
+# Only one caller computes a missing key: the others wait up to LOCK_WAIT seconds
+# for it. The lock expires after LOCK_TIMEOUT seconds if its holder dies.
+CACHE_LOCK_WAIT = config("CACHE_LOCK_WAIT", default=2, cast=float)
+CACHE_LOCK_TIMEOUT = config("CACHE_LOCK_TIMEOUT", default=10, cast=int)
+# Category and community lists. Saves invalidate them right away, but with read
+# replicas a list may be refilled from a lagging replica: the TTL bounds that.
+CATEGORIES_CACHE_TIMEOUT = config("CATEGORIES_CACHE_TIMEOUT", default=3600, cast=int)
+COMMUNITIES_CACHE_TIMEOUT = config("COMMUNITIES_CACHE_TIMEOUT", default=300, cast=int)
+
 AWS_ACCESS_KEY_ID = config("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = config("AWS_SECRET_ACCESS_KEY")
 AWS_S3_PRESIGNED_URL_EXPIRATION = config(
@@ -177,8 +315,133 @@ AWS_S3_PRESIGNED_URL_EXPIRATION = config(
 )  # Default to 1 hour
 AWS_STORAGE_BUCKET_NAME = config("AWS_STORAGE_BUCKET_NAME")
 AWS_S3_REGION_NAME = config("AWS_S3_REGION_NAME")
+# Optional S3-compatible endpoint, e.g. http://localhost:9000 for a local MinIO
+AWS_S3_ENDPOINT_URL = config("AWS_S3_ENDPOINT_URL", default="")
+
+# Direct-to-S3 image uploads (upload intent -> client POSTs to S3 -> finalize)
+IMAGE_UPLOAD_MAX_SIZE = config(
+    "IMAGE_UPLOAD_MAX_SIZE", default=10 * 1024 * 1024, cast=int
+)  # Default to 10 MB
+IMAGE_UPLOAD_CONTENT_TYPES = ["image/jpeg", "image/png", "image/webp", "image/gif"]
+IMAGE_UPLOAD_EXPIRATION = config(
+    "IMAGE_UPLOAD_EXPIRATION", default=900, cast=int
+)  # Seconds the presigned POST (and its finalize token) stay valid
+# Parallel S3 uploads per request when several item images are posted at once
+ITEM_IMAGE_UPLOAD_WORKERS = config("ITEM_IMAGE_UPLOAD_WORKERS", default=4, cast=int)
+# Background generation of resized WEBP variants (requires Pillow)
+IMAGE_PROCESSING_WORKERS = config("IMAGE_PROCESSING_WORKERS", default=2, cast=int)
+IMAGE_VARIANT_QUALITY = config("IMAGE_VARIANT_QUALITY", default=80, cast=int)
+# Unreferenced content-addressed blobs are only deleted after this many hours,
+# so an upload that is still being finalized never loses its object
+STORAGE_BLOB_GC_GRACE_HOURS = config("STORAGE_BLOB_GC_GRACE_HOURS", default=24, cast=int)
+
+# Notifications
+# Repeated events of the same type for the same recipient and item within this
+# window (in seconds) are merged into one notification. Set to 0 to disable.
+NOTIFICATION_COALESCE_WINDOW = config(
+    "NOTIFICATION_COALESCE_WINDOW", default=3600, cast=int
+)  # Default to 1 hour
+# Upper bound (in seconds) for how long GET /notifications/wait/ holds a request open
+NOTIFICATION_WAIT_MAX_TIMEOUT = config(
+    "NOTIFICATION_WAIT_MAX_TIMEOUT", default=30, cast=int
+)
+# GET /notifications/stream/ (server-sent events): seconds between keep-alive
+# comments on an idle stream, seconds before the server ends a stream (the client
+# reconnects and resumes), and the reconnect delay sent to EventSource (in ms)
+NOTIFICATION_STREAM_HEARTBEAT = config("NOTIFICATION_STREAM_HEARTBEAT", default=15, cast=int)
+NOTIFICATION_STREAM_MAX_DURATION = config("NOTIFICATION_STREAM_MAX_DURATION", default=300, cast=int)
+NOTIFICATION_STREAM_RETRY_MS = config("NOTIFICATION_STREAM_RETRY_MS", default=3000, cast=int)
+# Recipients written per bulk insert (and per progress update) when fanning out a broadcast
+NOTIFICATION_BROADCAST_CHUNK_SIZE = config(
+    "NOTIFICATION_BROADCAST_CHUNK_SIZE", default=1000, cast=int
+)
+
+# Push delivery (python manage.py deliver_notifications)
+# Device.provider code -> provider class. Devices whose provider is not listed
+# here are not pushed to. Real providers subclass delivery.providers.BasePushProvider.
+NOTIFICATION_PUSH_PROVIDERS = {
+    "STUB": "apps.notifications.delivery.providers.LocalStubProvider",
+}
+# Deliveries picked up per run of the worker
+NOTIFICATION_PUSH_BATCH_LIMIT = config("NOTIFICATION_PUSH_BATCH_LIMIT", default=1000, cast=int)
+# Provider batches sent at the same time
+NOTIFICATION_PUSH_CONCURRENCY = config("NOTIFICATION_PUSH_CONCURRENCY", default=10, cast=int)
+# Seconds before a provider call counts as failed
+NOTIFICATION_PUSH_TIMEOUT = config("NOTIFICATION_PUSH_TIMEOUT", default=10, cast=int)
+# Attempts per delivery before giving up, and the backoff between them (in seconds)
+NOTIFICATION_PUSH_MAX_ATTEMPTS = config("NOTIFICATION_PUSH_MAX_ATTEMPTS", default=5, cast=int)
+NOTIFICATION_PUSH_RETRY_BASE_DELAY = config(
+    "NOTIFICATION_PUSH_RETRY_BASE_DELAY", default=30, cast=int
+)
+NOTIFICATION_PUSH_RETRY_MAX_DELAY = config(
+    "NOTIFICATION_PUSH_RETRY_MAX_DELAY", default=3600, cast=int
+)
+
+# Users
+# How long (in seconds) the serialized /users/me/ response is cached per user.
+# Entries are invalidated on profile, membership and image changes; keep this well
+# below the 24 hour lifetime of the presigned image URLs inside the response.
+USERS_ME_CACHE_TIMEOUT = config("USERS_ME_CACHE_TIMEOUT", default=300, cast=int)
+# How long (in seconds) CachedJWTAuthentication caches a user with their profile.
+# Saves invalidate it once committed; the TTL only bounds changes made via update().
+USERS_AUTH_CACHE_TIMEOUT = config("USERS_AUTH_CACHE_TIMEOUT", default=60, cast=int)
+
+# Password hashing (registration and login) runs on a small per-process pool:
+# at most WORKERS hashes at once, QUEUE_SIZE more waiting, the rest get a 429
+# asking the client to retry after RETRY_AFTER seconds.
+PASSWORD_HASHING_WORKERS = config("PASSWORD_HASHING_WORKERS", default=2, cast=int)
+PASSWORD_HASHING_QUEUE_SIZE = config("PASSWORD_HASHING_QUEUE_SIZE", default=8, cast=int)
+PASSWORD_HASHING_RETRY_AFTER = config("PASSWORD_HASHING_RETRY_AFTER", default=2, cast=int)
+# Bulk resident imports (manage.py import_residents / admin): rows written per
+# transaction, and processes hashing passwords in parallel (0 = one per CPU core)
+USERS_IMPORT_CHUNK_SIZE = config("USERS_IMPORT_CHUNK_SIZE", default=500, cast=int)
+USERS_IMPORT_HASHING_WORKERS = config("USERS_IMPORT_HASHING_WORKERS", default=0, cast=int)
+# A running import that saved no progress for this many seconds is considered
+# interrupted (e.g. the process restarted) and is resumed by import_residents --pending
+USERS_IMPORT_STALE_AFTER = config("USERS_IMPORT_STALE_AFTER", default=600, cast=int)
+
+# Query instrumentation (apps/core/middleware.py)
+# Statements slower than this (in ms) are logged as warnings; requests with at
+# least QUERY_COUNT_WARNING queries, or QUERY_SLOW_MS of DB time, are logged at INFO.
+QUERY_SLOW_MS = config("QUERY_SLOW_MS", default=100, cast=int)
+QUERY_COUNT_WARNING = config("QUERY_COUNT_WARNING", default=50, cast=int)
+# Raise instead of logging when a view runs more queries than its query_budget.
+# On by default while running the test suite, so budget regressions fail CI.
+QUERY_BUDGET_STRICT = config("QUERY_BUDGET_STRICT", default="test" in sys.argv, cast=bool)
+
+# Request profiling (apps/core/profiling.py)
+# Fraction of requests to profile (0 = only on demand), and the secret that
+# profiles a single request when sent as its X-Profile header (empty = disabled).
+# Results: GET /api/v1/core/profiles/ and /api/v1/core/profiles/stacks/ (staff only).
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+PROFILING_TOKEN = config("PROFILING_TOKEN", default="")
+# Milliseconds between stack samples, and distinct stacks kept per view
+PROFILING_INTERVAL_MS = config("PROFILING_INTERVAL_MS", default=5, cast=int)
+PROFILING_MAX_STACKS = config("PROFILING_MAX_STACKS", default=5000, cast=int)
+
+# Logging
+# Structured per-request query lines go to the "apps.core.queries" logger.
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "apps.core.queries": {
+            "handlers": ["console"],
+            "level": config("QUERY_LOG_LEVEL", default="INFO"),
+            "propagate": False,
+        },
+    },
+}
 
 
+# Authentication backends
+# Same as Django's ModelBackend, but password checks run on the bounded hashing
+# pool (apps/users/hashing.py) so login bursts get a 429 instead of piling up.
+AUTHENTICATION_BACKENDS = ["apps.users.backends.PooledModelBackend"]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -216,6 +479,32 @@ USE_TZ = True
 STATIC_URL = 'static/'
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+# collectstatic writes hashed file names (cached forever by browsers) plus .gz and
+# .br copies that WhiteNoise serves to clients accepting them. Tests run without
+# collectstatic, so they use plain names (the manifest would be missing).
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "whitenoise.storage.CompressedStaticFilesStorage"
+            if "test" in sys.argv
+            else "whitenoise.storage.CompressedManifestStaticFilesStorage"
+        )
+    },
+}
+
+# Response compression (apps/core/middleware.py CompressionMiddleware)
+COMPRESSION_ENABLED = config("COMPRESSION_ENABLED", default=True, cast=bool)
+# Smaller responses are sent uncompressed
+COMPRESSION_MIN_SIZE = config("COMPRESSION_MIN_SIZE", default=1024, cast=int)
+# 1 (fastest) - 9 (smallest). 6 is gzip's usual default.
+COMPRESSION_GZIP_LEVEL = config("COMPRESSION_GZIP_LEVEL", default=6, cast=int)
+# 0 (fastest) - 11 (smallest). 11 is meant for static files compressed once;
+# 4-5 compresses better than gzip at a similar speed.
+COMPRESSION_BROTLI_QUALITY = config("COMPRESSION_BROTLI_QUALITY", default=4, cast=int)
+# Gzip responses carry a random-length file name of up to this many bytes, so
+# their size does not reveal how well a secret compressed (BREACH). 0 = off.
+COMPRESSION_GZIP_RANDOM_BYTES = config("COMPRESSION_GZIP_RANDOM_BYTES", default=100, cast=int)
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -51,6 +51,7 @@ urlpatterns = [
                 path("", include("apps.items.urls")),
                 path("", include("apps.transactions.urls")),
                 path("", include("apps.notifications.urls")),
+                path("core/", include("apps.core.urls")),
             ]
         ),
     ),
@@ -0,0 +1,50 @@
+# gunicorn.conf.py
+# Production server settings. Run from this directory with just `gunicorn`
+# (gunicorn reads ./gunicorn.conf.py by itself).
+#
+# SERVER_MODE=asgi (default): uvicorn workers under gunicorn. Each worker runs an
+# event loop, so async views (notification stream/long-poll, /users/me/, image
+# finalize) wait on S3 and the database without holding a thread, and slow
+# clients cost a socket instead of a worker. Sync DRF views still work: Django
+# runs them in a thread per request.
+# SERVER_MODE=wsgi: the previous setup, threaded sync workers.
+#
+# Database connections: in ASGI mode DB_CONN_MAX_AGE has no effect (persistent
+# connections would leak, see settings.py); connections are reused through the
+# psycopg pool, DB_POOL, which is on by default there. WSGI mode can use either.
+
+import multiprocessing
+import os
+
+mode = os.environ.get("SERVER_MODE", "asgi")
+
+# Cloud Run (and most PaaS) pass the port to listen on in $PORT
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+if mode == "asgi":
+    wsgi_app = "borrow_anything.asgi:application"  # Gunicorn's name for the app, ASGI included
+    worker_class = "uvicorn_worker.UvicornWorker"  # pip install uvicorn-worker
+    # One event loop per CPU core is enough: concurrency comes from the loop
+    workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+else:
+    wsgi_app = "borrow_anything.wsgi:application"
+    worker_class = "gthread"
+    workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+    threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Longer than the longest request: NOTIFICATION_WAIT_MAX_TIMEOUT for the long-poll.
+# Uvicorn workers only use it to detect a stuck event loop, so server-sent event
+# streams (NOTIFICATION_STREAM_MAX_DURATION) are not cut off by it.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+# Keep-alive between the load balancer and gunicorn; should exceed the load
+# balancer's idle timeout so it never reuses a connection gunicorn just closed
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 75))
+# Restart workers now and then (with jitter so they don't all restart together)
+# to bound memory growth
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")